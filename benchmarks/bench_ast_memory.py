@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+AST内存测试
+作用：在合成的大程序上对比不可变__slots__节点与等价的__dict__节点（原实现）占用的内存
+用法：python benchmarks/bench_ast_memory.py [--intents N]
+"""
+
+import sys
+import argparse
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser, ASTNode
+from benchmarks.bench_parser_memory import synthetic_script
+
+
+class DictNode:
+    """原实现的等价节点：字段保存在实例__dict__中，列表字段为list"""
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def to_dict_nodes(obj):
+    """将不可变AST转换为__dict__节点树"""
+    if isinstance(obj, tuple):
+        return [to_dict_nodes(item) for item in obj]
+    if isinstance(obj, ASTNode):
+        return DictNode(**{name: to_dict_nodes(getattr(obj, name)) for name in obj._fields})
+    return obj
+
+
+def measure(build):
+    """返回build()结果占用的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AST节点内存对比")
+    parser.add_argument("--intents", type=int, default=20000)
+    args = parser.parse_args()
+    
+    text = synthetic_script(args.intents)
+    tokens = Lexer(text, engine="regex").tokenize()
+    
+    class PrebuiltLexer:
+        def tokenize(self):
+            return tokens
+    
+    program, slotted_size = measure(lambda: Parser(PrebuiltLexer()).parse())
+    _, dict_size = measure(lambda: to_dict_nodes(program))
+    
+    print(f"合成程序: {args.intents} 个意图")
+    print(f"__dict__节点: {dict_size / 1024 / 1024:.1f}MB, "
+          f"__slots__不可变节点: {slotted_size / 1024 / 1024:.1f}MB, "
+          f"节省 {(1 - slotted_size / dict_size) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
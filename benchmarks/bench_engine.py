@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+执行引擎测试
+作用：在enhanced.dsl上对比tree引擎（逐节点isinstance分派）、closure引擎（预编译闭包）
+      与aot引擎（dslc生成的Python模块）执行意图的耗时，以及从脚本编译与导入预编译模块的启动耗时
+用法：python benchmarks/bench_engine.py [--repeat N]
+"""
+
+import sys
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.transpiler import build_module, load_module
+
+
+def run(engine, program, repeat, module=None):
+    """执行repeat轮全部意图，返回每次执行意图的平均耗时（秒）"""
+    interpreter = Interpreter(engine=engine)
+    interpreter.interpret(program)
+    if module is not None:
+        interpreter.load_module(module)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.set_user_input_callback(lambda name: "12345")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for intent in program.intents:
+            interpreter.execute_intent(intent)
+    return (time.perf_counter() - start) / (repeat * len(program.intents))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=500)
+    args = arg_parser.parse_args()
+    # 只测量执行本身，不测量日志输出
+    logging.disable(logging.INFO)
+    
+    text = (project_root / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(text)).parse()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        script = Path(tmp) / "enhanced.dsl"
+        shutil.copy(project_root / "scripts" / "enhanced.dsl", script)
+        # 预编译模块的启动依赖CPython缓存的字节码（即使环境变量禁用了.pyc写入）
+        sys.dont_write_bytecode = False
+        build_module(str(script))
+        load_module(str(script))
+        # 启动：解析脚本并编译闭包 vs 导入预编译模块（.pyc已缓存）并绑定
+        start = time.perf_counter()
+        Interpreter(engine="closure").interpret(Parser(Lexer(text)).parse())
+        compile_startup = time.perf_counter() - start
+        start = time.perf_counter()
+        module = load_module(str(script))
+        Interpreter(engine="aot").load_module(module)
+        aot_startup = time.perf_counter() - start
+        
+        tree = run("tree", program, args.repeat)
+        closure = run("closure", program, args.repeat)
+        aot = run("aot", module.PROGRAM, args.repeat, module)
+    print(f"intents: {len(program.intents)}")
+    print(f"tree engine:    {tree * 1e6:8.2f} us per intent")
+    print(f"closure engine: {closure * 1e6:8.2f} us per intent  ({tree / closure:.1f}x)")
+    print(f"aot engine:     {aot * 1e6:8.2f} us per intent  ({tree / aot:.1f}x)")
+    print(f"startup: parse+compile {compile_startup * 1000:.2f} ms, import module {aot_startup * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
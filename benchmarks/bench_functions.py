@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+内置函数注册表测试
+作用：模拟一个缓慢的订单后端被大量请求占满，对比订单和退款共用一个线程池与各用一个线程池时，
+      退款查询的耗时（取自注册表的调用统计）；以及阻塞函数交给线程池执行相对直接调用增加的耗时
+用法：python benchmarks/bench_functions.py [--pool-size N] [--callers N]
+"""
+
+import sys
+import argparse
+import logging
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.functions import FunctionRegistry, set_pool_size
+
+
+def slow_order_status(order_number):
+    time.sleep(0.05)
+    return "已发货"
+
+
+def refund_status(order_number):
+    time.sleep(0.002)
+    return "退款中"
+
+
+def contend(order_backend, refund_backend, callers, calls):
+    """callers个线程不停查询订单，同时一个线程查询退款calls次，返回退款查询的调用统计"""
+    registry = FunctionRegistry()
+    registry.register("get_order_status", slow_order_status, blocking=True, backend=order_backend)
+    registry.register("get_refund_status", refund_status, blocking=True, backend=refund_backend)
+    done = threading.Event()
+
+    def query_orders():
+        while not done.is_set():
+            registry["get_order_status"]("A1")
+
+    threads = [threading.Thread(target=query_orders) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    for _ in range(calls):
+        registry["get_refund_status"]("A1")
+    done.set()
+    for thread in threads:
+        thread.join()
+    return registry.stats()["get_refund_status"]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--pool-size", type=int, default=4)
+    arg_parser.add_argument("--callers", type=int, default=16)
+    arg_parser.add_argument("--calls", type=int, default=50)
+    args = arg_parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for backend in ("bench-shared", "bench-orders", "bench-refunds"):
+        set_pool_size(backend, args.pool_size)
+    for label, backends in (("共用一个线程池", ("bench-shared", "bench-shared")),
+                            ("每个后端一个线程池", ("bench-orders", "bench-refunds"))):
+        stats = contend(*backends, args.callers, args.calls)
+        print(f"{label:<12} 退款查询 平均 {stats.mean_time * 1e3:7.2f} ms  "
+              f"p95 {stats.percentile(95) * 1e3:7.2f} ms  最大 {stats.max_time * 1e3:7.2f} ms")
+
+    registry = FunctionRegistry()
+    registry.register("inline", len)
+    registry.register("pooled", len, blocking=True, backend="bench-overhead")
+    for name in ("inline", "pooled"):
+        func = registry[name]
+        start = time.perf_counter()
+        for _ in range(20000):
+            func("A1")
+        print(f"{name:<8} {(time.perf_counter() - start) / 20000 * 1e6:6.2f} us/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+增量语法分析测试
+作用：在合成的大脚本中修改一个意图块，对比完整重新解析与意图粒度增量解析的耗时
+用法：python benchmarks/bench_incremental_parse.py [--intents N] [--repeat N]
+"""
+
+import sys
+import argparse
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser, IncrementalParser
+from benchmarks.bench_parser_memory import synthetic_script
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--intents", type=int, default=500)
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    args = arg_parser.parse_args()
+    
+    text = synthetic_script(args.intents)
+    middle = f'"模式{args.intents // 2}"'
+    edits = [text.replace(middle, f'"模式{args.intents // 2}_{n}"') for n in range(args.repeat)]
+    
+    start = time.perf_counter()
+    for edited in edits:
+        Parser(Lexer(edited, engine='regex')).parse()
+    full = (time.perf_counter() - start) / len(edits)
+    
+    parser = IncrementalParser()
+    parser.parse(text)
+    start = time.perf_counter()
+    for edited in edits:
+        parser.parse(edited)
+    incremental = (time.perf_counter() - start) / len(edits)
+    
+    print(f"intents: {args.intents}, reparsed per edit: {parser.last_reparsed}")
+    print(f"full parse:        {full * 1000:8.2f} ms")
+    print(f"incremental parse: {incremental * 1000:8.2f} ms  ({full / incremental:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
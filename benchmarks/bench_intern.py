@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+字符串驻留效果统计
+作用：同时加载scripts/下的所有脚本，统计AST中字符串的出现次数与实际对象数，
+      估算驻留（标识符、意图模式、字符串字面量共享同一对象）节省的内存
+用法：python benchmarks/bench_intern.py
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser, ASTNode
+
+
+def node_fields(node: ASTNode):
+    """AST节点的所有字段值"""
+    if hasattr(node, "__dict__"):
+        return list(vars(node).values())
+    return [getattr(node, name) for cls in type(node).__mro__ for name in getattr(cls, "__slots__", ())]
+
+
+def iter_strings(obj):
+    """递归产生AST中的所有字符串"""
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            yield from iter_strings(item)
+    elif isinstance(obj, ASTNode):
+        for value in node_fields(obj):
+            yield from iter_strings(value)
+
+
+def main():
+    programs = []
+    for path in sorted((project_root / "scripts").glob("*.dsl")):
+        text = path.read_text(encoding="utf-8")
+        try:
+            programs.append(Parser(Lexer(text, engine="regex")).parse())
+        except SyntaxError as e:
+            print(f"跳过 {path.name}: {e}")
+    
+    occurrences = list(iter_strings(programs))
+    distinct = {id(s): s for s in occurrences}
+    occurrence_bytes = sum(sys.getsizeof(s) for s in occurrences)
+    distinct_bytes = sum(sys.getsizeof(s) for s in distinct.values())
+    
+    print(f"脚本数: {len(programs)}, 意图数: {sum(len(p.intents) for p in programs)}")
+    print(f"字符串出现次数: {len(occurrences)}, 实际字符串对象: {len(distinct)}")
+    print(f"不驻留时: {occurrence_bytes / 1024:.1f}KB, 驻留后: {distinct_bytes / 1024:.1f}KB, "
+          f"节省 {(occurrence_bytes - distinct_bytes) / 1024:.1f}KB "
+          f"({(1 - distinct_bytes / occurrence_bytes) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+词法分析器性能测试
+作用：对比逐字符引擎（char）、主正则引擎（regex）与语法分析器实际使用的紧凑扫描（tokenize_compact）的速度，
+      以及Token列表与紧凑TokenBuffer的内存
+用法：python benchmarks/bench_lexer.py [--repeat N]
+"""
+
+import sys
+import time
+import tracemalloc
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+
+
+def load_merged_scripts(copies: int) -> str:
+    """将scripts/下的所有脚本合并，并复制copies份，模拟combined.dsl式的大脚本"""
+    scripts = sorted((project_root / "scripts").glob("*.dsl"))
+    merged = "\n".join(path.read_text(encoding="utf-8") for path in scripts)
+    return "\n".join([merged] * copies)
+
+
+def long_template_script(intents: int, template_length: int) -> str:
+    """生成带超长response模板的脚本，用于观察长字符串字面量上的表现"""
+    template = "这是一段很长的回复模板{order_number}，" * (template_length // 20)
+    return "\n".join(
+        f'intent "意图{i}" {{\n    when user_says "模式{i}" {{\n        response "{template}"\n    }}\n}}\n'
+        for i in range(intents)
+    )
+
+
+def best_time(text: str, engine: str, repeat: int) -> float:
+    """多次运行取最短耗时，engine为compact时测量tokenize_compact()"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if engine == "compact":
+            Lexer(text, engine="regex").tokenize_compact()
+        else:
+            Lexer(text, engine=engine).tokenize()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def token_memory(text: str, compact: bool):
+    """返回(Token占用的字节数, 分配次数)，不含源代码本身"""
+    lexer = Lexer(text, engine="regex")
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tokens = lexer.tokenize_compact() if compact else lexer.tokenize()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in stats)
+    count = sum(stat.count_diff for stat in stats)
+    del tokens
+    return size, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lexer引擎性能对比")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    cases = [
+        ("合并脚本 x20", load_merged_scripts(20)),
+        ("长模板脚本 200x4KB", long_template_script(200, 4000)),
+    ]
+    for name, text in cases:
+        char_time = best_time(text, "char", args.repeat)
+        regex_time = best_time(text, "regex", args.repeat)
+        compact_time = best_time(text, "compact", args.repeat)
+        print(f"{name}: {len(text)} 字符, char {char_time * 1000:.1f}ms, "
+              f"regex {regex_time * 1000:.1f}ms（{char_time / regex_time:.1f}x）, "
+              f"compact {compact_time * 1000:.1f}ms（{char_time / compact_time:.1f}x）")
+    
+    text = cases[0][1]
+    list_size, list_count = token_memory(text, compact=False)
+    buffer_size, buffer_count = token_memory(text, compact=True)
+    print(f"Token内存: 列表 {list_size / 1024:.0f}KB/{list_count}次分配, "
+          f"TokenBuffer {buffer_size / 1024:.0f}KB/{buffer_count}次分配, "
+          f"节省 {list_size / buffer_size:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
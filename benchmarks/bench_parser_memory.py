@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+语法分析内存测试
+作用：在合成的大脚本上对比列表模式与流式模式（分块读取+按需拉取Token）的峰值内存
+用法：python benchmarks/bench_parser_memory.py [--intents N]
+"""
+
+import sys
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def synthetic_script(intents: int) -> str:
+    """生成包含intents个意图的合成脚本"""
+    block = '''intent "意图{i}" {{
+    when user_says "模式{i}" or "说法{i}" {{
+        ask "请输入订单号"
+        wait_for order_number
+        set status = get_order_status(order_number)
+        response "您的订单 {{order_number}} 状态是：{{status}}"
+    }}
+}}
+'''
+    return "".join(block.format(i=i) for i in range(intents))
+
+
+def peak_memory_kb() -> int:
+    """当前进程的峰值内存（KB），不支持resource模块的平台退回到tracemalloc"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except ImportError:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] // 1024
+
+
+def run_mode(mode: str, script_path: str):
+    """在子进程中执行：解析脚本并输出峰值内存"""
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+    from src.lexer import Lexer, ChunkedLexer
+    from src.parser import Parser
+    
+    if mode == "list":
+        with open(script_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        program = Parser(Lexer(text, engine="regex")).parse()
+    else:
+        program = Parser(ChunkedLexer.from_file(script_path), streaming=True).parse()
+    print(f"{len(program.intents)} {peak_memory_kb()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表模式与流式模式的峰值内存对比")
+    parser.add_argument("--intents", type=int, default=50000)
+    parser.add_argument("--run-mode", choices=["list", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--script", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run_mode:
+        run_mode(args.run_mode, args.script)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        script_path = Path(tmp) / "synthetic.dsl"
+        script_path.write_text(synthetic_script(args.intents), encoding="utf-8")
+        size_mb = script_path.stat().st_size / 1024 / 1024
+        print(f"合成脚本: {args.intents} 个意图, {size_mb:.1f}MB")
+        for mode in ("list", "stream"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--run-mode", mode, "--script", str(script_path)],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            print(f"{mode:>6}: {output[0]} 个意图, 峰值内存 {int(output[1]) / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
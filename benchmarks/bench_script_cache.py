@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+编译缓存测试
+作用：对比完整编译（词法分析+语法分析）与读取.dslc编译缓存加载同一脚本的耗时
+用法：python benchmarks/bench_script_cache.py [--intents N] [--repeat N]
+"""
+
+import sys
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.script_cache import load_program
+from benchmarks.bench_parser_memory import synthetic_script
+
+
+def best_of(repeat, func):
+    """返回多次运行中的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--intents", type=int, default=0, help="额外测试的合成脚本意图数量（0表示不测试）")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+    
+    sources = {name: (project_root / "scripts" / name).read_text(encoding="utf-8")
+               for name in ("enhanced.dsl", "combined.dsl")}
+    if args.intents:
+        sources[f"synthetic_{args.intents}.dsl"] = synthetic_script(args.intents)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'script':<24}{'compile ms':>12}{'cached ms':>12}{'speedup':>10}")
+        for name, source in sources.items():
+            path = Path(tmp) / name
+            path.write_text(source, encoding="utf-8")
+            compile_time = best_of(args.repeat, lambda: load_program(str(path), use_cache=False))
+            load_program(str(path))
+            cached_time = best_of(args.repeat, lambda: load_program(str(path)))
+            print(f"{name:<24}{compile_time * 1000:>12.2f}{cached_time * 1000:>12.2f}{compile_time / cached_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+会话存储测试
+作用：在enhanced.dsl上测量会话快照的大小、保存快照和从快照恢复会话（包括重建暂停的执行）的耗时，
+      以及SQLite后端组提交与每次写入单独提交的写入吞吐量
+用法：python benchmarks/bench_session_store.py [--sessions N]
+"""
+
+import sys
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser, WaitForAction
+from src.interpreter import Interpreter
+from src.sessions import SessionManager
+from src.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def create_manager(program, store):
+    interpreter = Interpreter(engine="closure")
+    interpreter.interpret(program)
+    interpreter.set_output_callback(lambda message: None)
+    return SessionManager(interpreter, max_sessions=None, store=store)
+
+
+def fill(manager, program, count):
+    """每个会话执行全部意图，最后暂停在一个wait_for处"""
+    suspend = next(intent for intent in program.intents
+                   if any(isinstance(action, WaitForAction) for action in intent.actions))
+    for i in range(count):
+        session_id = f"user-{i}"
+        for intent in program.intents:
+            result = manager.execute_intent(session_id, intent)
+            while not isinstance(result, dict):
+                result = manager.send_input(session_id, "12345")
+        manager.execute_intent(session_id, suspend)
+
+
+def write_throughput(path, program, count, batch_size):
+    """返回每秒写入的会话快照数"""
+    store = SQLiteSessionStore(path, batch_size=batch_size, flush_interval=None)
+    manager = create_manager(program, None)
+    fill(manager, program, 1)
+    data = manager.get("user-0").dump()
+    start = time.perf_counter()
+    for i in range(count):
+        store.save(f"user-{i}", data)
+    store.close()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sessions", type=int, default=2000)
+    args = arg_parser.parse_args()
+    logging.disable(logging.INFO)
+
+    text = (project_root / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(text)).parse()
+
+    store = MemorySessionStore()
+    fill(create_manager(program, store), program, args.sessions)
+    sizes = [len(data) for data in store.snapshots.values()]
+    print(f"快照大小: 平均 {sum(sizes) / len(sizes):.0f} 字节")
+
+    manager = create_manager(program, store)
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        manager.get(f"user-{i}")
+    elapsed = time.perf_counter() - start
+    print(f"恢复会话（含重建暂停的执行）: {elapsed / args.sessions * 1e6:.1f} us/会话")
+
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        manager.get(f"user-{i}").dump()
+    elapsed = time.perf_counter() - start
+    print(f"保存快照: {elapsed / args.sessions * 1e6:.1f} us/会话")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (1, 256):
+            rate = write_throughput(Path(tmp) / f"sessions_{batch_size}.db", program, args.sessions, batch_size)
+            print(f"SQLite写入（每批 {batch_size:>3} 条提交一次）: {rate:10.0f} 次/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+多会话测试
+作用：在enhanced.dsl上对比每个用户一个解释器与SessionManager共享一个解释器时，
+      每个会话（执行过一轮意图后空闲）占用的内存，以及SessionManager换入换出会话状态后执行意图的耗时；
+      再让每个会话执行多轮意图，对比对话历史中回复保存为模板引用与保存为渲染后文本的内存
+用法：python benchmarks/bench_sessions.py [--sessions N] [--turns N]
+"""
+
+import sys
+import argparse
+import logging
+import time
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.sessions import SessionManager
+
+
+def create_interpreter(program, engine):
+    interpreter = Interpreter(engine=engine)
+    interpreter.interpret(program)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.set_user_input_callback(lambda name: "12345")
+    return interpreter
+
+
+def measure(create, count):
+    """创建count个会话，返回每个会话平均占用的内存（字节）和创建耗时（秒）"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    sessions = create(count)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return size / count, elapsed / count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sessions", type=int, default=20000)
+    arg_parser.add_argument("--engine", default="closure")
+    arg_parser.add_argument("--turns", type=int, default=20)
+    args = arg_parser.parse_args()
+    logging.disable(logging.INFO)
+
+    text = (project_root / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(text)).parse()
+    # 每个会话执行一轮不含wait_for的意图后空闲
+    intent = next(intent for intent in program.intents
+                  if all(type(action).__name__ != "WaitForAction" for action in intent.actions))
+
+    def per_interpreter(count):
+        interpreters = []
+        for _ in range(count):
+            interpreter = create_interpreter(program, args.engine)
+            interpreter.execute_intent(intent)
+            interpreters.append(interpreter)
+        return interpreters
+
+    def shared(count):
+        manager = SessionManager(create_interpreter(program, args.engine), max_sessions=None)
+        for i in range(count):
+            manager.execute_intent(f"user-{i}", intent)
+        return manager
+
+    count = min(args.sessions, 2000)
+    size, elapsed = measure(per_interpreter, count)
+    print(f"{'每个用户一个解释器':<20} {size / 1024:8.1f} KB/会话  {elapsed * 1e6:9.1f} us/会话（{count}个会话）")
+    size, elapsed = measure(shared, args.sessions)
+    print(f"{'SessionManager':<20} {size / 1024:8.1f} KB/会话  {elapsed * 1e6:9.1f} us/会话（{args.sessions}个会话）")
+
+    # 多轮对话后每个会话占用的内存：回复保存为模板引用（BotTurn），或替换为渲染后的文本（之前的保存方式）
+    intents = [intent for intent in program.intents
+               if all(type(action).__name__ != "WaitForAction" for action in intent.actions)]
+
+    def conversations(rendered):
+        def create(count):
+            manager = SessionManager(create_interpreter(program, args.engine), max_sessions=None)
+            for i in range(count):
+                session_id = f"user-{i}"
+                for turn in range(args.turns):
+                    manager.execute_intent(session_id, intents[(i + turn) % len(intents)])
+                    if rendered:
+                        messages = manager.get(session_id).conversation_history.messages
+                        messages[-1] = {"role": "bot", "content": messages[-1]["content"]}
+            return manager
+        return create
+
+    count = min(args.sessions, 2000)
+    for label, rendered in (("回复保存为文本", True), ("回复保存为模板引用", False)):
+        size, _ = measure(conversations(rendered), count)
+        print(f"{label:<20} {size / 1024:8.2f} KB/会话（{args.turns}轮对话）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+模板渲染测试
+作用：在enhanced.dsl的response/ask模板上，对比原实现（每次正则替换）、解析时编译的模板、
+      加载时常量折叠后的模板、以及折叠后再绑定到变量槽位编号的模板的渲染耗时
+用法：python benchmarks/bench_templates.py [--repeat N]
+"""
+
+import sys
+import argparse
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.lexer import Lexer
+from src.parser import Parser, AskAction, ResponseAction
+from src.interpreter import Interpreter
+
+
+def legacy_format_template(self, template: str) -> str:
+    """原 Interpreter._format_template 的实现（每次渲染都做正则替换和参数解析）"""
+    import re
+    
+    def replace_expr(match):
+        """替换匹配的表达式"""
+        expr_str = match.group(1)  # 获取 { } 中的内容
+        
+        # 首先尝试作为变量名
+        if expr_str in self.variables:
+            return str(self.variables[expr_str])
+        
+        # 特殊变量：last_intent
+        if expr_str == "last_intent" and hasattr(self, 'last_intent'):
+            return str(self.last_intent or "默认")
+        
+        # 如果不是变量，尝试解析为表达式（函数调用等）
+        try:
+            # 尝试解析为函数调用，例如 get_order_status(order_number)
+            # 简单的函数调用解析
+            if '(' in expr_str and ')' in expr_str:
+                func_match = re.match(r'(\w+)\s*\((.*)\)', expr_str)
+                if func_match:
+                    func_name = func_match.group(1)
+                    args_str = func_match.group(2).strip()
+                    
+                    # 解析参数
+                    args = []
+                    if args_str:
+                        # 简单的参数解析（支持变量名和特殊变量）
+                        for arg in args_str.split(','):
+                            arg = arg.strip()
+                            # 移除引号（如果是字符串字面量）
+                            if (arg.startswith('"') and arg.endswith('"')) or (arg.startswith("'") and arg.endswith("'")):
+                                args.append(arg[1:-1])
+                            # 如果是变量，获取变量值
+                            elif arg in self.variables:
+                                args.append(self.variables[arg])
+                            # 特殊变量：last_intent
+                            elif arg == "last_intent" and hasattr(self, 'last_intent'):
+                                args.append(self.last_intent or "默认")
+                            else:
+                                # 否则作为字符串字面量
+                                args.append(arg)
+                    
+                    # 调用函数
+                    if func_name in self.functions:
+                        result = self.functions[func_name](*args)
+                        return str(result)
+            
+            # 如果无法解析，返回原始表达式
+            return match.group(0)
+        except Exception as e:
+            # 如果解析失败，返回原始表达式
+            return match.group(0)
+    
+    # 使用正则表达式找到所有 {expression} 并替换
+    pattern = r'\{([^}]+)\}'
+    result = re.sub(pattern, replace_expr, template)
+    return result
+
+# 内置函数实现
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=2000)
+    args = arg_parser.parse_args()
+    
+    text = (project_root / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(text)).parse()
+    actions = [action for intent in program.intents for action in intent.actions
+               if isinstance(action, (AskAction, ResponseAction))]
+    templates = [(action.message if isinstance(action, AskAction) else action.template, action.compiled)
+                 for action in actions]
+    
+    interpreter = Interpreter()
+    interpreter.last_intent = "订单查询"
+    for name in ("order_number", "order_status", "refund_id", "ticket_id", "coupon",
+                 "recommendation", "account_status", "feedback_id", "discount_info"):
+        interpreter.variables[name] = "123456"
+    
+    for source, compiled in templates:
+        assert compiled.render(interpreter.variables, interpreter.functions, interpreter.last_intent) == \
+            legacy_format_template(interpreter, source), source
+    
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for source, _ in templates:
+            legacy_format_template(interpreter, source)
+    legacy_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    variables, functions, last_intent = dict(interpreter.variables), interpreter.functions, interpreter.last_intent
+    for _ in range(args.repeat):
+        for _, compiled in templates:
+            compiled.render(variables, functions, last_intent)
+    compiled_time = time.perf_counter() - start
+    
+    # 加载时常量折叠（参数为常量的纯函数调用）
+    interpreter.last_context = dict(interpreter.variables)
+    folded_map = interpreter.fold_templates(program)
+    interpreter.folded_templates = folded_map
+    folded = [folded_map.get(compiled, compiled) for _, compiled in templates]
+    for (source, _), compiled in zip(templates, folded):
+        assert compiled.render(variables, functions, last_intent) == legacy_format_template(interpreter, source), source
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for compiled in folded:
+            compiled.render(variables, functions, last_intent)
+    folded_time = time.perf_counter() - start
+    
+    # 绑定到槽位编号（按下标取变量）
+    bound = [interpreter.bound_template(compiled) for _, compiled in templates]
+    table = interpreter.variables
+    for (source, _), template in zip(templates, bound):
+        assert template.render(table, functions, last_intent) == legacy_format_template(interpreter, source), source
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for template in bound:
+            template.render(table, functions, last_intent)
+    bound_time = time.perf_counter() - start
+    
+    renders = args.repeat * len(templates)
+    print(f"templates: {len(templates)}, renders: {renders}, folded templates: {len(folded_map)}")
+    print(f"regex per render: {legacy_time / renders * 1e6:8.2f} us")
+    print(f"compiled:         {compiled_time / renders * 1e6:8.2f} us  ({legacy_time / compiled_time:.1f}x)")
+    print(f"compiled+folded:  {folded_time / renders * 1e6:8.2f} us  ({legacy_time / folded_time:.1f}x)")
+    print(f"folded+slots:     {bound_time / renders * 1e6:8.2f} us  ({legacy_time / bound_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
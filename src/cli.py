@@ -6,14 +6,17 @@
 
 import sys
 import os
+import asyncio
 from pathlib import Path
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.lexer import Lexer
-from src.parser import Parser
+from src.loader import load_scripts
+from src.modules import ModuleCache
+from src.reloader import ScriptReloader
+from src.transpiler import load_module
 from src.interpreter import Interpreter
 from src.llm_client import create_llm_client
 from src.logger import setup_logger
@@ -22,22 +25,67 @@ from src.logger import setup_logger
 logger = setup_logger("DSL_Agent_CLI")
 
 
-def load_script(file_path: str) -> str:
-    """加载DSL脚本文件"""
-    try:
-        logger.info(f"开始加载DSL脚本文件: {file_path}")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        logger.info(f"成功加载脚本文件，文件大小: {len(content)} 字符")
-        return content
-    except FileNotFoundError:
+def compile_script(file_path: str, module_cache: ModuleCache):
+    """
+    加载并编译单个DSL脚本及其导入的脚本（编译缓存有效时直接加载，跳过词法分析和语法分析）
+    :param module_cache: 模块缓存，之后交给热重载继续使用，未变化的脚本不再重新解析
+    """
+    if not os.path.isfile(file_path):
         logger.error(f"文件不存在: {file_path}")
         print(f"错误: 文件不存在: {file_path}")
         sys.exit(1)
-    except Exception as e:
+    
+    print("[*] 编译脚本中...")
+    logger.info("开始编译脚本")
+    try:
+        program = module_cache.load(file_path)
+    except SyntaxError as e:
+        logger.error(f"脚本编译错误: {e}", exc_info=True)
+        print(f"[ERROR] 脚本编译错误: {e}")
+        sys.exit(1)
+    except OSError as e:
         logger.error(f"无法读取文件 {file_path}: {e}", exc_info=True)
         print(f"错误: 无法读取文件: {e}")
         sys.exit(1)
+    imports = module_cache.modules[module_cache.normalize(file_path)].imports
+    logger.info(f"编译完成，导入 {len(imports)} 个脚本，共 {len(program.intents)} 个意图")
+    print(f"[OK] 编译完成，共 {len(program.intents)} 个意图" +
+          (f"（已合并 {len(imports)} 个导入的脚本）" if imports else ""))
+    return program
+
+
+def load_script_directory(dir_path: str):
+    """并行编译目录下的所有DSL脚本并合并为一个程序"""
+    print("[*] 并行编译目录中的脚本...")
+    logger.info(f"开始编译脚本目录: {dir_path}")
+    try:
+        result = load_scripts(dir_path)
+    except SyntaxError as e:
+        logger.error(f"脚本编译错误: {e}", exc_info=True)
+        print(f"[ERROR] 脚本编译错误: {e}")
+        sys.exit(1)
+    for path, elapsed in result.timings.items():
+        print(f"    {Path(path).name}: {elapsed * 1000:.1f}ms")
+    for name, kept, dropped in result.duplicate_intents:
+        print(f"[!] 重复的意图 '{name}'：使用 {Path(kept).name}，忽略 {Path(dropped).name}")
+    for pattern, first, second in result.overlapping_patterns:
+        print(f"[!] 触发模式 '{pattern}' 同时属于意图 '{first}' 和 '{second}'")
+    print(f"[OK] 编译完成，共 {len(result.timings)} 个脚本、{len(result.program.intents)} 个意图")
+    return result.program
+
+
+def load_compiled_module(file_path: str):
+    """加载脚本的预编译Python模块（aot引擎），模块过期时先重新生成"""
+    print("[*] 加载预编译模块...")
+    logger.info(f"开始加载预编译模块: {file_path}")
+    try:
+        module = load_module(file_path)
+    except (SyntaxError, OSError) as e:
+        logger.error(f"脚本编译错误: {e}", exc_info=True)
+        print(f"[ERROR] 脚本编译错误: {e}")
+        sys.exit(1)
+    print(f"[OK] 已加载预编译模块，共 {len(module.PROGRAM.intents)} 个意图")
+    return module
 
 
 def main():
@@ -48,9 +96,13 @@ def main():
     
     if len(sys.argv) < 2:
         logger.warning("命令行参数不足，显示使用说明")
-        print("用法: python src/cli.py <script_file> [--llm-client <type>]")
+        print("用法: python src/cli.py <script_file|script_dir> [--llm-client <type>] [--watch] [--engine tree|closure|aot]")
         print("示例: python src/cli.py scripts/order_query.dsl")
+        print("示例: python src/cli.py scripts/  （并行加载目录下的所有脚本）")
         print("示例: python src/cli.py scripts/order_query.dsl --llm-client zhipuai")
+        print("示例: python src/cli.py scripts/order_query.dsl --watch  （脚本修改后自动热重载）")
+        print("示例: python src/cli.py scripts/order_query.dsl --engine closure  （使用预编译闭包执行意图）")
+        print("示例: python src/cli.py scripts/order_query.dsl --engine aot  （执行dslc生成的Python模块）")
         print("支持的LLM类型: zhipuai(智谱AI)")
         print("\n注意: 本项目要求使用API进行意图识别，必须配置 ZHIPUAI_API_KEY")
         print("配置方法: 创建 .env 文件，添加 ZHIPUAI_API_KEY=your_key")
@@ -95,36 +147,21 @@ def main():
     print(f"[*] LLM客户端: {llm_client_type}")
     print("-" * 50)
     
-    # 加载脚本
-    script_content = load_script(script_file)
-    
-    # 词法分析
-    print("[*] 词法分析中...")
-    logger.info("开始词法分析")
-    lexer = Lexer(script_content)
-    try:
-        tokens = lexer.tokenize()
-        logger.info(f"词法分析完成，共生成 {len(tokens)} 个Token")
-        print(f"[OK] 词法分析完成，共 {len(tokens)} 个Token")
-    except SyntaxError as e:
-        logger.error(f"词法分析错误: {e}", exc_info=True)
-        print(f"[ERROR] 词法分析错误: {e}")
-        sys.exit(1)
+    engine = None
+    if "--engine" in sys.argv:
+        idx = sys.argv.index("--engine")
+        if idx + 1 < len(sys.argv):
+            engine = sys.argv[idx + 1]
     
-    # 语法分析
-    print("[*] 语法分析中...")
-    logger.info("开始语法分析")
-    # 重新创建lexer，因为之前的lexer已经被消耗了
-    lexer = Lexer(script_content)
-    parser = Parser(lexer)
-    try:
-        program = parser.parse()
-        logger.info(f"语法分析完成，共解析出 {len(program.intents)} 个意图")
-        print(f"[OK] 语法分析完成，共 {len(program.intents)} 个意图")
-    except SyntaxError as e:
-        logger.error(f"语法分析错误: {e}", exc_info=True)
-        print(f"[ERROR] 语法分析错误: {e}")
-        sys.exit(1)
+    module = None
+    module_cache = ModuleCache()
+    if Path(script_file).is_dir():
+        program = load_script_directory(script_file)
+    elif (engine or os.getenv("DSL_INTERPRETER_ENGINE")) == "aot":
+        module = load_compiled_module(script_file)
+        program = module.PROGRAM
+    else:
+        program = compile_script(script_file, module_cache)
     
     # 创建LLM客户端
     print("[*] 初始化LLM客户端...")
@@ -140,9 +177,17 @@ def main():
     
     # 创建解释器
     logger.info("创建解释器实例")
-    interpreter = Interpreter(llm_client)
+    try:
+        interpreter = Interpreter(llm_client, engine=engine)
+    except ValueError as e:
+        logger.error(f"解释器创建失败: {e}")
+        print(f"[ERROR] {e}，支持的执行引擎: {', '.join(Interpreter.ENGINES)}")
+        sys.exit(1)
+    logger.info(f"解释器执行引擎: {interpreter.engine}")
     # 通过interpret方法初始化，确保intents正确设置
     interpreter.interpret(program)
+    if module is not None:
+        interpreter.load_module(module)
     
     # 设置用户输入回调
     def get_user_input(prompt: str) -> str:
@@ -151,12 +196,37 @@ def main():
     
     interpreter.set_user_input_callback(get_user_input)
     
+    # 热重载：脚本变化时在后台重新编译，只替换解释器使用的程序，保留对话状态
+    if "--watch" in sys.argv:
+        def on_reload(new_program):
+            if module is not None:
+                # 重新生成并加载预编译模块
+                interpreter.load_module(load_module(script_file))
+            else:
+                interpreter.swap_program(new_program)
+            print(f"\n[*] 脚本已更新，共 {len(new_program.intents)} 个意图")
+        
+        def on_reload_error(error):
+            print(f"\n[!] 脚本更新失败，继续使用旧版本: {error}")
+        
+        reloader = ScriptReloader(script_file, on_reload, on_error=on_reload_error, module_cache=module_cache)
+        reloader.start()
+        logger.info("已启用脚本热重载")
+        print("[OK] 已启用脚本热重载")
+    
     print("-" * 50)
     print("[*] 系统就绪，请输入您的问题（输入 'quit' 退出）")
     print("-" * 50)
     logger.info("系统初始化完成，进入交互模式")
     
-    # 交互循环
+    asyncio.run(chat(interpreter))
+
+
+async def chat(interpreter: Interpreter):
+    """
+    交互循环：在事件循环中等待LLM意图识别和意图执行（工作线程中进行），
+    命令行只有一个对话，读取输入时直接阻塞
+    """
     while True:
         try:
             user_input = input("\n您: ").strip()
@@ -174,7 +244,7 @@ def main():
             # 意图识别
             print("[*] 识别意图中...")
             logger.debug("开始意图识别")
-            matched_intent = interpreter.match_intent(user_input)
+            matched_intent = await interpreter.match_intent_async(user_input)
             
             if not matched_intent:
                 logger.warning(f"未能识别用户意图，输入: {user_input}")
@@ -192,7 +262,7 @@ def main():
             
             # 执行意图
             logger.debug(f"开始执行意图: {matched_intent.name}")
-            result = interpreter.execute_intent(matched_intent)
+            result = await interpreter.execute_intent_async(matched_intent)
             logger.debug(f"意图执行完成: {matched_intent.name}")
             
         except KeyboardInterrupt:
@@ -0,0 +1,193 @@
+"""
+内置函数注册表（FunctionRegistry）
+作用：登记脚本可调用的内置函数及其声明：是否为纯函数、是否阻塞、超时时间、失败时的回退值和所属后端；
+      阻塞的函数在所属后端的有界线程池中执行，每个函数自动统计调用次数、错误、超时和耗时
+在全项目中的作用：解释器的函数表（Interpreter.functions）就是注册表，三种执行引擎和模板照常按名称取得函数并调用；
+                  接入真实后端后，一个缓慢的后端（订单、退款、工单）只占满自己的线程池，不会拖住其他后端的调用
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, Optional
+
+from src.logger import setup_logger
+
+# 初始化日志记录器
+logger = setup_logger("DSL_Agent_Functions")
+
+# 未声明回退值（回退值可以是None）
+NO_FALLBACK = object()
+# 未声明后端的阻塞函数使用的线程池
+DEFAULT_BACKEND = "default"
+# 每个后端线程池的默认线程数
+DEFAULT_POOL_SIZE = 8
+# 计算耗时分位数时保留的最近调用次数
+LATENCY_SAMPLES = 1024
+
+# 后端名称 -> 线程池（全进程共享：后端是进程级的资源，多个解释器调用同一后端时共用一个上限）
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pool_sizes: Dict[str, int] = {}
+_pools_lock = threading.Lock()
+
+
+def declare(*, pure: bool = False, blocking: bool = False, timeout: Optional[float] = None,
+            fallback: Any = NO_FALLBACK, backend: str = DEFAULT_BACKEND) -> Callable[[Callable], Callable]:
+    """
+    声明内置函数的属性（注册时读取，注册时传入的参数优先）
+    :param pure: 纯函数：返回值只取决于参数，没有副作用（参数全部为常量的调用在加载程序时折叠）
+    :param blocking: 会阻塞（网络或数据库I/O），在所属后端的线程池中执行
+    :param timeout: 等待结果的秒数（只用于阻塞函数和异步函数），超时后使用回退值；
+                    已经开始的调用无法中断，超时后仍可能执行完成，不可重复执行的写操作（创建退款、工单）不要声明超时
+    :param fallback: 出错或超时时返回的值，未声明时抛出异常
+    :param backend: 所属后端，决定使用哪个线程池
+    """
+    def decorator(func: Callable) -> Callable:
+        func.pure = pure
+        func.blocking = blocking
+        func.timeout = timeout
+        func.fallback = fallback
+        func.backend = backend
+        return func
+    return decorator
+
+
+def set_pool_size(backend: str, size: int):
+    """设置后端线程池的线程数（已创建的线程池在现有任务完成后关闭，下次调用时按新大小创建）"""
+    if size < 1:
+        raise ValueError("pool size must be at least 1")
+    with _pools_lock:
+        _pool_sizes[backend] = size
+        pool = _pools.pop(backend, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def backend_pool(backend: str) -> ThreadPoolExecutor:
+    """后端的线程池（第一次使用时创建）"""
+    pool = _pools.get(backend)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(backend)
+            if pool is None:
+                pool = ThreadPoolExecutor(_pool_sizes.get(backend, DEFAULT_POOL_SIZE),
+                                          thread_name_prefix=f"dsl-{backend}")
+                _pools[backend] = pool
+    return pool
+
+
+class FunctionStats:
+    """
+    内置函数的调用统计：调用次数、出错次数、超时次数（包含在出错次数中）、耗时（秒）
+    不加锁：同一个解释器的执行不会并发（SessionManager按锁逐个执行），偶尔少计一次不影响统计的用途
+    """
+    __slots__ = ('calls', 'errors', 'timeouts', 'total_time', 'max_time', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)  # 最近的调用耗时
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.samples.append(elapsed)
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def percentile(self, p: float) -> float:
+        """最近调用耗时的p分位数（0-100）"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    def __repr__(self):
+        return (f"FunctionStats(calls={self.calls}, errors={self.errors}, timeouts={self.timeouts}, "
+                f"mean={self.mean_time * 1e3:.3f}ms, max={self.max_time * 1e3:.3f}ms)")
+
+
+class BuiltinFunction:
+    """
+    注册后的内置函数：按声明执行（阻塞函数交给后端线程池并等待结果，最多等待timeout秒），
+    出错或超时时返回回退值（未声明回退值时抛出异常），并记录调用统计
+    与原函数一样直接调用；pure属性供加载程序时的常量折叠判断
+    """
+    __slots__ = ('name', 'func', 'pure', 'blocking', 'timeout', 'fallback', 'backend', 'stats')
+
+    def __init__(self, name: str, func: Callable, pure: bool = False, blocking: bool = False,
+                 timeout: Optional[float] = None, fallback: Any = NO_FALLBACK, backend: str = DEFAULT_BACKEND):
+        self.name = name
+        self.func = func
+        self.pure = pure
+        self.blocking = blocking
+        self.timeout = timeout
+        self.fallback = fallback
+        self.backend = backend
+        self.stats = FunctionStats()
+
+    def __call__(self, *args) -> Any:
+        stats = self.stats
+        start = time.perf_counter()
+        try:
+            if self.blocking:
+                future = backend_pool(self.backend).submit(self.func, *args)
+                try:
+                    return future.result(self.timeout)
+                except FutureTimeoutError:
+                    # 还在排队的调用不再执行；已经开始的调用无法中断，在线程池中执行完后丢弃结果
+                    if future.cancel():
+                        raise TimeoutError(f"内置函数 {self.name} 超时（{self.timeout}秒），调用未执行") from None
+                    raise TimeoutError(f"内置函数 {self.name} 超时（{self.timeout}秒），"
+                                       f"调用已开始，结果未知（可能已执行完成）") from None
+            return self.func(*args)
+        except Exception as e:
+            stats.errors += 1
+            if isinstance(e, TimeoutError):
+                stats.timeouts += 1
+            if self.fallback is NO_FALLBACK:
+                raise
+            logger.warning(f"内置函数 {self.name} 调用失败，使用回退值: {e}")
+            return self.fallback
+        finally:
+            stats.record(time.perf_counter() - start)
+
+    def __repr__(self):
+        return f"BuiltinFunction({self.name!r}, blocking={self.blocking}, backend={self.backend!r})"
+
+
+class FunctionRegistry(dict):
+    """
+    内置函数注册表：函数名 -> BuiltinFunction（也可以直接赋值普通的可调用对象，不做统计）
+    执行引擎和模板只使用dict的接口（get/下标）取得函数
+    """
+
+    def register(self, name: str, func: Callable, *, pure: Optional[bool] = None, blocking: Optional[bool] = None,
+                 timeout: Optional[float] = None, fallback: Any = NO_FALLBACK,
+                 backend: Optional[str] = None) -> BuiltinFunction:
+        """
+        注册内置函数，未传入的声明从函数上的declare/pure装饰器读取
+        :raises ValueError: 为非阻塞函数声明了超时（同步调用无法中断）
+        """
+        pure = getattr(func, 'pure', False) is True if pure is None else pure
+        blocking = getattr(func, 'blocking', False) if blocking is None else blocking
+        timeout = getattr(func, 'timeout', None) if timeout is None else timeout
+        fallback = getattr(func, 'fallback', NO_FALLBACK) if fallback is NO_FALLBACK else fallback
+        backend = getattr(func, 'backend', DEFAULT_BACKEND) if backend is None else backend
+        if timeout is not None and not blocking:
+            raise ValueError(f"内置函数 {name} 声明了超时，但不是阻塞函数（blocking=True）")
+        function = BuiltinFunction(name, func, pure, blocking, timeout, fallback, backend)
+        self[name] = function
+        return function
+
+    def stats(self) -> Dict[str, FunctionStats]:
+        """已注册函数的调用统计：函数名 -> FunctionStats"""
+        return {name: func.stats for name, func in self.items() if isinstance(func, BuiltinFunction)}
@@ -6,20 +6,20 @@
 
 import sys
 import os
+import asyncio
 import threading
 from pathlib import Path
 from tkinter import (
     Tk, Frame, Text, Entry, Button, Label, Scrollbar, 
-    filedialog, messagebox, ttk, StringVar, Toplevel, Canvas
+    filedialog, messagebox, ttk, StringVar, Canvas
 )
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.lexer import Lexer
-from src.parser import Parser
-from src.interpreter import Interpreter
+from src.modules import ModuleCache
+from src.interpreter import InputRequest, Interpreter
 from src.llm_client import create_llm_client
 from src.logger import setup_logger
 
@@ -128,9 +128,14 @@ class ChatGUI:
         self.program = None
         self.llm_client = None
         self.current_script_path = None
+        self.interpreter_script_path = None  # 当前解释器加载的脚本，重新加载同一脚本时热替换程序
+        self.module_cache = ModuleCache()  # 模块缓存：解析import声明，重新加载时只重新解析修改过的部分
         self.waiting_for_input = False
         self.input_variable = None
-        self.input_dialog = None
+        self.execution = None  # 在wait_for处暂停的意图执行（run_intent生成器），下一条消息作为输入继续执行
+        # 处理消息的事件循环（在一个后台线程中运行）：等待LLM和执行意图时不阻塞界面，也不为每条消息创建线程
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
         
         # 创建界面
         logger.debug("创建GUI组件")
@@ -293,22 +298,20 @@ class ChatGUI:
                 script_content = f.read()
             logger.info(f"脚本文件加载成功，大小: {len(script_content)} 字符")
             
-            # 词法分析
-            self.add_bot_message("正在进行词法分析...")
-            logger.debug("开始词法分析")
-            lexer = Lexer(script_content)
-            tokens = lexer.tokenize()
-            logger.info(f"词法分析完成，Token数量: {len(tokens)}")
+            # 编译脚本：首次加载优先使用编译缓存；重新加载时只重新解析修改过的脚本和意图块
+            self.add_bot_message("正在编译脚本...")
+            logger.debug("开始编译脚本")
+            program = self.module_cache.load(file_path)
+            logger.info(f"脚本编译完成，意图数量: {len(program.intents)}")
             
-            # 语法分析
-            self.add_bot_message("正在进行语法分析...")
-            logger.debug("开始语法分析")
-            lexer = Lexer(script_content)
-            parser = Parser(lexer)
-            program = parser.parse()
-            logger.info(f"语法分析完成，意图数量: {len(program.intents)}")
+            # 重新加载当前脚本时只替换程序，保留对话历史和上下文
+            if self.interpreter is not None and self.interpreter_script_path == file_path:
+                self.interpreter.swap_program(program)
+                self.program = program
+                self.root.after(0, lambda: self._on_script_loaded(len(program.intents)))
+                logger.info("脚本重新加载完成，对话状态已保留")
+                return
             
-            # 创建LLM客户端
             self.add_bot_message("正在初始化LLM客户端...")
             logger.debug("初始化LLM客户端")
             llm_client = create_llm_client("zhipuai")
@@ -319,19 +322,20 @@ class ChatGUI:
             interpreter = Interpreter(llm_client)
             interpreter.interpret(program)
             
-            # 设置用户输入回调
-            interpreter.set_user_input_callback(self.get_user_input_callback)
-            
             # 设置输出回调（用于显示ask、response、options等输出）
             interpreter.set_output_callback(self.on_interpreter_output)
             
             # 更新状态
             self.program = program
             self.interpreter = interpreter
+            self.interpreter_script_path = file_path
             self.llm_client = llm_client
+            self.execution = None
+            self.waiting_for_input = False
+            self.input_variable = None
             
             # 更新UI（必须在主线程）
-            self.root.after(0, lambda: self._on_script_loaded(len(tokens), len(program.intents)))
+            self.root.after(0, lambda: self._on_script_loaded(len(program.intents)))
             logger.info("脚本加载完成")
             
         except FileNotFoundError:
@@ -347,94 +351,14 @@ class ChatGUI:
             logger.error(f"发生错误: {e}", exc_info=True)
             self.root.after(0, lambda: self.add_bot_message(f"❌ 发生错误: {e}"))
     
-    def _on_script_loaded(self, token_count, intent_count):
+    def _on_script_loaded(self, intent_count):
         """脚本加载完成后的回调"""
         self.add_bot_message(
             f"✅ 脚本加载成功！\n"
-            f"Token数量: {token_count}\n"
             f"意图数量: {intent_count}\n"
             f"系统就绪，可以开始对话了！"
         )
     
-    def get_user_input_callback(self, variable: str) -> str:
-        """用户输入回调函数（用于wait_for）"""
-        import queue
-        
-        # 使用队列在线程间传递结果
-        result_queue = queue.Queue()
-        
-        def show_input_dialog():
-            """在主线程中显示输入对话框"""
-            dialog = Toplevel(self.root)
-            dialog.title("输入")
-            dialog.geometry("450x200")
-            dialog.resizable(False, False)
-            dialog.transient(self.root)
-            dialog.grab_set()
-            dialog.configure(bg='#FFFFFF')
-            
-            # 居中显示
-            dialog.update_idletasks()
-            x = (dialog.winfo_screenwidth() // 2) - (450 // 2)
-            y = (dialog.winfo_screenheight() // 2) - (200 // 2)
-            dialog.geometry(f"450x200+{x}+{y}")
-            
-            # 标题
-            title_label = Label(dialog, text=f"请输入 {variable}:", 
-                               font=('Microsoft YaHei', 12, 'bold'),
-                               bg='#FFFFFF', fg='#2c3e50')
-            title_label.pack(pady=20)
-            
-            # 输入框 - 莫兰迪风格
-            entry = Entry(dialog, font=('Microsoft YaHei', 11), width=40,
-                         relief='flat', bd=0, bg='#FFFFFF',
-                         highlightthickness=2, highlightcolor='#A8B5A0',
-                         highlightbackground='#D4D4D4', fg='#6B6B6B',
-                         insertbackground='#A8B5A0')
-            entry.pack(pady=12, padx=25, ipady=10, ipadx=15)
-            entry.focus()
-            
-            def on_ok():
-                result_queue.put(entry.get())
-                dialog.destroy()
-            
-            def on_cancel():
-                result_queue.put("")
-                dialog.destroy()
-            
-            # 按钮容器
-            btn_frame = Frame(dialog, bg='#FFFFFF')
-            btn_frame.pack(pady=18)
-            
-            Button(btn_frame, text="确定", command=on_ok, 
-                  bg='#A8B5A0', fg='white', width=10, relief='flat',
-                  font=('Microsoft YaHei', 10, 'bold'), padx=18, pady=9,
-                  cursor='hand2', activebackground='#95A390',
-                  bd=0, highlightthickness=0).pack(side='left', padx=12)
-            Button(btn_frame, text="取消", command=on_cancel, 
-                  bg='#C4C4C4', fg='white', width=10, relief='flat',
-                  font=('Microsoft YaHei', 10), padx=18, pady=9,
-                  cursor='hand2', activebackground='#B4B4B4',
-                  bd=0, highlightthickness=0).pack(side='left', padx=12)
-            
-            entry.bind('<Return>', lambda e: on_ok())
-            
-            def on_closing():
-                result_queue.put("")
-                dialog.destroy()
-            
-            dialog.protocol("WM_DELETE_WINDOW", on_closing)
-        
-        # 在主线程中显示对话框
-        self.root.after(0, show_input_dialog)
-        
-        # 等待用户输入
-        try:
-            result = result_queue.get(timeout=300)
-            return result if result else ""
-        except queue.Empty:
-            return ""
-    
     def on_interpreter_output(self, message: str):
         """解释器输出回调（用于显示ask、response、options等）"""
         # 移除"[机器人]"前缀（如果存在）
@@ -467,15 +391,22 @@ class ChatGUI:
         self.add_user_message(user_input)
         self.input_entry.delete(0, 'end')
         
-        # 在新线程中处理意图识别和执行
-        threading.Thread(target=self._process_message, args=(user_input,), daemon=True).start()
+        # 有意图在wait_for处等待输入时，这条消息作为输入继续执行该意图
+        if self.waiting_for_input:
+            self.waiting_for_input = False
+            asyncio.run_coroutine_threadsafe(
+                self.interpreter.run_in_worker(self._advance_execution, user_input), self.loop)
+            return
+        
+        # 在事件循环中处理意图识别和执行
+        asyncio.run_coroutine_threadsafe(self._process_message(user_input), self.loop)
     
-    def _process_message(self, user_input: str):
-        """在后台线程中处理消息"""
+    async def _process_message(self, user_input: str):
+        """在事件循环中处理消息"""
         try:
             logger.debug("开始处理用户消息")
             # 意图识别
-            matched_intent = self.interpreter.match_intent(user_input)
+            matched_intent = await self.interpreter.match_intent_async(user_input)
             
             if not matched_intent:
                 logger.warning(f"未能识别用户意图: {user_input}")
@@ -485,9 +416,9 @@ class ChatGUI:
                 return
             
             logger.info(f"识别到意图: {matched_intent.name}")
-            # 执行意图（response会通过output_callback显示）
-            self.interpreter.execute_intent(matched_intent)
-            logger.debug("消息处理完成")
+            # 执行意图（response会通过output_callback显示），遇到wait_for时暂停，不占用线程等待输入
+            self.execution = self.interpreter.run_intent(matched_intent)
+            await self.interpreter.run_in_worker(self._advance_execution, None)
             
         except Exception as e:
             logger.error(f"处理消息时发生错误: {e}", exc_info=True)
@@ -495,6 +426,34 @@ class ChatGUI:
             import traceback
             traceback.print_exc()
     
+    def _advance_execution(self, value):
+        """
+        继续执行暂停的意图，直到下一个输入请求或执行结束（在事件循环的工作线程中调用）
+        :param value: 用户对上一个输入请求的回答，第一次执行时为None
+        """
+        execution = self.execution
+        if execution is None:
+            return
+        try:
+            # 通过解释器推进，与后台线程中重新加载脚本（swap_program）互斥
+            request = self.interpreter.advance(execution, value)
+        except Exception as e:
+            self.execution = None
+            self.input_variable = None
+            logger.error(f"执行意图时发生错误: {e}", exc_info=True)
+            self.root.after(0, lambda: self.add_bot_message(f"❌ 发生错误: {e}"))
+            return
+        if not isinstance(request, InputRequest):
+            self.execution = None
+            self.input_variable = None
+            logger.debug("消息处理完成")
+            return
+        
+        logger.info(f"等待用户输入: {request.variable}")
+        self.input_variable = request.variable
+        self.waiting_for_input = True
+        self.root.after(0, lambda: self.add_bot_message(request.prompt.strip()))
+    
     def add_user_message(self, message: str):
         """添加用户消息（右侧莫兰迪粉气泡）"""
         bubble_frame = Frame(self.scrollable_frame, bg='#E8E8E8')
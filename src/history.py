@@ -0,0 +1,167 @@
+"""
+对话历史（ConversationHistory）
+作用：用定长的环形缓冲区保存最近的对话消息，可以再限制消息的总字符数（近似token预算）；
+      超出容量或预算的旧消息归并为一条摘要记录（更早的消息数，以及最近几次用户输入的开头）；
+      机器人的回复保存为模板引用（BotTurn），读取内容时才拼接文本
+在全项目中的作用：意图识别只使用最近几轮对话，长时间运行的会话不再无限增长，
+                  每个会话的对话历史占用的内存有固定上限，回复中的模板文本由所有会话共享
+"""
+
+from collections import deque
+from collections.abc import Mapping
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from src.template import BoundTemplate
+
+# 默认保留的消息条数（意图识别只使用最近5条）
+DEFAULT_MAX_MESSAGES = 20
+# 摘要中保留的更早用户输入条数，以及每条保留的字符数
+SUMMARY_TOPICS = 3
+SUMMARY_TOPIC_CHARS = 20
+
+
+class BotTurn(Mapping):
+    """
+    机器人回复的历史记录：意图名称、回复使用的模板（绑定后的模板，所有会话共享）和各个槽位渲染出的片段
+    与 {"role": "bot", "content": "..."} 一样按键访问，content在读取时用模板拼接（不缓存）；
+    片段在回复时保存，函数调用（包括非纯函数）的结果不会在读取时重新计算
+    """
+    __slots__ = ('intent', 'template', 'fragments')
+
+    def __init__(self, intent: str, template: BoundTemplate, fragments: Tuple[str, ...] = ()):
+        self.intent = intent
+        self.template = template
+        self.fragments = fragments
+
+    @property
+    def content(self) -> str:
+        return self.template.join(self.fragments)
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return "bot"
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("role", "content"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self):
+        return f"BotTurn({self.intent!r}, {self.content!r})"
+
+
+class ConversationHistory:
+    """
+    有上限的对话历史：消息为 {"role": "user"/"bot", "content": "..."} 或BotTurn，按时间顺序排列
+    超出max_messages条或总字符数超出max_chars时，最早的消息移出缓冲区并计入摘要（最新的一条消息总是保留）
+    支持len、迭代和下标/切片访问（只包含缓冲区中的消息），recent()在最近的消息前加上摘要记录
+    """
+    __slots__ = ('messages', 'max_messages', 'max_chars', 'chars', 'summary_count', 'summary_topics')
+
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES, max_chars: Optional[int] = None):
+        """
+        :param max_messages: 缓冲区保留的消息条数
+        :param max_chars: 缓冲区中消息内容的总字符数上限（中文约为token数），None表示不限制
+        """
+        if max_messages < 1:
+            raise ValueError("max_messages must be at least 1")
+        self.messages: Deque[Dict[str, str]] = deque()
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.chars = 0  # 缓冲区中消息内容的总字符数（只在设置了max_chars时统计）
+        self.summary_count = 0  # 归并进摘要的消息数
+        self.summary_topics: Deque[str] = deque(maxlen=SUMMARY_TOPICS)  # 最近几条被归并的用户输入（截断）
+
+    def empty(self) -> 'ConversationHistory':
+        """返回容量和预算相同的空历史"""
+        return ConversationHistory(self.max_messages, self.max_chars)
+
+    def append(self, message: Mapping):
+        """添加一条消息，超出容量或字符预算时把最早的消息归并进摘要"""
+        messages = self.messages
+        messages.append(message)
+        if self.max_chars is None:
+            # 没有字符预算时不统计字符数（统计BotTurn的字符数需要拼接文本）
+            if len(messages) > self.max_messages:
+                self._roll_up(messages.popleft())
+            return
+        self.chars += len(message.get("content", ""))
+        while len(messages) > self.max_messages or (self.chars > self.max_chars and len(messages) > 1):
+            self._roll_up(messages.popleft())
+
+    def _roll_up(self, message: Mapping):
+        if self.max_chars is not None:
+            self.chars -= len(message.get("content", ""))
+        self.summary_count += 1
+        if message.get("role") == "user":
+            self.summary_topics.append(message.get("content", "")[:SUMMARY_TOPIC_CHARS])
+
+    @property
+    def summary(self) -> Optional[Dict[str, str]]:
+        """更早消息的摘要记录 {"role": "summary", "content": "..."}，没有更早的消息时为None"""
+        if not self.summary_count:
+            return None
+        content = f"更早的{self.summary_count}条对话"
+        if self.summary_topics:
+            content += "，用户提到过：" + "；".join(self.summary_topics)
+        return {"role": "summary", "content": content}
+
+    def recent(self, count: int) -> List[Dict[str, str]]:
+        """最近count条消息；有更早的消息时，在前面加上摘要记录"""
+        messages = self.messages
+        recent = list(islice(messages, max(len(messages) - count, 0), None))
+        summary = self.summary
+        return [summary] + recent if summary else recent
+
+    def clear(self):
+        self.messages.clear()
+        self.chars = 0
+        self.summary_count = 0
+        self.summary_topics.clear()
+
+    def dump(self, limit: Optional[int] = None) -> Tuple[Tuple[Tuple[str, str], ...], int, Tuple[str, ...]]:
+        """
+        紧凑表示（供会话快照使用）：((角色, 内容), ...)、摘要消息数、摘要中的用户输入
+        :param limit: 只保留最近limit条消息，更早的消息归并进摘要
+        """
+        messages = list(self.messages)
+        kept = messages if limit is None else messages[max(len(messages) - limit, 0):] if limit else []
+        summary = ConversationHistory(self.max_messages)
+        summary.summary_count = self.summary_count
+        summary.summary_topics.extend(self.summary_topics)
+        for message in messages[:len(messages) - len(kept)]:
+            summary._roll_up(message)
+        return (tuple((message["role"], message["content"]) for message in kept),
+                summary.summary_count, tuple(summary.summary_topics))
+
+    def restore(self, data: Tuple[Tuple[Tuple[str, str], ...], int, Tuple[str, ...]]) -> 'ConversationHistory':
+        """从dump()的结果恢复（替换当前内容），返回自身"""
+        messages, summary_count, topics = data
+        self.clear()
+        self.summary_count = summary_count
+        self.summary_topics.extend(topics)
+        for role, content in messages:
+            self.append({"role": role, "content": content})
+        return self
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __bool__(self) -> bool:
+        return bool(self.messages)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self.messages)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, str], List[Dict[str, str]]]:
+        if isinstance(index, slice):
+            return list(self.messages)[index]
+        return self.messages[index]
+
+    def __repr__(self):
+        return f"ConversationHistory({list(self.messages)!r}, summary={self.summary!r})"
@@ -4,29 +4,98 @@
 在全项目中的作用：这是编译过程的第三步，将AST转换为实际的执行逻辑，处理用户交互、变量管理和函数调用
 """
 
-from typing import Dict, Any, Callable, Optional, List
+import os
+import asyncio
+import functools
+import inspect
+import threading
+from types import GeneratorType
+from typing import Dict, Any, Callable, Generator, Optional, List, Mapping, Set, Tuple
 from src.parser import (
     Program, IntentDecl, WhenClause, Action, AskAction, WaitForAction,
     ResponseAction, SetAction, OptionsAction, Expression, StringLiteral,
     Variable, FunctionCall
 )
+from src.template import CompiledTemplate, BoundTemplate, compile_template, fold_template
+from src.variables import Variables, UNSET
+from src.history import BotTurn, ConversationHistory, DEFAULT_MAX_MESSAGES
+from src.functions import BuiltinFunction, FunctionRegistry
 from src.logger import setup_logger
 
 # 初始化日志记录器
 logger = setup_logger("DSL_Agent_Interpreter")
 
 
+class InputRequest:
+    """
+    执行到wait_for时产生的输入请求
+    variable为要写入的变量名，options为同一意图中wait_for之前最近一次给出的选项，position为wait_for在意图动作中的位置
+    """
+    __slots__ = ('variable', 'prompt', 'options', 'position')
+    
+    def __init__(self, variable: str, options: Tuple[str, ...] = (), position: int = 0):
+        self.variable = variable
+        self.prompt = f"请输入 {variable}: "
+        self.options = tuple(options)
+        self.position = position
+    
+    def __repr__(self):
+        return f"InputRequest({self.variable!r}, options={list(self.options)})"
+
+
+def pure(func: Callable) -> Callable:
+    """
+    声明内置函数为纯函数：返回值只取决于参数，没有副作用
+    模板中参数全部为常量的纯函数调用，会在加载程序时折叠为字面量
+    """
+    func.pure = True
+    return func
+
+
+def program_variables(program: Program) -> Set[str]:
+    """程序中wait_for和set会写入的所有变量名"""
+    names = set()
+    for intent in program.intents:
+        for action in intent.actions:
+            if isinstance(action, (WaitForAction, SetAction)):
+                names.add(action.variable)
+    return names
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
 class Interpreter:
     """解释器"""
     
-    def __init__(self, llm_client=None):
+    # 执行引擎：tree 逐个遍历AST节点执行；closure 将每个意图编译为一组闭包后执行；
+    # aot 执行预编译生成的Python模块中的意图函数（见src/transpiler.py和load_module）
+    ENGINES = ('tree', 'closure', 'aot')
+    
+    def __init__(self, llm_client=None, engine: Optional[str] = None,
+                 history_size: int = DEFAULT_MAX_MESSAGES, history_chars: Optional[int] = None):
         """
         初始化解释器
         :param llm_client: LLM客户端实例，用于意图识别
+        :param engine: 执行引擎（'tree'、'closure' 或 'aot'），不指定时使用环境变量 DSL_INTERPRETER_ENGINE，默认为 'tree'
+        :param history_size: 对话历史保留的消息条数，更早的消息归并为摘要
+        :param history_chars: 对话历史的总字符数上限（近似token预算），None表示不限制
+        :raises ValueError: 未知的执行引擎
         """
+        engine = engine or os.getenv("DSL_INTERPRETER_ENGINE") or "tree"
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown interpreter engine: {engine}")
+        self.engine = engine
         self.llm_client = llm_client
-        self.variables: Dict[str, Any] = {}
-        self.functions: Dict[str, Callable] = {
+        # 槽位变量表（本轮对话的作用域）：closure/aot引擎和模板在编译时取得槽位编号，因此不能替换为其他对象
+        self.variables: Variables = Variables()
+        # 内置函数注册表：函数名 -> BuiltinFunction（按declare/pure装饰器的声明执行，并统计调用）
+        self.functions: FunctionRegistry = FunctionRegistry()
+        builtins: Dict[str, Callable] = {
             'get_order_status': self._get_order_status,
             'create_refund': self._create_refund,
             'create_ticket': self._create_ticket,
@@ -50,13 +119,69 @@ class Interpreter:
             'get_user_preferences': self._get_user_preferences,
             'format_price': self._format_price,
         }
+        for name, func in builtins.items():
+            self.register_function(name, func)
         self.current_intent: Optional[IntentDecl] = None
-        self.user_input_callback: Optional[Callable[[str], str]] = None
+        self.current_result: Optional[Dict[str, Any]] = None  # 正在执行（或暂停）的意图已产生的部分结果
+        # 执行意图的每一步（advance）与替换程序（swap_program/load_module）互斥：热重载在其他线程中进行，
+        # 变量表不是线程安全的，分配槽位与执行中的写入不能交错
+        self._lock = threading.RLock()
+        self.user_input_callback: Optional[Callable[[str], str]] = None  # 也可以是异步函数（仅用于execute_intent_async）
         self.output_callback: Optional[Callable[[str], None]] = None  # 输出回调（用于GUI）
-        # 对话历史记录
-        self.conversation_history: List[Dict[str, str]] = []  # [{"role": "user"/"bot", "content": "..."}]
+        # 对话历史记录（有上限的环形缓冲区）：[{"role": "user"/"bot", "content": "..."}]
+        self.conversation_history = ConversationHistory(history_size, history_chars)
         self.last_intent: Optional[str] = None  # 上一次的意图
-        self.last_context: Dict[str, Any] = {}  # 上一次的上下文信息
+        self.last_context: Mapping[str, Any] = {}  # 上一次的上下文信息（上一轮结束时变量表的不可变快照）
+        # 加载程序时常量折叠后的模板：编译后的模板 -> 折叠后的模板
+        self.folded_templates: Dict[CompiledTemplate, CompiledTemplate] = {}
+        # 绑定到槽位编号的模板：编译后的模板 -> 绑定后的模板（折叠后再绑定）
+        self.bound_templates: Dict[CompiledTemplate, BoundTemplate] = {}
+        # closure/aot引擎编译好的意图：id(意图) -> (意图, 步骤列表)
+        self.compiled_intents: Dict[int, tuple] = {}
+        # execute_intent_async所在的事件循环：工作线程中调用的异步内置函数交给它执行
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def register_function(self, name: str, func: Callable, **declaration) -> BuiltinFunction:
+        """
+        注册内置函数，声明（pure、blocking、timeout、fallback、backend）见FunctionRegistry.register，
+        未传入的声明从函数上的declare/pure装饰器读取
+        func也可以是异步函数（async def）：包装为同步调用，在execute_intent_async的工作线程中调用时交给事件循环执行并等待结果
+        （等待期间事件循环继续处理其他对话），在同步API中调用时用asyncio.run执行；超时用asyncio.wait_for实现
+        需要在加载程序（interpret/load_module）之前注册，closure/aot引擎在编译时取得函数
+        :raises ValueError: 声明不合法（非阻塞的同步函数声明了超时，或异步函数声明为阻塞）
+        """
+        if inspect.iscoroutinefunction(func):
+            coroutine_function = func
+            timeout = declaration.pop('timeout', None) or getattr(func, 'timeout', None)
+            if declaration.get('blocking', getattr(func, 'blocking', False)):
+                raise ValueError(f"异步内置函数 {name} 不会阻塞，不需要声明blocking")
+            
+            @functools.wraps(coroutine_function)
+            def func(*args):
+                coroutine = coroutine_function(*args)
+                if timeout is not None:
+                    coroutine = asyncio.wait_for(coroutine, timeout)
+                return self._await(coroutine)
+            func.timeout = None
+        return self.functions.register(name, func, **declaration)
+    
+    def _await(self, awaitable) -> Any:
+        """在执行意图的同步代码中等待异步内置函数的结果"""
+        loop = self.event_loop
+        if loop is not None and loop.is_running():
+            if _running_loop() is loop:
+                awaitable.close()
+                raise RuntimeError("不能在事件循环线程中同步等待异步内置函数，请使用execute_intent_async")
+            return asyncio.run_coroutine_threadsafe(awaitable, loop).result()
+        return asyncio.run(awaitable)
+    
+    async def run_in_worker(self, func: Callable, *args) -> Any:
+        """
+        在工作线程中执行func（执行意图的同步代码，其中的内置函数可能阻塞），不阻塞事件循环；
+        其中调用的异步内置函数交回当前事件循环执行
+        """
+        self.event_loop = asyncio.get_running_loop()
+        return await asyncio.to_thread(func, *args)
     
     def set_user_input_callback(self, callback: Callable[[str], str]):
         """设置用户输入回调函数"""
@@ -87,10 +212,95 @@ class Interpreter:
         }
         
         # 存储所有意图，供意图识别使用
+        self.folded_templates = self.fold_templates(program)
+        self.bound_templates = self.bind_templates(program)
+        self.compiled_intents = self.compile_intents(program)
         self.intents = program.intents
         
         return result
     
+    def fold_templates(self, program: Program) -> Dict[CompiledTemplate, CompiledTemplate]:
+        """
+        对程序中的response/ask模板做常量折叠（参数全部为带引号字面量的纯函数调用）
+        折叠在加载时按当前的函数表进行，之后注册或替换的函数只影响未折叠的调用
+        :return: 编译后的模板 -> 折叠后的模板（只包含发生了折叠的模板）
+        """
+        folded = {}
+        for intent in program.intents:
+            for action in intent.actions:
+                if isinstance(action, (AskAction, ResponseAction)):
+                    result = fold_template(action.compiled, self.functions)
+                    if result is not action.compiled:
+                        folded[action.compiled] = result
+        logger.debug(f"常量折叠了 {len(folded)} 个模板")
+        return folded
+    
+    def rollback(self, context: Mapping[str, Any]):
+        """
+        回滚上下文：下一轮对话从context（之前某一轮的last_context快照）继续，丢弃当前作用域中的值
+        快照不可修改，保留快照不需要复制变量（之后第一次写入变量时才复制值列表）
+        """
+        self.last_context = context
+        if context:
+            self.variables.over(context)
+        else:
+            self.variables.clear()
+    
+    def bind_templates(self, program: Program) -> Dict[CompiledTemplate, BoundTemplate]:
+        """
+        为程序中的变量分配槽位，并把response/ask模板（折叠后）绑定到槽位编号
+        :return: 编译后的模板 -> 绑定后的模板
+        """
+        for name in sorted(program_variables(program)):
+            self.variables.slot(name)
+        bound = {}
+        for intent in program.intents:
+            for action in intent.actions:
+                if isinstance(action, (AskAction, ResponseAction)) and action.compiled not in bound:
+                    template = self.folded_templates.get(action.compiled, action.compiled)
+                    bound[action.compiled] = template.bind(self.variables.slot)
+        return bound
+    
+    def bound_template(self, compiled: CompiledTemplate) -> BoundTemplate:
+        """取得模板绑定到槽位编号后的版本（不属于已加载程序的模板在首次使用时绑定）"""
+        bound = self.bound_templates.get(compiled)
+        if bound is None:
+            template = self.folded_templates.get(compiled, compiled)
+            bound = self.bound_templates[compiled] = template.bind(self.variables.slot)
+        return bound
+    
+    def swap_program(self, program: Program):
+        """
+        热重载：替换解释器使用的程序，保留变量和对话状态（对话历史、上一次的意图和上下文）
+        为新程序的变量分配槽位会修改变量表，因此等待正在执行的一步（advance）结束后再替换；
+        暂停在wait_for处的意图持有旧意图对象，恢复后在旧版本上执行完毕
+        （旧意图的模板不在新的折叠表中，按未折叠的模板渲染，结果相同）
+        :param program: 新编译的程序
+        """
+        with self._lock:
+            self.folded_templates = self.fold_templates(program)
+            self.bound_templates = self.bind_templates(program)
+            self.compiled_intents = self.compile_intents(program)
+            self.intents = program.intents
+        logger.info(f"已切换到新版本程序，意图数量: {len(program.intents)}")
+    
+    def load_module(self, module):
+        """
+        加载预编译模块（src.transpiler.load_module的返回值），使用模块中生成的意图函数执行意图，保留对话状态
+        模块中的函数在绑定时查找，之后替换Interpreter.functions中的函数需要重新加载模块才会生效
+        :param module: 预编译模块，PROGRAM为程序，bind(interpreter)返回与意图一一对应的函数
+        """
+        program = module.PROGRAM
+        with self._lock:
+            # 生成的代码使用未折叠的模板，绑定时取得的模板（回复的模板引用）也不能是上一个程序折叠后的版本
+            self.folded_templates = {}
+            self.bound_templates = {}
+            functions = module.bind(self)
+            self.compiled_intents = {id(intent): (intent, [function])
+                                     for intent, function in zip(program.intents, functions)}
+            self.intents = program.intents
+        logger.info(f"已加载预编译模块，意图数量: {len(program.intents)}")
+    
     def match_intent(self, user_input: str) -> Optional[IntentDecl]:
         """
         匹配用户输入的意图（支持对话历史和上下文）
@@ -101,84 +311,235 @@ class Interpreter:
         logger.debug(f"开始匹配意图，用户输入: {user_input}")
         
         # 检查intents是否已设置
-        if not hasattr(self, 'intents') or not self.intents:
+        if not getattr(self, 'intents', None):
             logger.warning("意图列表未设置")
             return None
         
-        # 必须使用LLM客户端进行意图识别
-        if not self.llm_client:
-            logger.error("LLM客户端未配置")
-            raise RuntimeError(
-                "LLM客户端未配置。本项目要求使用API进行意图识别。\n"
-                "请配置 ZHIPUAI_API_KEY 环境变量。"
-            )
-        
         # 记录用户输入到对话历史
         self.conversation_history.append({"role": "user", "content": user_input})
         logger.debug(f"对话历史长度: {len(self.conversation_history)}")
+        return self.identify_intent(user_input, self.conversation_history, self.last_intent, self.last_context)
+    
+    def identify_intent(self, user_input: str, conversation_history: ConversationHistory,
+                        last_intent: Optional[str], last_context: Mapping[str, Any]) -> Optional[IntentDecl]:
+        """
+        用LLM识别意图，对话历史和上下文由调用方提供，不读取也不修改解释器的对话状态
+        （SessionManager用它为各个会话识别意图，识别期间不占用解释器）
+        :param conversation_history: 对话历史（已包含本次用户输入）
+        :return: 匹配的意图，如果没有匹配则返回None
+        :raises RuntimeError: 如果LLM客户端未配置或识别失败
+        """
+        # 取一次引用，热重载切换程序时本次识别仍使用同一版本
+        intents = getattr(self, 'intents', None)
+        if not intents:
+            logger.warning("意图列表未设置")
+            return None
+        arguments = self._identify_arguments(intents, conversation_history, last_intent, last_context)
         
         # 使用LLM进行意图识别（带对话历史）
         try:
-            logger.debug(f"调用LLM进行意图识别，可用意图数: {len(self.intents)}")
-            intent_name = self.llm_client.identify_intent(
-                user_input, 
-                self.intents,
-                conversation_history=self.conversation_history[-5:] if len(self.conversation_history) > 1 else [],  # 只传递最近5轮对话
-                last_intent=self.last_intent,
-                last_context=self.last_context
-            )
-            if intent_name:
-                logger.info(f"LLM识别到意图: {intent_name}")
-                for intent in self.intents:
-                    if intent.name == intent_name:
-                        return intent
-            else:
-                logger.warning("LLM未识别到任何意图")
-            return None
+            logger.debug(f"调用LLM进行意图识别，可用意图数: {len(intents)}")
+            intent_name = self.llm_client.identify_intent(user_input, intents, **arguments)
+            return self._find_intent(intents, intent_name)
         except Exception as e:
             logger.error(f"意图识别失败: {e}", exc_info=True)
             # LLM失败时抛出异常，不再fallback
             raise RuntimeError(f"意图识别失败: {e}")
     
+    async def identify_intent_async(self, user_input: str, conversation_history: ConversationHistory,
+                                    last_intent: Optional[str], last_context: Mapping[str, Any]) -> Optional[IntentDecl]:
+        """
+        identify_intent的异步版本：等待LLM客户端的identify_intent_async，等待期间事件循环可以处理其他对话
+        :raises RuntimeError: 如果LLM客户端未配置或识别失败
+        """
+        intents = getattr(self, 'intents', None)
+        if not intents:
+            logger.warning("意图列表未设置")
+            return None
+        arguments = self._identify_arguments(intents, conversation_history, last_intent, last_context)
+        
+        try:
+            logger.debug(f"异步调用LLM进行意图识别，可用意图数: {len(intents)}")
+            intent_name = await self.llm_client.identify_intent_async(user_input, intents, **arguments)
+            return self._find_intent(intents, intent_name)
+        except Exception as e:
+            logger.error(f"意图识别失败: {e}", exc_info=True)
+            raise RuntimeError(f"意图识别失败: {e}")
+    
+    def _identify_arguments(self, intents: List[IntentDecl], conversation_history: ConversationHistory,
+                            last_intent: Optional[str], last_context: Mapping[str, Any]) -> Dict[str, Any]:
+        """检查LLM客户端，整理传给LLM客户端的对话历史和上下文参数"""
+        # 必须使用LLM客户端进行意图识别
+        if not self.llm_client:
+            logger.error("LLM客户端未配置")
+            raise RuntimeError(
+                "LLM客户端未配置。本项目要求使用API进行意图识别。\n"
+                "请配置 ZHIPUAI_API_KEY 环境变量。"
+            )
+        return {
+            # 只传递最近5轮对话（更早的对话以摘要记录的形式传递）
+            'conversation_history': conversation_history.recent(5) if len(conversation_history) > 1 else [],
+            'last_intent': last_intent,
+            'last_context': dict(last_context),
+        }
+    
+    @staticmethod
+    def _find_intent(intents: List[IntentDecl], intent_name: Optional[str]) -> Optional[IntentDecl]:
+        if intent_name:
+            logger.info(f"LLM识别到意图: {intent_name}")
+            for intent in intents:
+                if intent.name == intent_name:
+                    return intent
+        else:
+            logger.warning("LLM未识别到任何意图")
+        return None
+    
     def execute_intent(self, intent: IntentDecl) -> Dict[str, Any]:
         """
         执行意图（记录对话历史）
+        wait_for通过user_input_callback（未设置时为标准输入）取得用户输入，会阻塞调用线程；
+        不希望阻塞时使用run_intent
+        :param intent: 意图声明
+        :return: 执行结果
+        """
+        execution = self.run_intent(intent)
+        request = self.advance(execution, None)
+        while isinstance(request, InputRequest):
+            callback = self.user_input_callback
+            answer = callback(request.variable) if callback else input(request.prompt)
+            request = self.advance(execution, answer)
+        return request
+    
+    async def execute_intent_async(self, intent: IntentDecl) -> Dict[str, Any]:
+        """
+        execute_intent的异步版本：动作在工作线程中执行（内置函数的I/O不阻塞事件循环），
+        wait_for时等待user_input_callback（可以是异步函数；未设置时在工作线程中读取标准输入）
+        一个事件循环可以同时驱动多个解释器（每个对话一个）的执行；多个对话共享一个解释器时使用SessionManager
         :param intent: 意图声明
         :return: 执行结果
         """
+        execution = self.run_intent(intent)
+        request = await self.run_in_worker(self.advance, execution, None)
+        while isinstance(request, InputRequest):
+            callback = self.user_input_callback
+            if callback is None:
+                answer = await asyncio.to_thread(input, request.prompt)
+            else:
+                answer = callback(request.variable)
+                if inspect.isawaitable(answer):
+                    answer = await answer
+            request = await self.run_in_worker(self.advance, execution, answer)
+        return request
+    
+    async def match_intent_async(self, user_input: str) -> Optional[IntentDecl]:
+        """
+        match_intent的异步版本：等待LLM识别意图期间事件循环可以处理其他对话
+        :raises RuntimeError: 如果LLM客户端未配置或识别失败
+        """
+        if not getattr(self, 'intents', None):
+            logger.warning("意图列表未设置")
+            return None
+        self.conversation_history.append({"role": "user", "content": user_input})
+        return await self.identify_intent_async(user_input, self.conversation_history, self.last_intent, self.last_context)
+    
+    def advance(self, execution: Generator[InputRequest, str, Dict[str, Any]], value: Optional[str]):
+        """
+        恢复run_intent的执行到下一个wait_for，返回InputRequest；执行结束时返回执行结果
+        （StopIteration不能穿过asyncio的Future，因此转换为返回值）；与swap_program/load_module互斥
+        :param value: 用户对上一个输入请求的回答，第一次执行时为None
+        """
+        with self._lock:
+            try:
+                return execution.send(value)
+            except StopIteration as stop:
+                return stop.value
+    
+    def run_intent(self, intent: IntentDecl) -> Generator[InputRequest, str, Dict[str, Any]]:
+        """
+        可恢复的意图执行：执行到wait_for时产生InputRequest并暂停，调用方用send(用户输入)恢复执行
+        执行结束时生成器返回执行结果（StopIteration.value），并记录对话历史和上下文
+        暂停期间不占用线程，一个线程可以驱动任意多个执行到一半的对话
+        :param intent: 意图声明
+        """
         logger.info(f"开始执行意图: {intent.name}，动作数量: {len(intent.actions)}")
         self.current_intent = intent
-        # 保留上一次的变量（用于上下文）
-        if not self.last_context:
-            self.variables.clear()
-            logger.debug("清空变量，开始新的意图执行")
-        else:
-            # 保留关键变量
-            logger.debug(f"保留上下文变量: {list(self.last_context.keys())}")
-            for key in ['order_number', 'reason', 'problem_description', 'account', 'product_keyword']:
-                if key in self.last_context:
-                    self.variables[key] = self.last_context[key]
+        # 本轮从上一次的上下文继续（上一轮结束时变量表已与快照共享值列表，这里只在上下文被替换时重建）
+        variables = self.variables
+        last_context = self.last_context
+        if last_context is not variables.parent:
+            if last_context:
+                variables.over(last_context)
+            else:
+                variables.clear()
+                logger.debug("清空变量，开始新的意图执行")
+        # 意图声明了carry_over时，只继承声明的变量
+        if intent.carry_over is not None:
+            variables.keep([variables.slot(name) for name in intent.carry_over])
+            logger.debug(f"继承上下文变量: {list(intent.carry_over)}")
         
-        result = {
+        self.current_result = result = {
             'response': None,
             'variables': {}
         }
-        
-        # 执行所有动作
-        for i, action in enumerate(intent.actions):
+        if self.engine != 'tree':
+            yield from self._run_compiled(intent, result)
+        else:
+            yield from self._run_actions(intent, result)
+        return self._finish_intent(intent, result)
+    
+    def resume_intent(self, intent: IntentDecl, position: int,
+                      result: Dict[str, Any]) -> Generator[InputRequest, str, Dict[str, Any]]:
+        """
+        从position处的wait_for恢复暂停的执行（暂停的执行从会话存储中恢复时使用，见src/sessions.py）
+        生成器首先产生该wait_for的输入请求，之后与run_intent相同；剩余动作按tree引擎执行（各引擎结果一致）
+        变量由调用方在恢复前换回（Variables.over）
+        :param position: wait_for在意图动作中的位置（InputRequest.position）
+        :param result: 暂停前已产生的部分执行结果
+        """
+        yield from self._run_actions(intent, result, position)
+        return self._finish_intent(intent, result)
+    
+    def _run_actions(self, intent: IntentDecl, result: Dict[str, Any],
+                     start: int = 0) -> Generator[InputRequest, str, None]:
+        """用tree引擎从start处开始执行意图的动作（生成器，在wait_for处暂停）"""
+        # wait_for的选项：wait_for之前最近一次给出的选项
+        options = ()
+        for action in intent.actions[:start]:
+            if isinstance(action, OptionsAction):
+                options = action.options
+            elif isinstance(action, WaitForAction):
+                options = ()
+        for i in range(start, len(intent.actions)):
+            action = intent.actions[i]
             logger.debug(f"执行动作 {i+1}/{len(intent.actions)}: {type(action).__name__}")
+            if isinstance(action, WaitForAction):
+                value = yield InputRequest(action.variable, options, i)
+                # 暂停期间其他会话可能使用了解释器，恢复后重新设置当前意图
+                self.current_intent = intent
+                self.current_result = result
+                self.variables[action.variable] = value
+                result['variables'][action.variable] = value
+                options = ()
+                continue
+            if isinstance(action, OptionsAction):
+                options = action.options
             action_result = self.execute_action(action)
             if action_result and 'response' in action_result:
                 result['response'] = action_result['response']
             if action_result and 'variables' in action_result:
                 result['variables'].update(action_result['variables'])
-        
-        # 记录对话历史和上下文
+    
+    def _finish_intent(self, intent: IntentDecl, result: Dict[str, Any]) -> Dict[str, Any]:
+        """意图执行结束：记录对话历史和上下文"""
+        # 最后一次回复的模板引用（从会话存储恢复的执行中，暂停前的回复只有文本）
+        turn = result.pop('turn', None)
         if result.get('response'):
-            self.conversation_history.append({"role": "bot", "content": result['response']})
+            self.conversation_history.append(
+                turn if turn is not None else {"role": "bot", "content": result['response']})
             logger.debug(f"记录机器人回复到对话历史，长度: {len(self.conversation_history)}")
         self.last_intent = intent.name
-        self.last_context = self.variables.copy()
+        self.last_context = self.variables.snapshot()
+        self.current_result = None
         logger.info(f"意图执行完成: {intent.name}")
         
         return result
@@ -199,7 +560,8 @@ class Interpreter:
     
     def execute_ask(self, action: AskAction) -> Dict[str, Any]:
         """执行Ask动作"""
-        self._output(f"[机器人] {action.message}")
+        message = self.bound_template(action.compiled).render(self.variables, self.functions, self.last_intent)
+        self._output(f"[机器人] {message}")
         return {}
     
     def execute_wait_for(self, action: WaitForAction) -> Dict[str, Any]:
@@ -215,9 +577,12 @@ class Interpreter:
             return {'variables': {action.variable: user_input}}
     
     def execute_response(self, action: ResponseAction) -> Dict[str, Any]:
-        """执行Response动作"""
-        response = self._format_template(action.template)
+        """执行Response动作（回复在对话历史中保存为模板引用，见_finish_intent）"""
+        template = self.bound_template(action.compiled)
+        response, fragments = template.render_fragments(self.variables, self.functions, self.last_intent)
         self._output(f"[机器人] {response}")
+        if self.current_result is not None:
+            self.current_result['turn'] = BotTurn(self.current_intent.name, template, fragments)
         return {'response': response}
     
     def execute_set(self, action: SetAction) -> Dict[str, Any]:
@@ -255,68 +620,153 @@ class Interpreter:
         args = [self.evaluate_expression(arg) for arg in call.args]
         return func(*args)
     
-    def _format_template(self, template: str) -> str:
-        """格式化模板字符串，替换变量和表达式"""
-        import re
+    # closure引擎：每个意图编译为一组闭包，变量名、模板和函数在编译时绑定
+    
+    def compile_intents(self, program: Program) -> Dict[int, tuple]:
+        """
+        为closure引擎预先编译程序中的所有意图（tree引擎不需要编译）
+        aot引擎的意图函数由load_module加载，未加载模块的意图在首次执行时按closure引擎编译
+        """
+        if self.engine != 'closure':
+            return {}
+        return {id(intent): (intent, self.compile_intent(intent)) for intent in program.intents}
+    
+    def compile_intent(self, intent: IntentDecl) -> List[Callable[[Dict[str, Any]], Optional[str]]]:
+        """
+        将意图编译为步骤列表
+        每个步骤接收本次执行写入的变量表，response步骤返回回复文本，其余步骤返回None；
+        wait_for编译为InputRequest，由_run_compiled在执行时产生并暂停
+        函数在编译时绑定：编译后替换Interpreter.functions中的函数，需要重新加载程序才会生效
+        """
+        steps = []
+        options = ()
+        for position, action in enumerate(intent.actions):
+            if isinstance(action, WaitForAction):
+                # wait_for不编译为闭包，执行时产生输入请求并暂停
+                self.variables.slot(action.variable)
+                steps.append(InputRequest(action.variable, options, position))
+                options = ()
+                continue
+            if isinstance(action, OptionsAction):
+                options = action.options
+            step = self._compile_action(action, intent.name)
+            if step is not None:
+                steps.append(step)
+        return steps
+    
+    def _run_compiled(self, intent: IntentDecl, result: Dict[str, Any]) -> Generator[InputRequest, str, None]:
+        """用closure/aot引擎执行意图的所有动作，结果写入result（生成器，在wait_for处暂停）"""
+        entry = self.compiled_intents.get(id(intent))
+        if entry is None or entry[0] is not intent:
+            # 不属于已加载程序的意图（例如直接调用execute_intent）在首次执行时编译
+            entry = (intent, self.compile_intent(intent))
+            self.compiled_intents[id(intent)] = entry
+        assigned = result['variables']
+        for step in entry[1]:
+            if step.__class__ is InputRequest:
+                value = yield step
+                self.variables[step.variable] = value
+                assigned[step.variable] = value
+                continue
+            value = step(assigned)
+            if value.__class__ is GeneratorType:
+                # aot引擎中含wait_for的意图函数是生成器（暂停前把已产生的回复写入current_result）
+                value = yield from value
+            if value is not None:
+                result['response'] = value
+    
+    def _compile_action(self, action: Action, intent_name: str) -> Optional[Callable[[Dict[str, Any]], Optional[str]]]:
+        """编译单个动作"""
+        output = self._output
+        variables = self.variables
+        if isinstance(action, AskAction):
+            compiled = self.bound_template(action.compiled)
+            functions = self.functions
+            if compiled.static is not None:
+                message = f"[机器人] {compiled.static}"
+                return lambda assigned: output(message)
+            
+            def ask_step(assigned):
+                output(f"[机器人] {compiled.render(variables, functions, self.last_intent)}")
+            return ask_step
         
-        def replace_expr(match):
-            """替换匹配的表达式"""
-            expr_str = match.group(1)  # 获取 { } 中的内容
+        if isinstance(action, ResponseAction):
+            # 回复在对话历史中保存为模板引用（见_finish_intent）
+            compiled = self.bound_template(action.compiled)
+            functions = self.functions
+            if compiled.static is not None:
+                text = compiled.static
+                message = f"[机器人] {text}"
+                turn = BotTurn(intent_name, compiled)
+                
+                def static_step(assigned):
+                    output(message)
+                    self.current_result['turn'] = turn
+                    return text
+                return static_step
             
-            # 首先尝试作为变量名
-            if expr_str in self.variables:
-                return str(self.variables[expr_str])
+            def template_step(assigned):
+                text, fragments = compiled.render_fragments(variables, functions, self.last_intent)
+                output(f"[机器人] {text}")
+                self.current_result['turn'] = BotTurn(intent_name, compiled, fragments)
+                return text
+            return template_step
+        
+        if isinstance(action, SetAction):
+            name = action.variable
+            slot = variables.slot(name)
+            evaluate = self._compile_expression(action.expression)
             
-            # 特殊变量：last_intent
-            if expr_str == "last_intent" and hasattr(self, 'last_intent'):
-                return str(self.last_intent or "默认")
+            def set_step(assigned):
+                value = evaluate()
+                variables.writable()[slot] = value
+                assigned[name] = value
+            return set_step
+        
+        if isinstance(action, OptionsAction):
+            options_text = "请选择：\n" + "".join(f"  {i}. {option}\n" for i, option in enumerate(action.options, 1))
             
-            # 如果不是变量，尝试解析为表达式（函数调用等）
-            try:
-                # 尝试解析为函数调用，例如 get_order_status(order_number)
-                # 简单的函数调用解析
-                if '(' in expr_str and ')' in expr_str:
-                    func_match = re.match(r'(\w+)\s*\((.*)\)', expr_str)
-                    if func_match:
-                        func_name = func_match.group(1)
-                        args_str = func_match.group(2).strip()
-                        
-                        # 解析参数
-                        args = []
-                        if args_str:
-                            # 简单的参数解析（支持变量名和特殊变量）
-                            for arg in args_str.split(','):
-                                arg = arg.strip()
-                                # 移除引号（如果是字符串字面量）
-                                if (arg.startswith('"') and arg.endswith('"')) or (arg.startswith("'") and arg.endswith("'")):
-                                    args.append(arg[1:-1])
-                                # 如果是变量，获取变量值
-                                elif arg in self.variables:
-                                    args.append(self.variables[arg])
-                                # 特殊变量：last_intent
-                                elif arg == "last_intent" and hasattr(self, 'last_intent'):
-                                    args.append(self.last_intent or "默认")
-                                else:
-                                    # 否则作为字符串字面量
-                                    args.append(arg)
-                        
-                        # 调用函数
-                        if func_name in self.functions:
-                            result = self.functions[func_name](*args)
-                            return str(result)
-                
-                # 如果无法解析，返回原始表达式
-                return match.group(0)
-            except Exception as e:
-                # 如果解析失败，返回原始表达式
-                return match.group(0)
+            def options_step(assigned):
+                output(options_text)
+            return options_step
         
-        # 使用正则表达式找到所有 {expression} 并替换
-        pattern = r'\{([^}]+)\}'
-        result = re.sub(pattern, replace_expr, template)
-        return result
+        return None
+    
+    def _compile_expression(self, expr: Expression) -> Callable[[], Any]:
+        """编译表达式，语义与evaluate_expression一致"""
+        if isinstance(expr, StringLiteral):
+            value = expr.value
+            return lambda: value
+        if isinstance(expr, Variable):
+            variables = self.variables
+            slot = variables.slot(expr.name)
+            default = f"${expr.name}"
+            
+            def variable():
+                value = variables.values[slot]
+                return default if value is UNSET else value
+            return variable
+        if isinstance(expr, FunctionCall):
+            args = [self._compile_expression(arg) for arg in expr.args]
+            func = self.functions.get(expr.name)
+            if not func:
+                name = expr.name
+                return lambda: f"{name}({', '.join(str(arg()) for arg in args)})"
+            if not args:
+                return func
+            if len(args) == 1:
+                arg = args[0]
+                return lambda: func(arg())
+            return lambda: func(*[arg() for arg in args])
+        text = str(expr)
+        return lambda: text
+    
+    def _format_template(self, template: str) -> str:
+        """格式化模板字符串，替换变量和表达式（脚本中的模板在解析时已编译，见src/template.py）"""
+        return compile_template(template).render(self.variables, self.functions, self.last_intent)
     
-    # 内置函数实现
+    # 内置函数实现（进程内模拟，不阻塞，直接在执行意图的线程中调用；
+    # 接入真实后端时用register_function声明blocking、backend等，见src/functions.py）
     def _get_order_status(self, order_number: str) -> str:
         """获取订单状态（模拟）"""
         # 实际应用中，这里应该调用真实的API或数据库
@@ -356,6 +806,7 @@ class Interpreter:
         ticket_id = f"TICKET{hash(description) % 10000:04d}"
         return ticket_id
     
+    @pure
     def _get_coupon(self, category: str) -> str:
         """获取优惠券（模拟，带幽默）"""
         coupons = {
@@ -366,6 +817,7 @@ class Interpreter:
         }
         return coupons.get(category, coupons["默认"])
     
+    @pure
     def _recommend_product(self, keyword: str) -> str:
         """推荐商品（模拟，带幽默）"""
         recommendations = {
@@ -406,6 +858,7 @@ class Interpreter:
         index = hash(context) % len(humor_responses)
         return humor_responses[index]
     
+    @pure
     def _calculate_discount(self, price: str, discount_type: str) -> str:
         """计算折扣（模拟，带幽默）"""
         try:
@@ -426,6 +879,7 @@ class Interpreter:
         
         return f"原价：{original_price:.2f}元，{discount_type}折扣：{discount_rate*100:.0f}%，最终价格：{final_price:.2f}元（省了{saved:.2f}元，可以买杯奶茶了🥤）"
     
+    @pure
     def _get_follow_up_question(self, topic: str) -> str:
         """生成追问问题（基于话题）"""
         # 如果topic是意图名称，提取关键词
@@ -451,6 +905,7 @@ class Interpreter:
         }
         return follow_ups.get(topic_key, follow_ups["默认"])
     
+    @pure
     def _get_related_topic(self, current_topic: str) -> str:
         """获取相关话题（话题发散）"""
         # 如果topic是意图名称，提取关键词
@@ -552,6 +1007,7 @@ class Interpreter:
             return random.choice(recommendations[category])
         return f"根据您的偏好'{user_preference}'，为您推荐精选好物，品质保证，总有一款适合您！✨"
     
+    @pure
     def _calculate_shipping_fee(self, address: str, weight: str = "1") -> str:
         """计算运费（模拟）"""
         import random
@@ -642,6 +1098,7 @@ class Interpreter:
         ]
         return random.choice(preferences)
     
+    @pure
     def _format_price(self, price: str) -> str:
         """格式化价格显示"""
         try:
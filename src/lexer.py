@@ -4,8 +4,14 @@
 在全项目中的作用：这是编译过程的第一步，为语法分析器提供输入
 """
 
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from enum import Enum
-from typing import List, Optional
+from itertools import accumulate, compress, repeat
+from operator import add, itemgetter
+from typing import Iterable, Iterator, List, Optional
 
 
 class TokenType(Enum):
@@ -20,6 +26,8 @@ class TokenType(Enum):
     SET = "SET"
     OR = "OR"
     OPTIONS = "OPTIONS"
+    IMPORT = "IMPORT"
+    CARRY_OVER = "CARRY_OVER"
     
     # 字面量
     STRING = "STRING"
@@ -42,13 +50,150 @@ class TokenType(Enum):
     NEWLINE = "NEWLINE"
 
 
+class LineIndex:
+    """
+    行首偏移索引
+    每个源代码建立一次，由偏移量二分查找得到行号和列号；
+    整体源代码在首次查询时才建立索引，分块读取时随读入的块逐步追加
+    """
+    
+    def __init__(self, text: Optional[str] = None):
+        self.line_starts = array('I', [0])
+        self.length = 0
+        self._pending = text
+    
+    def reset(self, text: str):
+        """改为索引新的源代码（已有Token引用同一个索引对象，随之得到新的行列号）"""
+        self.line_starts = array('I', [0])
+        self.length = 0
+        self._pending = text
+    
+    def feed(self, chunk: str):
+        """追加一块源代码，记录其中的行首偏移"""
+        self._append_lines(self.line_starts, chunk, self.length)
+        self.length += len(chunk)
+    
+    @staticmethod
+    def _append_lines(line_starts: array, chunk: str, base: int):
+        find = chunk.find
+        pos = find('\n')
+        while pos >= 0:
+            line_starts.append(base + pos + 1)
+            pos = find('\n', pos + 1)
+    
+    def position(self, offset: int):
+        """偏移量offset处的(行号, 列号)，均从1开始"""
+        if self._pending is not None:
+            # 先建立完整索引再替换，多个线程同时首次查询也不会看到不完整的索引
+            line_starts = array('I', [0])
+            self._append_lines(line_starts, self._pending, 0)
+            self.line_starts = line_starts
+            self.length = len(self._pending)
+            self._pending = None
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+
 class Token:
-    """Token类，表示一个词法单元"""
-    def __init__(self, type: TokenType, value: str, line: int = 0, column: int = 0):
+    """Token类，表示一个词法单元，只记录起始偏移，行号和列号按需计算"""
+    def __init__(self, type: TokenType, value: str, offset: int = 0, lines: Optional[LineIndex] = None):
         self.type = type
         self.value = value
-        self.line = line
-        self.column = column
+        self.offset = offset
+        self.lines = lines
+    
+    @property
+    def line(self) -> int:
+        return self.lines.position(self.offset)[0] if self.lines else 0
+    
+    @property
+    def column(self) -> int:
+        return self.lines.position(self.offset)[1] if self.lines else 0
+    
+    def __repr__(self):
+        return f"Token({self.type.name}, {self.value!r}, line={self.line})"
+
+
+# 全局字符串驻留表：相同的标识符和字符串字面量在所有已加载的脚本之间共享同一个对象
+intern_string = sys.intern
+
+
+# Token类型与紧凑类型码的对应关系
+TOKEN_TYPES = tuple(TokenType)
+TOKEN_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+STRING_CODE = TOKEN_CODES[TokenType.STRING]
+# 整体扫描时空白和注释的类型码（不写入TokenBuffer）
+BULK_SKIP = 255
+
+
+class TokenBuffer:
+    """
+    紧凑Token缓冲区
+    类型码存放在array('B')中，起止偏移存放在array('I')中，值在访问时才从源代码切片，
+    通过下标访问得到与Token兼容的TokenView，可直接作为语法分析器的Token序列
+    """
+    
+    def __init__(self, source: str, lines: Optional[LineIndex] = None):
+        self.source = source
+        self.lines = lines or LineIndex(source)
+        self.types = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+    
+    def __len__(self) -> int:
+        return len(self.types)
+    
+    def __getitem__(self, index: int) -> 'TokenView':
+        if index < 0:
+            index += len(self.types)
+            if index < 0:
+                raise IndexError("TokenBuffer index out of range")
+        # 超出末尾时由TokenView取类型码抛出IndexError
+        return TokenView(self, index)
+    
+    def __iter__(self) -> Iterator['TokenView']:
+        for index in range(len(self.types)):
+            yield TokenView(self, index)
+    
+    def type_at(self, index: int) -> TokenType:
+        """第index个Token的类型"""
+        return TOKEN_TYPES[self.types[index]]
+    
+    def value_at(self, index: int) -> str:
+        """第index个Token的值（字符串字面量去掉引号并处理转义）"""
+        start, end = self.starts[index], self.ends[index]
+        if self.types[index] == STRING_CODE:
+            return intern_string(Lexer._unescape(self.source[start + 1:end - 1]))
+        return intern_string(self.source[start:end])
+    
+    def position_at(self, index: int):
+        """第index个Token的(行号, 列号)"""
+        return self.lines.position(self.starts[index])
+
+
+class TokenView:
+    """
+    TokenBuffer中单个Token的只读视图，接口与Token相同
+    类型在创建时取出（语法分析器对每个Token多次比较类型），值和行列号在访问时才计算
+    """
+    __slots__ = ('buffer', 'index', 'type')
+    
+    def __init__(self, buffer: TokenBuffer, index: int):
+        self.buffer = buffer
+        self.index = index
+        self.type = TOKEN_TYPES[buffer.types[index]]
+    
+    @property
+    def value(self) -> str:
+        return self.buffer.value_at(self.index)
+    
+    @property
+    def line(self) -> int:
+        return self.buffer.position_at(self.index)[0]
+    
+    @property
+    def column(self) -> int:
+        return self.buffer.position_at(self.index)[1]
     
     def __repr__(self):
         return f"Token({self.type.name}, {self.value!r}, line={self.line})"
@@ -67,28 +212,89 @@ class Lexer:
         'set': TokenType.SET,
         'or': TokenType.OR,
         'options': TokenType.OPTIONS,
+        'import': TokenType.IMPORT,
+        'carry_over': TokenType.CARRY_OVER,
     }
     
-    def __init__(self, text: str):
+    PUNCTUATION = {
+        '{': TokenType.LBRACE,
+        '}': TokenType.RBRACE,
+        '(': TokenType.LPAREN,
+        ')': TokenType.RPAREN,
+        '[': TokenType.LBRACKET,
+        ']': TokenType.RBRACKET,
+        '=': TokenType.EQUALS,
+        ',': TokenType.COMMA,
+        '$': TokenType.DOLLAR,
+    }
+    
+    # 可选的扫描引擎：char为逐字符扫描，regex为基于主正则的表驱动扫描
+    ENGINES = ('char', 'regex')
+    
+    # 主正则：先吞掉前导空白，再按分组序号区分词法单元（分组序号即lastindex）
+    MASTER_PATTERN = re.compile(r'''
+        [ \t\r]*
+        (?:
+            (\n)                                   # 1 换行
+          | ("[^"\\]*(?:\\.[^"\\]*)*")             # 2 字符串
+          | ([^\W\d]\w*)                           # 3 标识符或关键字
+          | ([{}()\[\]=,$])                        # 4 特殊字符
+          | (\#[^\n]*\n?)                          # 5 注释（连同行尾换行一起跳过）
+          | (\d+)                                  # 6 数字
+        )
+    ''', re.VERBOSE | re.DOTALL)
+    
+    # 整体扫描正则：不含分组，每个片段是一个Token连同其后的空白，片段首尾相接覆盖全部源代码（"."兜底）；
+    # 只接受ASCII的标识符和数字，其余情况（非ASCII的标识符、未闭合的字符串、非法字符）由主正则逐个扫描处理
+    BULK_PATTERN = re.compile(r'''
+        [ \t\r]+                                   # 源代码开头的空白
+      | (?:
+            \n                                     # 换行
+          | "[^"\\]*(?:\\.[^"\\]*)*"               # 字符串
+          | [A-Za-z_][A-Za-z0-9_]*                 # 标识符或关键字
+          | [0-9]+                                 # 数字
+          | [{}()\[\]=,$]                          # 特殊字符
+          | \#[^\n]*\n?                            # 注释（连同行尾换行）
+          | .                                      # 其他字符
+        )[ \t\r]*
+    ''', re.VERBOSE | re.DOTALL)
+    
+    ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+    ESCAPES = {'n': '\n', 't': '\t'}
+    
+    def __init__(self, text: str, engine: str = 'char'):
+        """
+        初始化词法分析器
+        :param text: DSL源代码
+        :param engine: 扫描引擎，'char'（逐字符）或 'regex'（主正则）
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown lexer engine: {engine}")
         self.text = text
+        self.engine = engine
+        self.lines = LineIndex(text)
         self.pos = 0
-        self.line = 1
-        self.column = 1
         self.current_char = self.text[self.pos] if self.pos < len(self.text) else None
+        self._regex_tokens: Optional[Iterator[Token]] = None
+    
+    @property
+    def line(self) -> int:
+        """当前扫描位置的行号（由行首索引计算）"""
+        return self.lines.position(self.pos)[0]
+    
+    @property
+    def column(self) -> int:
+        """当前扫描位置的列号（由行首索引计算）"""
+        return self.lines.position(self.pos)[1]
     
     def error(self, message: str):
         """抛出词法分析错误"""
-        raise SyntaxError(f"Lexer error at line {self.line}, column {self.column}: {message}")
+        line, column = self.lines.position(self.pos)
+        raise SyntaxError(f"Lexer error at line {line}, column {column}: {message}")
     
     def advance(self):
         """移动到下一个字符"""
-        if self.current_char == '\n':
-            self.line += 1
-            self.column = 0
-        
         self.pos += 1
-        self.column += 1
-        
         if self.pos >= len(self.text):
             self.current_char = None
         else:
@@ -159,6 +365,11 @@ class Lexer:
     
     def get_next_token(self) -> Token:
         """获取下一个Token"""
+        if self.engine == 'regex':
+            if self._regex_tokens is None:
+                self._regex_tokens = self.iter_regex_tokens()
+            return next(self._regex_tokens, None) or Token(TokenType.EOF, '', self.pos, self.lines)
+        
         while self.current_char:
             # 跳过空白
             if self.current_char in ' \t\r':
@@ -172,67 +383,341 @@ class Lexer:
             
             # 换行符
             if self.current_char == '\n':
-                token = Token(TokenType.NEWLINE, '\n', self.line, self.column)
+                token = Token(TokenType.NEWLINE, '\n', self.pos, self.lines)
                 self.advance()
                 return token
             
             # 字符串
             if self.current_char == '"':
-                line, col = self.line, self.column
-                value = self.read_string()
-                return Token(TokenType.STRING, value, line, col)
+                start = self.pos
+                value = intern_string(self.read_string())
+                return Token(TokenType.STRING, value, start, self.lines)
             
             # 数字
             if self.current_char.isdigit():
-                line, col = self.line, self.column
-                value = self.read_number()
-                return Token(TokenType.NUMBER, value, line, col)
+                start = self.pos
+                value = intern_string(self.read_number())
+                return Token(TokenType.NUMBER, value, start, self.lines)
             
             # 标识符或关键字
             if self.current_char.isalpha() or self.current_char == '_':
-                line, col = self.line, self.column
-                value = self.read_identifier()
+                start = self.pos
+                value = intern_string(self.read_identifier())
                 token_type = self.KEYWORDS.get(value, TokenType.IDENTIFIER)
-                return Token(token_type, value, line, col)
+                return Token(token_type, value, start, self.lines)
             
             # 特殊字符
-            line, col = self.line, self.column
+            start = self.pos
             char = self.current_char
             
             if char == '{':
                 self.advance()
-                return Token(TokenType.LBRACE, char, line, col)
+                return Token(TokenType.LBRACE, char, start, self.lines)
             elif char == '}':
                 self.advance()
-                return Token(TokenType.RBRACE, char, line, col)
+                return Token(TokenType.RBRACE, char, start, self.lines)
             elif char == '(':
                 self.advance()
-                return Token(TokenType.LPAREN, char, line, col)
+                return Token(TokenType.LPAREN, char, start, self.lines)
             elif char == ')':
                 self.advance()
-                return Token(TokenType.RPAREN, char, line, col)
+                return Token(TokenType.RPAREN, char, start, self.lines)
             elif char == '[':
                 self.advance()
-                return Token(TokenType.LBRACKET, char, line, col)
+                return Token(TokenType.LBRACKET, char, start, self.lines)
             elif char == ']':
                 self.advance()
-                return Token(TokenType.RBRACKET, char, line, col)
+                return Token(TokenType.RBRACKET, char, start, self.lines)
             elif char == '=':
                 self.advance()
-                return Token(TokenType.EQUALS, char, line, col)
+                return Token(TokenType.EQUALS, char, start, self.lines)
             elif char == ',':
                 self.advance()
-                return Token(TokenType.COMMA, char, line, col)
+                return Token(TokenType.COMMA, char, start, self.lines)
             elif char == '$':
                 self.advance()
-                return Token(TokenType.DOLLAR, char, line, col)
+                return Token(TokenType.DOLLAR, char, start, self.lines)
             else:
                 self.error(f"Unexpected character: {char}")
         
-        return Token(TokenType.EOF, '', self.line, self.column)
+        return Token(TokenType.EOF, '', self.pos, self.lines)
+    
+    @classmethod
+    def _unescape(cls, raw: str) -> str:
+        """处理字符串字面量中的转义序列，规则与read_string一致"""
+        if '\\' not in raw:
+            return raw
+        escapes = cls.ESCAPES
+        return cls.ESCAPE_PATTERN.sub(lambda m: escapes.get(m.group(1), m.group(1)), raw)
+    
+    def _scan_word(self, text: str, pos: int):
+        """
+        按逐字符引擎的规则（isdigit/isalpha/isalnum）扫描数字或标识符
+        仅在主正则匹配到非ASCII字符时使用，保证两个引擎的输出完全一致
+        :return: (Token类型, 值)，起始字符不合法时返回None
+        """
+        end = pos
+        if text[pos].isdigit():
+            while end < len(text) and text[end].isdigit():
+                end += 1
+            return TokenType.NUMBER, text[pos:end]
+        if text[pos].isalpha() or text[pos] == '_':
+            while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+                end += 1
+            value = text[pos:end]
+            return self.KEYWORDS.get(value, TokenType.IDENTIFIER), value
+        return None
+    
+    def _error_at(self, offset: int, message: str):
+        """在源代码偏移offset处报错"""
+        self.pos = offset
+        self.error(message)
+    
+    def iter_regex_tokens(self) -> Iterator[Token]:
+        """使用主正则逐个产生Token（regex引擎），输出与逐字符引擎相同"""
+        return self._scan_chunks(iter((self.text,)))
+    
+    def _scan_chunks(self, chunks: Iterator[str], start: int = 0) -> Iterator[Token]:
+        """
+        按块扫描源代码并逐个产生Token
+        缓冲区末尾可能不完整的Token会等到读入下一块后再扫描，已扫描的前缀随即丢弃
+        :param start: 在第一块中开始扫描的位置（必须位于Token边界）
+        """
+        keywords = self.KEYWORDS
+        punctuation = self.PUNCTUATION
+        unescape = self._unescape
+        intern = intern_string
+        pattern = self.MASTER_PATTERN
+        lines = self.lines
+        newline, string, identifier, number = (
+            TokenType.NEWLINE, TokenType.STRING, TokenType.IDENTIFIER, TokenType.NUMBER
+        )
+        buffer = next(chunks, None)
+        final = buffer is None
+        if final:
+            buffer = ''
+        base = 0                  # 缓冲区起点在整个源代码中的偏移
+        pos = start               # 缓冲区内的扫描位置
+        need_input = False
+        
+        while True:
+            if need_input and not final:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    final = True
+                else:
+                    if pos:
+                        buffer = buffer[pos:]
+                        base += pos
+                        pos = 0
+                    buffer += chunk
+            need_input = True
+            end = len(buffer)
+            
+            for m in pattern.finditer(buffer, pos):
+                if m.start() != pos or (m.end() == end and not final):
+                    break
+                kind = m.lastindex
+                start = m.start(kind)
+                next_pos = m.end()
+                if kind == 1:
+                    yield Token(newline, '\n', base + start, lines)
+                elif kind == 2:
+                    yield Token(string, intern(unescape(buffer[start + 1:next_pos - 1])), base + start, lines)
+                elif kind == 4:
+                    value = m.group(4)
+                    yield Token(punctuation[value], value, base + start, lines)
+                elif kind == 5:
+                    pass
+                elif m.group(kind).isascii() and (next_pos == end or buffer[next_pos].isascii()):
+                    value = intern(m.group(kind))
+                    token_type = number if kind == 6 else keywords.get(value, identifier)
+                    yield Token(token_type, value, base + start, lines)
+                else:
+                    # 含非ASCII字符时按逐字符引擎的规则重新扫描，切分不同则从新位置重启正则
+                    word = self._scan_word(buffer, start)
+                    if word is None:
+                        self._error_at(base + start, f"Unexpected character: {buffer[start]}")
+                    if start + len(word[1]) == end and not final:
+                        break
+                    yield Token(word[0], intern(word[1]), base + start, lines)
+                    if start + len(word[1]) != next_pos:
+                        pos = start + len(word[1])
+                        need_input = False
+                        break
+                pos = next_pos
+            
+            if not need_input:
+                continue
+            # 扫描位置之后剩余的内容：空白、未读完的Token或非法字符
+            rest = pos
+            while rest < end and buffer[rest] in ' \t\r':
+                rest += 1
+            if rest == end:
+                if final:
+                    break
+                continue
+            if final:
+                if buffer[rest] == '"':
+                    # 未闭合的字符串：与逐字符引擎一样，在读到源代码末尾后报错
+                    self._error_at(base + end, "Unterminated string")
+            elif buffer[rest] == '"' or pattern.match(buffer, pos):
+                # 可能是被块边界截断的字符串或Token，读入下一块后重新扫描
+                continue
+            self._error_at(base + rest, f"Unexpected character: {buffer[rest]}")
+        
+        self.pos = base + end
+        self.current_char = None
+        yield Token(TokenType.EOF, '', self.pos, lines)
+    
+    def iter_tokens(self) -> Iterator[Token]:
+        """逐个产生Token（以EOF结束），供语法分析器按需拉取"""
+        if self.engine == 'regex':
+            yield from self.iter_regex_tokens()
+            return
+        while True:
+            token = self.get_next_token()
+            yield token
+            if token.type == TokenType.EOF:
+                break
+    
+    def tokenize_compact(self) -> TokenBuffer:
+        """
+        将整个源代码转换为紧凑的TokenBuffer（不创建Token对象），切分规则与tokenize()相同
+        用整体扫描正则一次切出全部Token，类型码和起止偏移由map/accumulate批量得到，不逐个处理匹配；
+        整体扫描不处理的片段（非ASCII标识符、未闭合的字符串、非法字符）从所在处用主正则逐个扫描到下一个换行
+        """
+        text = self.text
+        buffer = TokenBuffer(text, self.lines)
+        codes = TOKEN_CODES
+        # Token首字符 -> 类型码（空白和注释为BULK_SKIP）
+        heads = {char: codes[token_type] for char, token_type in self.PUNCTUATION.items()}
+        heads.update(dict.fromkeys(' \t\r#', BULK_SKIP))
+        heads.update(dict.fromkeys('0123456789', codes[TokenType.NUMBER]))
+        heads.update(dict.fromkeys('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_',
+                                   codes[TokenType.IDENTIFIER]))
+        heads['\n'] = codes[TokenType.NEWLINE]
+        heads['"'] = codes[TokenType.STRING]
+        # 整个Token -> 类型码：关键字；单独的引号是未闭合的字符串，映射为None（不处理的片段）
+        words = {word: codes[token_type] for word, token_type in self.KEYWORDS.items()}
+        words['"'] = None
+        word_codes = (codes[TokenType.IDENTIFIER], codes[TokenType.NUMBER])
+        
+        pos = 0
+        while True:
+            pieces = self.BULK_PATTERN.findall(text, pos)
+            tokens = list(map(str.rstrip, pieces, repeat(' \t\r')))
+            types = list(map(words.get, tokens, map(heads.get, map(itemgetter(0), pieces))))
+            starts = list(accumulate(map(len, pieces), initial=pos))
+            ends = list(map(add, starts, map(len, tokens)))
+            done = 0
+            while True:
+                try:
+                    stop = types.index(None, done)
+                except ValueError:
+                    stop = len(types)
+                else:
+                    # 紧挨在前面的ASCII标识符或数字按逐字符引擎的规则会与非ASCII字符连成一个词，一起重新扫描
+                    if stop > done and heads.get(pieces[stop - 1][0]) in word_codes:
+                        stop -= 1
+                segment = types[done:stop]
+                if BULK_SKIP in segment:
+                    keep = list(map(BULK_SKIP.__ne__, segment))
+                    buffer.types.extend(compress(segment, keep))
+                    buffer.starts.extend(compress(starts[done:stop], keep))
+                    buffer.ends.extend(compress(ends[done:stop], keep))
+                else:
+                    buffer.types.extend(segment)
+                    buffer.starts.extend(starts[done:stop])
+                    buffer.ends.extend(ends[done:stop])
+                if stop == len(types):
+                    break
+                # 逐个扫描到下一个换行，之后的位置落在已切出的片段边界上时，接着使用后面的片段
+                pos = self._scan_compact_line(buffer, starts[stop])
+                while pos < len(text) and text[pos] in ' \t\r':
+                    pos += 1
+                done = bisect_left(starts, pos, stop)
+                if starts[done] != pos:
+                    break
+            if stop == len(types):
+                break
+        
+        buffer.types.append(codes[TokenType.EOF])
+        buffer.starts.append(len(text))
+        buffer.ends.append(len(text))
+        return buffer
+    
+    def _scan_compact_line(self, buffer: TokenBuffer, pos: int) -> int:
+        """
+        从pos处用主正则逐个扫描，写入TokenBuffer，直到写入一个换行（含非ASCII标识符时按逐字符引擎的规则切分）
+        :return: 停止扫描的位置（换行之后，或源代码末尾）
+        """
+        text = self.text
+        end = len(text)
+        append_type, append_start, append_end = (
+            buffer.types.append, buffer.starts.append, buffer.ends.append
+        )
+        codes = TOKEN_CODES
+        keywords = {word: codes[token_type] for word, token_type in self.KEYWORDS.items()}
+        punctuation = {char: codes[token_type] for char, token_type in self.PUNCTUATION.items()}
+        newline, string, identifier, number = (
+            codes[TokenType.NEWLINE], codes[TokenType.STRING],
+            codes[TokenType.IDENTIFIER], codes[TokenType.NUMBER]
+        )
+        pattern = self.MASTER_PATTERN
+        
+        scanner = pattern.finditer(text, pos)
+        restart = True
+        while restart:
+            restart = False
+            for m in scanner:
+                if m.start() != pos:
+                    break
+                kind = m.lastindex
+                start = m.start(kind)
+                pos = m.end()
+                if kind == 5:
+                    continue
+                if kind == 1:
+                    code = newline
+                elif kind == 2:
+                    code = string
+                elif kind == 4:
+                    code = punctuation[text[start]]
+                elif m.group(kind).isascii() and (pos == end or text[pos].isascii()):
+                    code = number if kind == 6 else keywords.get(m.group(kind), identifier)
+                else:
+                    # 含非ASCII字符时按逐字符引擎的规则重新扫描，切分不同则从新位置重启正则
+                    word = self._scan_word(text, start)
+                    if word is None:
+                        self._error_at(start, f"Unexpected character: {text[start]}")
+                    code = codes[word[0]]
+                    if start + len(word[1]) != pos:
+                        pos = start + len(word[1])
+                        scanner = pattern.finditer(text, pos)
+                        restart = True
+                append_type(code)
+                append_start(start)
+                append_end(pos)
+                if code == newline:
+                    return pos
+                if restart:
+                    break
+        
+        # 扫描停止处之后只能是空白，否则为未闭合的字符串或非法字符
+        rest = pos
+        while rest < end and text[rest] in ' \t\r':
+            rest += 1
+        if rest < end:
+            if text[rest] == '"':
+                self._error_at(end, "Unterminated string")
+            self._error_at(rest, f"Unexpected character: {text[rest]}")
+        return end
     
     def tokenize(self) -> List[Token]:
         """将整个源代码转换为Token列表"""
+        if self.engine == 'regex':
+            return list(self.iter_regex_tokens())
         tokens = []
         while True:
             token = self.get_next_token()
@@ -241,3 +726,155 @@ class Lexer:
                 break
         return tokens
 
+
+class ChunkedLexer(Lexer):
+    """
+    分块词法分析器
+    源代码以字符串块的形式逐步提供（例如仍在读取中的文件），扫描与读取交替进行，
+    内存中只保留尚未扫描完的缓冲区
+    """
+    
+    def __init__(self, chunks: Iterable[str]):
+        super().__init__('', engine='regex')
+        self.lines = LineIndex()
+        self.chunks = self._feed_lines(chunks)
+    
+    def _feed_lines(self, chunks: Iterable[str]) -> Iterator[str]:
+        """读入每一块时同步记录行首偏移"""
+        for chunk in chunks:
+            self.lines.feed(chunk)
+            yield chunk
+    
+    @classmethod
+    def from_file(cls, file_path: str, chunk_size: int = 64 * 1024) -> 'ChunkedLexer':
+        """按块读取文件的分块词法分析器"""
+        def read_chunks():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        return cls(read_chunks())
+    
+    def iter_regex_tokens(self) -> Iterator[Token]:
+        """按块扫描源代码"""
+        return self._scan_chunks(self.chunks)
+
+
+def compute_edit(old_text: str, new_text: str):
+    """
+    计算从old_text到new_text的单处编辑（公共前缀和公共后缀之外的部分）
+    :return: (偏移, 删除长度, 插入文本)
+    """
+    limit = min(len(old_text), len(new_text))
+    # 二分查找最长公共前缀（切片比较在C层完成）
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old_text[:middle] == new_text[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = low
+    # 二分查找最长公共后缀（不与公共前缀重叠）
+    low, high = 0, limit - prefix
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old_text[len(old_text) - middle:] == new_text[len(new_text) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    suffix = low
+    return prefix, len(old_text) - prefix - suffix, new_text[prefix:len(new_text) - suffix]
+
+
+class IncrementalLexer(Lexer):
+    """
+    增量词法分析器
+    保留上一次的Token序列，源代码发生局部编辑时只重新扫描受影响的区域，
+    在编辑区之后与旧Token的起点重新对齐，其余Token仅平移偏移量
+    """
+    
+    def __init__(self, text: str):
+        super().__init__(text, engine='regex')
+        self.tokens: Optional[List[Token]] = None
+        self.last_rescanned = 0  # 最近一次编辑重新扫描的Token数
+    
+    def tokenize(self) -> List[Token]:
+        """返回当前源代码的Token列表（已扫描过则直接复用）"""
+        if self.tokens is None:
+            self.tokens = list(self.iter_regex_tokens())
+            self.last_rescanned = len(self.tokens)
+        return self.tokens
+    
+    def update(self, new_text: str) -> List[Token]:
+        """用新的源代码替换当前源代码，自动计算编辑区域并增量扫描"""
+        offset, removed, inserted = compute_edit(self.text, new_text)
+        return self.apply_edit(offset, removed, inserted)
+    
+    def apply_edit(self, offset: int, removed: int, inserted: str) -> List[Token]:
+        """
+        应用一处编辑并增量更新Token序列
+        :param offset: 编辑起点
+        :param removed: 删除的字符数
+        :param inserted: 插入的文本
+        :return: 新的Token列表（编辑区之后的旧Token对象被原地平移后复用）
+        """
+        old_tokens = self.tokenize()
+        text = self.text[:offset] + inserted + self.text[offset + removed:]
+        delta = len(inserted) - removed
+        edit_end = offset + len(inserted)
+        
+        # 从编辑起点之前最后一个Token的起点重新扫描（该位置之前的源代码没有变化）
+        restart = self._last_token_before(old_tokens, offset)
+        restart_offset = old_tokens[restart].offset if restart >= 0 else 0
+        rescanner = Lexer(text, engine='regex')
+        
+        new_tokens = old_tokens[:restart] if restart >= 0 else []
+        rescanned = 0
+        resync = None
+        for token in rescanner._scan_chunks(iter((text,)), restart_offset):
+            if token.offset >= edit_end and token.type != TokenType.EOF:
+                index = self._token_index_at(old_tokens, token.offset - delta)
+                if index is not None and index > restart and old_tokens[index].type == token.type:
+                    resync = index
+                    break
+            new_tokens.append(token)
+            rescanned += 1
+        
+        # 所有Token共享同一个行首索引对象，重置后行列号随新源代码计算
+        self.lines.reset(text)
+        for token in new_tokens[len(new_tokens) - rescanned:]:
+            token.lines = self.lines
+        if resync is not None:
+            tail = old_tokens[resync:]
+            if delta:
+                for token in tail:
+                    token.offset += delta
+            new_tokens.extend(tail)
+        
+        self.text = text
+        self.tokens = new_tokens
+        self.last_rescanned = rescanned
+        return new_tokens
+    
+    @staticmethod
+    def _last_token_before(tokens: List[Token], offset: int) -> int:
+        """起点严格小于offset的最后一个Token的下标，不存在时返回-1"""
+        low, high = 0, len(tokens)
+        while low < high:
+            middle = (low + high) // 2
+            if tokens[middle].offset < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+    
+    @classmethod
+    def _token_index_at(cls, tokens: List[Token], offset: int) -> Optional[int]:
+        """起点恰好为offset的Token的下标，不存在时返回None"""
+        index = cls._last_token_before(tokens, offset) + 1
+        if index < len(tokens) and tokens[index].offset == offset:
+            return index
+        return None
@@ -5,6 +5,7 @@ LLM客户端（LLM Client）
 """
 
 import os
+import asyncio
 from typing import List, Optional, Dict
 from dotenv import load_dotenv
 from src.logger import setup_logger
@@ -30,6 +31,13 @@ class LLMClient:
         :return: 匹配的意图名称，如果没有匹配则返回None
         """
         raise NotImplementedError
+    
+    async def identify_intent_async(self, user_input: str, intents: List, conversation_history: List = None, last_intent: str = None, last_context: Dict = None) -> Optional[str]:
+        """
+        identify_intent的异步版本，参数和返回值相同
+        默认在工作线程中调用identify_intent（同步的HTTP请求不阻塞事件循环），提供异步API的客户端可以覆盖
+        """
+        return await asyncio.to_thread(self.identify_intent, user_input, intents, conversation_history, last_intent, last_context)
 
 
 class ZhipuAIClient(LLMClient):
@@ -98,7 +106,12 @@ class ZhipuAIClient(LLMClient):
             logger.debug(f"上一次上下文: {last_context}")
         if conversation_history and len(conversation_history) > 0:
             context_info += "\n\n最近对话历史："
-            for msg in conversation_history[-4:]:  # 只显示最近4条
+            messages = [msg for msg in conversation_history if msg.get("role") != "summary"]
+            # 更早对话的摘要记录（见src/history.py）
+            for msg in conversation_history:
+                if msg.get("role") == "summary":
+                    context_info += f"\n（{msg.get('content', '')}）"
+            for msg in messages[-4:]:  # 只显示最近4条
                 role = "用户" if msg.get("role") == "user" else "机器人"
                 context_info += f"\n{role}: {msg.get('content', '')}"
             logger.debug(f"对话历史长度: {len(conversation_history)}")
@@ -0,0 +1,135 @@
+"""
+多脚本加载器（Loader）
+作用：在进程池中并行编译目录下的多个DSL脚本，并合并为一个Program
+在全项目中的作用：多个业务脚本（订单、退款、技术支持等）作为同一个机器人运行时，
+                  无需再手工拼接combined.dsl；合并时检查重复的意图名和重叠的触发模式
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from src.parser import Program
+from src.script_cache import load_program
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Loader")
+
+
+class ScriptLoadResult:
+    """多脚本加载结果"""
+    
+    def __init__(self, program: Program, timings: Dict[str, float],
+                 duplicate_intents: List[Tuple[str, str, str]],
+                 overlapping_patterns: List[Tuple[str, str, str]]):
+        """
+        :param program: 合并后的程序
+        :param timings: 脚本路径 -> 编译耗时（秒）
+        :param duplicate_intents: (意图名, 保留的脚本, 被丢弃的脚本)
+        :param overlapping_patterns: (触发模式, 已有的意图名, 重复声明的意图名)
+        """
+        self.program = program
+        self.timings = timings
+        self.duplicate_intents = duplicate_intents
+        self.overlapping_patterns = overlapping_patterns
+    
+    def __repr__(self):
+        return (f"ScriptLoadResult({len(self.program.intents)} intents, {len(self.timings)} files, "
+                f"{len(self.duplicate_intents)} duplicates, {len(self.overlapping_patterns)} overlaps)")
+
+
+def _compile_script(path: str) -> Tuple[str, Program, float, bool]:
+    """在工作进程中编译单个脚本，返回 (路径, 程序, 耗时, 是否来自缓存)"""
+    start = time.perf_counter()
+    try:
+        program, from_cache = load_program(path)
+    except SyntaxError as e:
+        # 合并多个脚本时需要知道出错的是哪个文件
+        raise SyntaxError(f"{path}: {e}") from None
+    return path, program, time.perf_counter() - start, from_cache
+
+
+def find_scripts(source: Union[str, Path, Iterable[Union[str, Path]]]) -> List[str]:
+    """
+    展开脚本来源：目录返回其中按文件名排序的.dsl文件，否则视为文件路径列表
+    """
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if path.is_dir():
+            return [str(p) for p in sorted(path.glob("*.dsl"))]
+        return [str(path)]
+    return [str(p) for p in source]
+
+
+def merge_programs(programs: List[Tuple[str, Program]]) -> ScriptLoadResult:
+    """
+    按顺序合并多个程序
+    同名意图只保留最先出现的一个（意图匹配按名称取第一个，后面的同名意图本来就无法被选中）
+    :param programs: (脚本路径, 程序) 列表
+    """
+    intents = []
+    intent_sources = {}
+    pattern_owners = {}
+    duplicates = []
+    overlaps = []
+    for path, program in programs:
+        for intent in program.intents:
+            if intent.name in intent_sources:
+                duplicates.append((intent.name, intent_sources[intent.name], path))
+                logger.warning(f"重复的意图 '{intent.name}'：保留 {intent_sources[intent.name]}，忽略 {path}")
+                continue
+            intent_sources[intent.name] = path
+            intents.append(intent)
+            for pattern in intent.when_clause.patterns:
+                owner = pattern_owners.setdefault(pattern, intent.name)
+                if owner != intent.name:
+                    overlaps.append((pattern, owner, intent.name))
+                    logger.warning(f"触发模式 '{pattern}' 同时出现在意图 '{owner}' 和 '{intent.name}' 中")
+    return ScriptLoadResult(Program(intents), {}, duplicates, overlaps)
+
+
+def _link_imports(programs: List[Tuple[str, Program]]) -> List[Tuple[str, Program]]:
+    """
+    展开import声明：每个脚本替换为合并了导入内容的程序，
+    被其他脚本导入的脚本不再单独合并，避免同一批意图被报告为重复
+    """
+    from src.modules import ModuleCache  # modules依赖本模块的merge_programs
+    
+    cache = ModuleCache()
+    linked = [(path, cache.load(path)) for path, _ in programs]
+    imported = {path for path, importers in cache.importers.items() if importers}
+    return [(path, program) for path, program in linked if cache.normalize(path) not in imported]
+
+
+def load_scripts(source: Union[str, Path, Iterable[Union[str, Path]]],
+                 max_workers: Optional[int] = None) -> ScriptLoadResult:
+    """
+    并行编译多个脚本并合并为一个Program
+    :param source: 脚本目录，或脚本文件路径列表
+    :param max_workers: 工作进程数，默认为CPU核数；为1或只有一个脚本时在当前进程中编译
+    :return: 加载结果（合并后的程序、每个文件的耗时、冲突信息）
+    :raises SyntaxError: 任一脚本存在语法错误（错误信息包含脚本路径）
+    """
+    paths = find_scripts(source)
+    if max_workers is None:
+        max_workers = min(len(paths), os.cpu_count() or 1)
+    
+    start = time.perf_counter()
+    if max_workers <= 1 or len(paths) <= 1:
+        results = [_compile_script(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_compile_script, paths))
+    
+    programs = [(path, program) for path, program, _, _ in results]
+    if any(program.imports for _, program in programs):
+        programs = _link_imports(programs)
+    result = merge_programs(programs)
+    for path, _, elapsed, from_cache in results:
+        result.timings[path] = elapsed
+        logger.info(f"编译 {path}: {elapsed * 1000:.1f}ms{'（编译缓存）' if from_cache else ''}")
+    logger.info(f"共加载 {len(paths)} 个脚本、{len(result.program.intents)} 个意图，"
+                f"总耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    return result
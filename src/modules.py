@@ -0,0 +1,155 @@
+"""
+模块缓存（Module Cache）
+作用：解析 import "file.dsl" 声明，每个脚本在进程内只解析一次，并记录脚本之间的依赖图
+在全项目中的作用：多个脚本共享的意图（订单、退款、优惠券等）可以放在公共脚本中导入；
+                  重新加载时只重新解析发生变化的脚本，导入了它们的脚本只需重新合并，
+                  编译耗时与改动量成正比，而不是与全部脚本的总大小成正比
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from src.parser import Program, IncrementalParser
+from src.loader import merge_programs
+from src.script_cache import load_program, source_digest
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Modules")
+
+
+class Module:
+    """已解析的脚本模块"""
+    
+    def __init__(self, path: str, stat_key: Tuple[int, int], digest: bytes,
+                 program: Program, imports: Tuple[str, ...]):
+        """
+        :param path: 脚本的绝对路径
+        :param stat_key: (修改时间, 文件大小)，用于快速判断文件是否可能变化
+        :param digest: 源代码哈希，修改时间变化但内容不变时不重新解析
+        :param program: 脚本自身的程序（不含导入的意图）
+        :param imports: 导入的脚本的绝对路径
+        """
+        self.path = path
+        self.stat_key = stat_key
+        self.digest = digest
+        self.program = program
+        self.imports = imports
+
+
+class ModuleCache:
+    """
+    模块缓存
+    load()返回合并了全部（传递）导入的程序：当前脚本的意图在前，导入的意图按导入顺序在后，
+    同名意图以先出现的为准，因此脚本自身的定义会覆盖导入的同名意图
+    """
+    
+    def __init__(self):
+        self.modules: Dict[str, Module] = {}
+        self.importers: Dict[str, Set[str]] = {}  # 脚本路径 -> 直接导入它的脚本
+        self.linked: Dict[str, Program] = {}  # 脚本路径 -> 合并导入后的程序
+        self.parsers: Dict[str, IncrementalParser] = {}  # 脚本路径 -> 意图粒度的增量语法分析器
+        self.parse_count = 0  # 实际解析（或读取编译缓存）的次数，便于观察增量效果
+    
+    @staticmethod
+    def normalize(path) -> str:
+        return os.path.abspath(str(path))
+    
+    def load(self, path) -> Program:
+        """
+        加载脚本及其导入的脚本，未变化的脚本直接复用
+        :raises SyntaxError: 脚本有语法错误、导入的文件不存在或存在循环导入
+        """
+        path = self.normalize(path)
+        self._refresh(path, (), set())
+        program = self.linked.get(path)
+        if program is None:
+            program = self._link(path)
+            self.linked[path] = program
+        return program
+    
+    def dependents(self, path) -> Set[str]:
+        """直接或间接导入了path的所有脚本"""
+        result = set()
+        pending = [self.normalize(path)]
+        while pending:
+            for importer in self.importers.get(pending.pop(), ()):
+                if importer not in result:
+                    result.add(importer)
+                    pending.append(importer)
+        return result
+    
+    def _refresh(self, path: str, stack: Tuple[str, ...], checked: Set[str]):
+        """确保path及其依赖是最新的，stack用于检测循环导入，checked避免同一次加载中重复检查"""
+        if path in stack:
+            cycle = " -> ".join(Path(p).name for p in stack[stack.index(path):] + (path,))
+            raise SyntaxError(f"Circular import: {cycle}")
+        if path in checked:
+            return
+        checked.add(path)
+        
+        try:
+            stat = os.stat(path)
+        except OSError:
+            importer = f" (imported by {stack[-1]})" if stack else ""
+            raise SyntaxError(f"Cannot import '{path}': file not found{importer}") from None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        
+        module = self.modules.get(path)
+        if module is None or module.stat_key != stat_key:
+            with open(path, 'r', encoding='utf-8') as f:
+                source = f.read()
+            digest = source_digest(source)
+            if module is not None and module.digest == digest:
+                module.stat_key = stat_key
+            else:
+                self._replace(path, self._parse(path, source, stat_key, digest))
+        
+        for dependency in self.modules[path].imports:
+            self._refresh(dependency, stack + (path,), checked)
+    
+    def _parse(self, path: str, source: str, stat_key: Tuple[int, int], digest: bytes) -> Module:
+        """解析单个脚本（编译缓存有效时直接读取，否则只重新解析修改过的意图块）"""
+        parser = self.parsers.setdefault(path, IncrementalParser())
+        try:
+            program, from_cache = load_program(path, source, compiler=parser.parse)
+        except SyntaxError as e:
+            raise SyntaxError(f"{path}: {e}") from None
+        if from_cache:
+            parser.seed(source, program)
+        else:
+            logger.info(f"增量解析 {path}：重新解析 {parser.last_reparsed} 个意图，复用 {parser.last_reused} 个")
+        self.parse_count += 1
+        base = os.path.dirname(path)
+        imports = tuple(self.normalize(os.path.join(base, decl.path)) for decl in program.imports)
+        logger.info(f"解析模块 {path}，导入 {len(imports)} 个脚本")
+        return Module(path, stat_key, digest, program, imports)
+    
+    def _replace(self, path: str, module: Module):
+        """替换模块，更新依赖图，并使它和所有导入它的脚本的合并结果失效"""
+        old = self.modules.get(path)
+        if old is not None:
+            for dependency in old.imports:
+                self.importers.get(dependency, set()).discard(path)
+        for dependency in module.imports:
+            self.importers.setdefault(dependency, set()).add(path)
+        self.modules[path] = module
+        for stale in {path} | self.dependents(path):
+            self.linked.pop(stale, None)
+    
+    def _link(self, path: str) -> Program:
+        """按深度优先顺序合并脚本和它导入的脚本，同一脚本只合并一次"""
+        order: List[str] = []
+        visited: Set[str] = set()
+        pending = [path]
+        while pending:
+            current = pending.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            order.append(current)
+            pending.extend(reversed(self.modules[current].imports))
+        if len(order) == 1:
+            return self.modules[path].program
+        result = merge_programs([(p, self.modules[p].program) for p in order])
+        return result.program
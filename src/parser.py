@@ -4,31 +4,98 @@
 在全项目中的作用：这是编译过程的第二步，将线性的Token序列转换为树形结构，为解释器提供执行依据
 """
 
-from typing import List, Optional, Any
-from src.lexer import Lexer, Token, TokenType
+import re
+import bisect
+from collections import deque
+from typing import Dict, List, Optional, Any, Tuple
+from src.lexer import Lexer, Token, TokenType, compute_edit
+from src.template import compile_template
 
 
 class ASTNode:
-    """AST节点基类"""
+    """
+    AST节点基类
+    节点使用__slots__保存字段，构造完成后不可修改（列表字段保存为元组），
+    因此同一个Program可以在线程之间、fork出的工作进程之间只读共享
+    """
+    __slots__ = ()
+    # 构造函数参数对应的字段，默认为全部__slots__；
+    # 在构造时由字段派生的槽（例如编译后的模板）不计入相等比较和序列化
+    _fields = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_fields' not in cls.__dict__:
+            cls._fields = cls.__slots__
+    
+    def _init_fields(self, *values):
+        """按__slots__的顺序设置字段，仅在构造时调用"""
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+    
+    def _field_values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+    
+    def __eq__(self, other):
+        return type(self) is type(other) and self._field_values() == other._field_values()
+    
+    def __hash__(self):
+        return hash((type(self), self._field_values()))
+    
+    def __reduce__(self):
+        # _fields的顺序与构造函数参数一致，序列化时按构造函数重建
+        return (self.__class__, self._field_values())
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
     def __repr__(self):
         return f"{self.__class__.__name__}()"
 
 
 class Program(ASTNode):
-    """程序节点：包含多个意图声明"""
-    def __init__(self, intents: List['IntentDecl']):
-        self.intents = intents
+    """程序节点：包含多个意图声明，以及脚本开头的导入声明"""
+    __slots__ = ('intents', 'imports')
+    
+    def __init__(self, intents: List['IntentDecl'], imports: List['ImportDecl'] = ()):
+        self._init_fields(tuple(intents), tuple(imports))
     
     def __repr__(self):
+        if self.imports:
+            return f"Program({len(self.intents)} intents, {len(self.imports)} imports)"
         return f"Program({len(self.intents)} intents)"
 
 
+class ImportDecl(ASTNode):
+    """导入声明节点：路径相对于当前脚本所在目录"""
+    __slots__ = ('path',)
+    
+    def __init__(self, path: str):
+        self._init_fields(path)
+    
+    def __repr__(self):
+        return f"ImportDecl({self.path!r})"
+
+
 class IntentDecl(ASTNode):
-    """意图声明节点"""
-    def __init__(self, name: str, when_clause: 'WhenClause', actions: List['Action']):
-        self.name = name
-        self.when_clause = when_clause
-        self.actions = actions
+    """
+    意图声明节点
+    carry_over为从上一轮对话中继承的变量名，为None时（未声明）继承上一轮可见的全部变量
+    """
+    __slots__ = ('name', 'when_clause', 'actions', 'carry_over')
+    
+    def __init__(self, name: str, when_clause: 'WhenClause', actions: List['Action'],
+                 carry_over: Optional[List[str]] = None):
+        self._init_fields(name, when_clause, tuple(actions), None if carry_over is None else tuple(carry_over))
     
     def __repr__(self):
         return f"IntentDecl({self.name!r}, {len(self.actions)} actions)"
@@ -36,22 +103,27 @@ class IntentDecl(ASTNode):
 
 class WhenClause(ASTNode):
     """When子句节点"""
+    __slots__ = ('patterns',)
+    
     def __init__(self, patterns: List[str]):
-        self.patterns = patterns
+        self._init_fields(tuple(patterns))
     
     def __repr__(self):
-        return f"WhenClause({self.patterns})"
+        return f"WhenClause({list(self.patterns)})"
 
 
 class Action(ASTNode):
     """动作节点基类"""
-    pass
+    __slots__ = ()
 
 
 class AskAction(Action):
-    """Ask动作节点"""
+    """Ask动作节点，compiled为解析时编译好的消息模板"""
+    __slots__ = ('message', 'compiled')
+    _fields = ('message',)
+    
     def __init__(self, message: str):
-        self.message = message
+        self._init_fields(message, compile_template(message))
     
     def __repr__(self):
         return f"AskAction({self.message!r})"
@@ -59,17 +131,22 @@ class AskAction(Action):
 
 class WaitForAction(Action):
     """WaitFor动作节点"""
+    __slots__ = ('variable',)
+    
     def __init__(self, variable: str):
-        self.variable = variable
+        self._init_fields(variable)
     
     def __repr__(self):
         return f"WaitForAction({self.variable})"
 
 
 class ResponseAction(Action):
-    """Response动作节点"""
+    """Response动作节点，compiled为解析时编译好的模板"""
+    __slots__ = ('template', 'compiled')
+    _fields = ('template',)
+    
     def __init__(self, template: str):
-        self.template = template
+        self._init_fields(template, compile_template(template))
     
     def __repr__(self):
         return f"ResponseAction({self.template!r})"
@@ -77,9 +154,10 @@ class ResponseAction(Action):
 
 class SetAction(Action):
     """Set动作节点"""
+    __slots__ = ('variable', 'expression')
+    
     def __init__(self, variable: str, expression: 'Expression'):
-        self.variable = variable
-        self.expression = expression
+        self._init_fields(variable, expression)
     
     def __repr__(self):
         return f"SetAction({self.variable}, {self.expression})"
@@ -87,22 +165,26 @@ class SetAction(Action):
 
 class OptionsAction(Action):
     """Options动作节点"""
+    __slots__ = ('options',)
+    
     def __init__(self, options: List[str]):
-        self.options = options
+        self._init_fields(tuple(options))
     
     def __repr__(self):
-        return f"OptionsAction({self.options})"
+        return f"OptionsAction({list(self.options)})"
 
 
 class Expression(ASTNode):
     """表达式节点基类"""
-    pass
+    __slots__ = ()
 
 
 class StringLiteral(Expression):
     """字符串字面量"""
+    __slots__ = ('value',)
+    
     def __init__(self, value: str):
-        self.value = value
+        self._init_fields(value)
     
     def __repr__(self):
         return f"StringLiteral({self.value!r})"
@@ -110,8 +192,10 @@ class StringLiteral(Expression):
 
 class Variable(Expression):
     """变量引用"""
+    __slots__ = ('name',)
+    
     def __init__(self, name: str):
-        self.name = name
+        self._init_fields(name)
     
     def __repr__(self):
         return f"Variable({self.name})"
@@ -119,9 +203,10 @@ class Variable(Expression):
 
 class FunctionCall(Expression):
     """函数调用"""
+    __slots__ = ('name', 'args')
+    
     def __init__(self, name: str, args: List[Expression]):
-        self.name = name
-        self.args = args
+        self._init_fields(name, tuple(args))
     
     def __repr__(self):
         return f"FunctionCall({self.name}, {len(self.args)} args)"
@@ -130,11 +215,26 @@ class FunctionCall(Expression):
 class Parser:
     """语法分析器"""
     
-    def __init__(self, lexer: Lexer):
+    def __init__(self, lexer: Lexer, streaming: bool = False, compact: bool = False):
+        """
+        初始化语法分析器
+        :param lexer: 词法分析器
+        :param streaming: 为True时从词法分析器按需拉取Token（只保留少量前瞻缓冲），
+                          否则先生成完整的Token列表
+        :param compact: 为True时使用紧凑的TokenBuffer代替Token列表（非流式模式）
+        """
         self.lexer = lexer
-        self.tokens = lexer.tokenize()
+        self.streaming = streaming
         self.pos = 0
-        self.current_token = self.tokens[self.pos] if self.tokens else None
+        if streaming:
+            self.tokens = None
+            self._token_stream = lexer.iter_tokens()
+            self._lookahead = deque()
+            self.current_token = next(self._token_stream, None)
+        else:
+            self.tokens = lexer.tokenize_compact() if compact else lexer.tokenize()
+            self._count = len(self.tokens)
+            self.current_token = self.tokens[self.pos] if self._count else None
     
     def error(self, message: str):
         """抛出语法分析错误"""
@@ -149,11 +249,28 @@ class Parser:
     def advance(self):
         """移动到下一个Token"""
         self.pos += 1
-        if self.pos < len(self.tokens):
+        if self.streaming:
+            if self._lookahead:
+                self.current_token = self._lookahead.popleft()
+            else:
+                self.current_token = next(self._token_stream, None)
+        elif self.pos < self._count:
             self.current_token = self.tokens[self.pos]
         else:
             self.current_token = None
     
+    def peek_token(self, offset: int = 1) -> Optional[Token]:
+        """查看当前Token之后第offset个Token，不移动位置"""
+        if not self.streaming:
+            index = self.pos + offset
+            return self.tokens[index] if index < self._count else None
+        while len(self._lookahead) < offset:
+            token = next(self._token_stream, None)
+            if token is None:
+                return None
+            self._lookahead.append(token)
+        return self._lookahead[offset - 1]
+    
     def expect(self, token_type: TokenType):
         """期望当前Token是指定类型，否则报错"""
         if not self.current_token or self.current_token.type != token_type:
@@ -172,10 +289,15 @@ class Parser:
     def parse(self) -> Program:
         """解析程序"""
         intents = []
+        imports = []
         self.skip_newlines()
         
         while self.current_token and self.current_token.type != TokenType.EOF:
-            if self.current_token.type == TokenType.INTENT:
+            if self.current_token.type == TokenType.IMPORT:
+                if intents:
+                    self.error("import must appear before any intent")
+                imports.append(self.parse_import())
+            elif self.current_token.type == TokenType.INTENT:
                 intent = self.parse_intent()
                 intents.append(intent)
             else:
@@ -189,7 +311,13 @@ class Parser:
                 self.error(f"Unexpected token: {self.current_token.type}")
             self.skip_newlines()
         
-        return Program(intents)
+        return Program(intents, imports)
+    
+    def parse_import(self) -> ImportDecl:
+        """解析导入声明"""
+        self.expect(TokenType.IMPORT)
+        path = self.expect(TokenType.STRING)
+        return ImportDecl(path)
     
     def parse_intent(self) -> IntentDecl:
         """解析意图声明"""
@@ -198,6 +326,11 @@ class Parser:
         self.expect(TokenType.LBRACE)
         self.skip_newlines()
         
+        carry_over = None
+        if self.current_token and self.current_token.type == TokenType.CARRY_OVER:
+            carry_over = self.parse_carry_over()
+            self.skip_newlines()
+        
         when_clause = self.parse_when_clause()
         self.skip_newlines()
         
@@ -214,7 +347,18 @@ class Parser:
         
         # 跳过intent的RBRACE
         self.expect(TokenType.RBRACE)
-        return IntentDecl(name, when_clause, actions)
+        return IntentDecl(name, when_clause, actions, carry_over)
+    
+    def parse_carry_over(self) -> List[str]:
+        """解析继承变量声明：carry_over 后跟以逗号分隔的变量名，可以为空（不继承任何变量）"""
+        self.expect(TokenType.CARRY_OVER)
+        names = []
+        if self.current_token and self.current_token.type == TokenType.IDENTIFIER:
+            names.append(self.expect(TokenType.IDENTIFIER))
+            while self.current_token and self.current_token.type == TokenType.COMMA:
+                self.advance()
+                names.append(self.expect(TokenType.IDENTIFIER))
+        return names
     
     def parse_when_clause(self) -> WhenClause:
         """解析When子句"""
@@ -315,3 +459,173 @@ class Parser:
         else:
             self.error(f"Unexpected expression token: {self.current_token.type}")
 
+
+
+class IncrementalParser:
+    """
+    意图粒度的增量语法分析器
+    记录上一次每个顶层 intent 块在源代码中的范围。源代码发生局部编辑时（公共前缀/后缀之外的部分），
+    从编辑位置之前最近的块边界开始重新切分，直到某个块的结尾与旧的块边界（平移编辑长度后）重合，
+    之后的块原样复用。只有被编辑的块重新进行词法分析和语法分析；
+    复用的块保持同一个IntentDecl对象，挂在它上面的派生结果也随之复用
+    """
+    
+    # 只识别字符串、注释、大括号和intent关键字，用于确定顶层块的范围
+    BLOCK_PATTERN = re.compile(
+        r'"[^"\\]*(?:\\.[^"\\]*)*"|\#[^\n]*|[{}]|(?<!\w)intent(?!\w)', re.DOTALL
+    )
+    # 块之间只允许出现空白和注释
+    GAP_PATTERN = re.compile(r'(?:\s|\#[^\n]*)*')
+    
+    def __init__(self):
+        self.text: Optional[str] = None
+        self.starts: List[int] = []  # 每个意图块的起始偏移
+        self.ends: List[int] = []  # 每个意图块的结束偏移（不含）
+        self.intents: List[IntentDecl] = []
+        self.imports: Tuple['ImportDecl', ...] = ()
+        self.prelude: Optional[str] = None  # 第一个意图之前的文本（导入声明和注释）
+        self.last_reparsed = 0  # 上一次parse重新解析的意图块数量
+        self.last_reused = 0  # 上一次parse复用的意图块数量
+    
+    def parse(self, text: str) -> Program:
+        """
+        解析源代码，复用未修改的意图块
+        无法可靠切分或被编辑的块解析出错时，退回完整解析（由完整解析报告准确的错误位置）
+        """
+        try:
+            if self.text is None:
+                return self._parse_all(text, {})
+            return self._parse_edit(text)
+        except SyntaxError:
+            return self._parse_full(text)
+    
+    def seed(self, text: str, program: Program):
+        """用已有的解析结果（例如编译缓存）建立块范围，之后的修改只需重新解析改动的块"""
+        try:
+            spans = list(self._scan_blocks(text, 0, prelude=True))
+        except SyntaxError:
+            spans = None
+        if spans is None or len(spans) != len(program.intents):
+            self.text = None
+            return
+        self._set_state(text, spans, list(program.intents), program.imports)
+        self.last_reparsed = 0
+        self.last_reused = len(program.intents)
+    
+    def _scan_blocks(self, text: str, pos: int, prelude: bool = False):
+        """
+        从pos（必须处于顶层、不在字符串中）开始切分意图块，逐个产生 (起始偏移, 结束偏移)
+        :param prelude: pos为文件开头时为True，第一个块之前允许出现导入声明
+        :raises SyntaxError: 括号不匹配、块之间出现其他内容等无法可靠切分的情况
+        """
+        depth = 0
+        start = None
+        gap_start = pos
+        check_gap = not prelude
+        for match in self.BLOCK_PATTERN.finditer(text, pos):
+            value = match.group()
+            if value == '{':
+                depth += 1
+            elif value == '}':
+                depth -= 1
+                if depth < 0 or start is None:
+                    raise SyntaxError("Unbalanced braces")
+                if depth == 0:
+                    yield start, match.end()
+                    start = None
+                    gap_start = match.end()
+                    check_gap = True
+            elif value == 'intent' and depth == 0:
+                if start is not None:
+                    raise SyntaxError("Unexpected intent")
+                if check_gap and not self.GAP_PATTERN.fullmatch(text, gap_start, match.start()):
+                    raise SyntaxError("Unexpected content between intents")
+                start = match.start()
+        if depth or start is not None:
+            raise SyntaxError("Unterminated intent")
+        if check_gap and not self.GAP_PATTERN.fullmatch(text, gap_start):
+            raise SyntaxError("Unexpected content after intents")
+    
+    def _parse_all(self, text: str, reusable: Dict[str, IntentDecl]) -> Program:
+        """切分整个源代码，reusable中文本相同的块直接复用"""
+        spans = list(self._scan_blocks(text, 0, prelude=True))
+        prelude = text[:spans[0][0]] if spans else text
+        if prelude != self.prelude:
+            program = Parser(Lexer(prelude, engine='regex'), compact=True).parse()
+            if program.intents:
+                raise SyntaxError("Unexpected intent in prelude")
+            self.prelude = prelude
+            self.imports = program.imports
+        intents = self._parse_spans(text, spans, reusable)
+        self._set_state(text, spans, intents, self.imports)
+        return Program(intents, self.imports)
+    
+    def _parse_edit(self, text: str) -> Program:
+        """根据与上一次源代码的差异，只重新切分和解析受影响的块"""
+        offset, removed, inserted = compute_edit(self.text, text)
+        delta = len(inserted) - removed
+        count = len(self.intents)
+        # 第一个结束位置在编辑位置之后的块
+        first = bisect.bisect_right(self.ends, offset)
+        if first == 0 and (count == 0 or offset < self.starts[0]):
+            # 编辑发生在导入声明区域
+            return self._parse_all(text, self._block_texts(0, count))
+        scan_start = self.ends[first - 1] if first > 0 else self.starts[0]
+        
+        edit_end = offset + len(inserted)
+        spans = []
+        resync = count
+        for start, end in self._scan_blocks(text, scan_start):
+            spans.append((start, end))
+            if end >= edit_end:
+                # 块结尾与旧的块边界重合：之后的源代码未变化，块切分也与上一次相同
+                old = bisect.bisect_left(self.ends, end - delta)
+                if first <= old < count and self.ends[old] == end - delta:
+                    resync = old + 1
+                    break
+        
+        middle = self._parse_spans(text, spans, self._block_texts(first, resync))
+        intents = self.intents[:first] + middle + self.intents[resync:]
+        spans = (list(zip(self.starts[:first], self.ends[:first])) + spans +
+                 [(start + delta, end + delta) for start, end in zip(self.starts[resync:], self.ends[resync:])])
+        self._set_state(text, spans, intents, self.imports)
+        self.last_reused = len(intents) - self.last_reparsed
+        return Program(intents, self.imports)
+    
+    def _block_texts(self, first: int, last: int) -> Dict[str, IntentDecl]:
+        """上一次第first到last（不含）个块的 源代码 -> 意图，用于复用编辑区域中未变化的块"""
+        return {self.text[self.starts[i]:self.ends[i]]: self.intents[i] for i in range(first, last)}
+    
+    def _parse_spans(self, text: str, spans: List[Tuple[int, int]],
+                     reusable: Dict[str, IntentDecl]) -> List[IntentDecl]:
+        intents = []
+        reparsed = 0
+        for start, end in spans:
+            block = text[start:end]
+            intent = reusable.get(block)
+            if intent is None:
+                program = Parser(Lexer(block, engine='regex'), compact=True).parse()
+                if len(program.intents) != 1 or program.imports:
+                    raise SyntaxError("Intent block did not parse to a single intent")
+                intent = program.intents[0]
+                reparsed += 1
+            intents.append(intent)
+        self.last_reparsed = reparsed
+        self.last_reused = len(spans) - reparsed
+        return intents
+    
+    def _set_state(self, text: str, spans: List[Tuple[int, int]], intents: List[IntentDecl], imports):
+        self.text = text
+        self.starts = [start for start, _ in spans]
+        self.ends = [end for _, end in spans]
+        self.intents = intents
+        self.imports = imports
+    
+    def _parse_full(self, text: str) -> Program:
+        """完整解析，并用结果重建块范围"""
+        program = Parser(Lexer(text, engine='regex'), compact=True).parse()
+        self.seed(text, program)
+        self.prelude = None
+        self.last_reparsed = len(program.intents)
+        self.last_reused = 0
+        return program
@@ -0,0 +1,104 @@
+"""
+热重载（Hot Reload）
+作用：在后台线程中监视脚本文件（包括导入的脚本），发生变化时重新编译，并通过回调交付新的Program
+在全项目中的作用：修改脚本后无需重启CLI或重建解释器；重新编译在后台完成，
+                  新程序由Interpreter.swap_program在执行意图的两步之间换入，对话状态不受影响
+"""
+
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+from src.parser import Program
+from src.loader import find_scripts, merge_programs
+from src.modules import ModuleCache
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Reloader")
+
+
+class ScriptReloader:
+    """
+    脚本热重载器
+    通过轮询文件的修改时间检测变化（不依赖第三方文件监视库），
+    重新编译交给ModuleCache，只有内容发生变化的脚本会被重新解析
+    """
+    
+    def __init__(self, source: Union[str, Path], on_reload: Callable[[Program], None],
+                 interval: float = 1.0, on_error: Optional[Callable[[Exception], None]] = None,
+                 module_cache: Optional[ModuleCache] = None):
+        """
+        :param source: 脚本文件或脚本目录
+        :param on_reload: 编译出新版本程序时调用（在监视线程中调用）
+        :param interval: 轮询间隔（秒）
+        :param on_error: 新版本编译失败时调用，此时继续使用旧版本
+        :param module_cache: 模块缓存，不提供时新建
+        """
+        self.source = source
+        self.on_reload = on_reload
+        self.on_error = on_error
+        self.interval = interval
+        self.module_cache = module_cache or ModuleCache()
+        self._snapshot: Optional[Tuple[Program, ...]] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def build(self) -> Program:
+        """编译当前版本的程序（同时记录版本快照，供check判断是否变化）"""
+        paths = find_scripts(self.source)
+        linked = [(path, self.module_cache.load(path)) for path in paths]
+        self._snapshot = tuple(program for _, program in linked)
+        if len(linked) == 1:
+            return linked[0][1]
+        # 被目录中其他脚本导入的脚本已经合并在导入方中
+        imported = {path for path, importers in self.module_cache.importers.items() if importers}
+        return merge_programs([(path, program) for path, program in linked
+                               if self.module_cache.normalize(path) not in imported]).program
+    
+    def check(self) -> bool:
+        """
+        检查一次脚本是否变化，变化时重新编译并调用on_reload
+        :return: 是否交付了新版本
+        """
+        previous = self._snapshot
+        try:
+            program = self.build()
+        except (SyntaxError, OSError) as e:
+            logger.error(f"脚本重新编译失败，继续使用旧版本: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return False
+        # ModuleCache对未变化的脚本返回同一个Program对象
+        if previous is not None and len(previous) == len(self._snapshot) and \
+                all(old is new for old, new in zip(previous, self._snapshot)):
+            return False
+        logger.info(f"检测到脚本变化，已重新编译: {self.source}")
+        self.on_reload(program)
+        return True
+    
+    def start(self) -> Program:
+        """
+        编译初始版本并启动监视线程
+        :return: 初始版本的程序
+        """
+        program = self.build()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ScriptReloader", daemon=True)
+        self._thread.start()
+        logger.info(f"开始监视脚本: {self.source}，轮询间隔 {self.interval}s")
+        return program
+    
+    def stop(self):
+        """停止监视线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # 监视线程不能因为回调异常而退出
+                logger.error(f"热重载失败: {e}", exc_info=True)
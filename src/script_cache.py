@@ -0,0 +1,141 @@
+"""
+编译缓存（Script Cache）
+作用：将解析得到的Program保存为紧凑的带版本二进制文件（.dslc），以源代码内容和编译器版本的哈希作为键
+在全项目中的作用：CLI和GUI启动时若缓存有效则直接加载AST，无需再次进行词法分析和语法分析；
+                  源代码或编译器版本变化后缓存自动失效并重新生成
+"""
+
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from src.lexer import Lexer
+from src.parser import (
+    Parser, Program, ImportDecl, IntentDecl, WhenClause, AskAction, WaitForAction,
+    ResponseAction, SetAction, OptionsAction, StringLiteral, Variable, FunctionCall
+)
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Cache")
+
+# 编译器版本：语法、AST结构或序列化方式变化时递增，使旧缓存失效
+COMPILER_VERSION = "3"
+
+# 文件格式：魔数 + 格式版本 + 内容哈希（32字节）+ marshal编码的节点树
+MAGIC = b"DSLC"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 1 + 32
+
+CACHE_DIR_NAME = "__dslcache__"
+
+# 节点类型编号，节点编码为 (编号, 字段...)，列表字段编码为元组
+NODE_TYPES = (
+    Program, IntentDecl, WhenClause, AskAction, WaitForAction,
+    ResponseAction, SetAction, OptionsAction, StringLiteral, Variable, FunctionCall,
+    ImportDecl,
+)
+NODE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+
+
+def source_digest(source: str) -> bytes:
+    """源代码与编译器版本共同决定的缓存键"""
+    key = f"{COMPILER_VERSION}|{FORMAT_VERSION}|{marshal.version}|".encode("utf-8")
+    return hashlib.sha256(key + source.encode("utf-8")).digest()
+
+
+def cache_path_for(script_path: str) -> Path:
+    """脚本对应的缓存文件路径：同目录下的 __dslcache__/<脚本名>.dslc"""
+    path = Path(script_path)
+    return path.parent / CACHE_DIR_NAME / (path.stem + ".dslc")
+
+
+def _encode(node):
+    """将AST节点编码为嵌套元组"""
+    if isinstance(node, tuple):
+        return tuple(_encode(item) for item in node)
+    if type(node) in NODE_CODES:
+        return (NODE_CODES[type(node)],) + tuple(_encode(value) for value in node._field_values())
+    return node
+
+
+def _decode(data):
+    """将嵌套元组还原为AST节点"""
+    fields = []
+    for value in data[1:]:
+        # 节点编码以类型编号开头，节点列表的元素是元组，字符串列表原样保留
+        if isinstance(value, tuple) and value:
+            if isinstance(value[0], int):
+                value = _decode(value)
+            elif isinstance(value[0], tuple):
+                value = tuple(_decode(item) for item in value)
+        fields.append(value)
+    return NODE_TYPES[data[0]](*fields)
+
+
+def serialize_program(program: Program, digest: bytes) -> bytes:
+    """将Program序列化为.dslc二进制内容"""
+    return MAGIC + bytes([FORMAT_VERSION]) + digest + marshal.dumps(_encode(program))
+
+
+def deserialize_program(data: bytes, digest: bytes) -> Optional[Program]:
+    """
+    从.dslc二进制内容还原Program
+    :return: Program，若格式版本或内容哈希不匹配（缓存失效）则返回None
+    """
+    if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC or data[len(MAGIC)] != FORMAT_VERSION:
+        return None
+    if data[len(MAGIC) + 1:HEADER_SIZE] != digest:
+        return None
+    try:
+        return _decode(marshal.loads(data[HEADER_SIZE:]))
+    except (ValueError, EOFError, TypeError, IndexError) as e:
+        logger.warning(f"编译缓存损坏，重新编译: {e}")
+        return None
+
+
+def compile_source(source: str) -> Program:
+    """对源代码进行词法分析和语法分析"""
+    return Parser(Lexer(source, engine='regex'), compact=True).parse()
+
+
+def load_program(script_path: str, source: Optional[str] = None, use_cache: bool = True,
+                 compiler: Optional[Callable[[str], Program]] = None) -> Tuple[Program, bool]:
+    """
+    加载脚本对应的Program，缓存有效时直接读取缓存，否则编译并写入缓存
+    :param script_path: 脚本文件路径
+    :param source: 已读取的源代码，不提供时从script_path读取
+    :param use_cache: 为False时总是重新编译且不写缓存
+    :param compiler: 缓存无效时使用的编译函数，默认为compile_source（例如可传入IncrementalParser.parse）
+    :return: (Program, 是否来自缓存)
+    :raises SyntaxError: 源代码存在词法或语法错误
+    """
+    if source is None:
+        with open(script_path, 'r', encoding='utf-8') as f:
+            source = f.read()
+    compiler = compiler or compile_source
+    if not use_cache:
+        return compiler(source), False
+    
+    digest = source_digest(source)
+    cache_path = cache_path_for(script_path)
+    try:
+        program = deserialize_program(cache_path.read_bytes(), digest)
+    except OSError:
+        program = None
+    if program is not None:
+        logger.info(f"使用编译缓存: {cache_path}")
+        return program, True
+    
+    program = compiler(source)
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        # 先写临时文件再替换，避免并发加载读到写了一半的缓存
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(serialize_program(program, digest))
+        os.replace(temp_path, cache_path)
+        logger.info(f"已写入编译缓存: {cache_path}")
+    except OSError as e:
+        logger.warning(f"无法写入编译缓存 {cache_path}: {e}")
+    return program, False
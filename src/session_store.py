@@ -0,0 +1,166 @@
+"""
+会话存储（Session Store）
+作用：按会话ID保存会话快照（Session.dump()生成的二进制数据），提供内存和本地SQLite两种后端
+在全项目中的作用：SessionManager在会话状态变化后写入快照，会话被淘汰、进程重启或转移到其他工作进程后从存储恢复；
+                  SQLite后端使用WAL模式，多个会话的写入先合并在内存中，再在一个事务中批量提交（组提交）
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_SessionStore")
+
+
+class SessionStore:
+    """会话存储接口：保存、读取和删除会话快照"""
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        """读取会话快照，不存在时返回None"""
+        raise NotImplementedError
+
+    def save(self, session_id: str, data: bytes):
+        """保存会话快照（覆盖旧快照）"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """删除会话快照"""
+        raise NotImplementedError
+
+    def flush(self):
+        """把尚未提交的写入提交到存储"""
+
+    def close(self):
+        """提交尚未提交的写入并释放资源"""
+        self.flush()
+
+
+class MemorySessionStore(SessionStore):
+    """内存存储：快照保存在字典中（单进程内使用，例如测试，或会话只需要在淘汰后恢复）"""
+
+    def __init__(self):
+        self.snapshots: Dict[str, bytes] = {}
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        return self.snapshots.get(session_id)
+
+    def save(self, session_id: str, data: bytes):
+        self.snapshots[session_id] = data
+
+    def delete(self, session_id: str):
+        self.snapshots.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    本地SQLite存储（WAL模式，多个进程可以同时读取）
+    写入先放入待提交表（同一会话的多次写入只保留最后一次），待提交的写入达到batch_size条，
+    或后台线程每隔flush_interval秒，在一个事务中一起提交；读取时先查待提交表
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 256, flush_interval: Optional[float] = 0.05):
+        """
+        :param path: 数据库文件路径
+        :param batch_size: 待提交的写入达到该数量时立即提交
+        :param flush_interval: 后台提交的间隔（秒）；None表示不启动后台线程，只在达到batch_size、flush()或close()时提交
+        """
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # 自动提交模式，事务由flush显式开始；连接在多个线程中使用，由_db_lock串行化
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL模式下NORMAL只在检查点时同步磁盘，进程崩溃不会丢失已提交的事务
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # 会话ID -> 快照（None表示删除）：尚未提交的写入，以及正在提交的一批写入
+        self._pending: Dict[str, Optional[bytes]] = {}
+        self._flushing: Dict[str, Optional[bytes]] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval is not None:
+            self._thread = threading.Thread(target=self._run, name="SessionStoreFlusher", daemon=True)
+            self._thread.start()
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            for batch in (self._pending, self._flushing):
+                if session_id in batch:
+                    return batch[session_id]
+        with self._db_lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id: str, data: bytes):
+        self._write(session_id, data)
+
+    def delete(self, session_id: str):
+        self._write(session_id, None)
+
+    def _write(self, session_id: str, data: Optional[bytes]):
+        with self._lock:
+            self._pending[session_id] = data
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """在一个事务中提交所有待提交的写入"""
+        with self._db_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = self._flushing = self._pending
+                self._pending = {}
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (session_id, data) VALUES (?, ?)",
+                    [(session_id, data) for session_id, data in batch.items() if data is not None])
+                self._conn.executemany(
+                    "DELETE FROM sessions WHERE session_id = ?",
+                    [(session_id,) for session_id, data in batch.items() if data is None])
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                # 提交失败时放回待提交表（之后的写入优先），下次提交时重试
+                with self._lock:
+                    self._pending = {**batch, **self._pending}
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+        logger.debug(f"提交了 {len(batch)} 个会话快照")
+
+    def close(self):
+        """停止后台提交线程，提交剩余的写入并关闭数据库连接"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # 后台线程不能因为一次提交失败而退出
+                logger.error(f"提交会话快照失败: {e}", exc_info=True)
@@ -0,0 +1,446 @@
+"""
+多会话管理（SessionManager）
+作用：多个用户的对话共享同一个解释器（同一份编译好的程序、函数表和编译后的意图），
+      每个会话只保存自己的对话状态（对话历史、上一次的意图和上下文、执行到一半的意图）
+在全项目中的作用：服务多个用户时不需要为每个用户创建解释器；执行意图时把会话状态换入解释器，
+                  执行结束或在wait_for处暂停时换出。空闲会话只占用几个引用，
+                  按最近使用顺序（LRU）、空闲时间和内存上限淘汰；
+                  配置了会话存储（src/session_store.py）时，会话状态以紧凑快照保存，被淘汰或进程重启后按需恢复
+"""
+
+import marshal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generator, Iterator, Mapping, Optional, Tuple, Union
+
+from src.parser import IntentDecl, Program, WaitForAction
+from src.interpreter import Interpreter, InputRequest
+from src.variables import Variables, UNSET
+from src.history import BotTurn, ConversationHistory
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Sessions")
+
+# 估算会话占用内存时的固定开销（字节）：会话对象本身，以及暂停的执行（生成器及其栈帧）
+SESSION_OVERHEAD = 200
+EXECUTION_OVERHEAD = 1000
+
+# 会话快照格式的版本：格式变化时递增，旧快照被忽略
+SNAPSHOT_VERSION = 2
+# 快照中保留的对话历史条数（意图识别只使用最近几轮，更早的消息归并进摘要）
+SNAPSHOT_HISTORY = 20
+# marshal可以直接保存的变量值类型，其他类型的值保存为字符串
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def _plain(mapping: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    if not mapping:
+        return {}
+    return {name: value if type(value) in _PLAIN_TYPES else str(value) for name, value in mapping.items()}
+
+
+class Session:
+    """
+    一个会话的对话状态（与Interpreter上同名的属性对应）
+    execution为在wait_for处暂停的执行（Interpreter.run_intent返回的生成器），
+    scope为暂停时变量表的快照，恢复执行前换回解释器；request为暂停处的输入请求，current_result为暂停前已产生的部分结果
+    """
+    __slots__ = ('session_id', 'conversation_history', 'last_intent', 'last_context', 'current_intent',
+                 'current_result', 'execution', 'request', 'scope', 'resume_point',
+                 'output_callback', 'last_active', 'size')
+
+    def __init__(self, session_id: str, output_callback: Optional[Callable[[str], None]] = None,
+                 history: Optional[ConversationHistory] = None):
+        """
+        :param session_id: 会话ID
+        :param output_callback: 本会话的输出回调（ask、response、options），不提供时使用解释器的输出回调
+        :param history: 空的对话历史（决定容量和字符预算），不提供时使用默认容量
+        """
+        self.session_id = session_id
+        self.conversation_history = history if history is not None else ConversationHistory()
+        self.last_intent: Optional[str] = None
+        self.last_context: Mapping[str, Any] = {}
+        self.current_intent: Optional[IntentDecl] = None
+        self.current_result: Optional[Dict[str, Any]] = None
+        self.execution: Optional[Generator[InputRequest, str, Dict[str, Any]]] = None
+        self.request: Optional[InputRequest] = None
+        self.scope: Optional[Mapping[str, Any]] = None
+        # 从快照恢复、尚未重建执行的暂停位置：(意图名称, wait_for位置, 部分结果)
+        self.resume_point: Optional[Tuple[str, int, Dict[str, Any]]] = None
+        self.output_callback = output_callback
+        self.last_active = 0.0
+        self.size = SESSION_OVERHEAD
+
+    @property
+    def waiting_for_input(self) -> bool:
+        """是否有意图在wait_for处等待输入"""
+        return self.execution is not None or self.resume_point is not None
+
+    def estimate_size(self) -> int:
+        """估算会话占用的内存（字节）：对话历史中的文本和上下文中的变量值，共享的程序不计入"""
+        size = SESSION_OVERHEAD
+        for message in self.conversation_history:
+            if isinstance(message, BotTurn):
+                # 模板由所有会话共享，只计入片段
+                size += sys.getsizeof(message) + sys.getsizeof(message.fragments)
+                size += sum(sys.getsizeof(fragment) for fragment in message.fragments)
+            else:
+                size += sys.getsizeof(message) + sys.getsizeof(message.get("content", ""))
+        for context in (self.last_context, self.scope):
+            if isinstance(context, Variables):
+                size += sys.getsizeof(context.values)
+                size += sum(sys.getsizeof(value) for value in context.values if value is not UNSET)
+            elif context:
+                size += sum(sys.getsizeof(value) for value in context.values())
+        if self.execution is not None:
+            size += EXECUTION_OVERHEAD
+        return size
+
+    def dump(self, history_limit: int = SNAPSHOT_HISTORY) -> bytes:
+        """
+        把会话状态保存为紧凑的二进制快照（marshal）：上下文变量、上一次的意图、最近的对话历史，
+        以及暂停的执行的位置（意图名称和wait_for位置）、暂停时的变量和部分结果
+        :param history_limit: 保留的对话历史条数，更早的消息归并进摘要
+        """
+        suspended = None
+        if self.execution is not None and self.request is not None:
+            result = self.current_result or {}
+            suspended = (self.current_intent.name, self.request.position, _plain(self.scope),
+                         result.get('response'), _plain(result.get('variables')))
+        elif self.resume_point is not None:
+            name, position, result = self.resume_point
+            suspended = (name, position, _plain(self.scope), result['response'], _plain(result['variables']))
+        history = self.conversation_history.dump(history_limit)
+        return marshal.dumps((SNAPSHOT_VERSION, self.last_intent, _plain(self.last_context), history, suspended))
+
+    @classmethod
+    def load(cls, session_id: str, data: bytes, history: Optional[ConversationHistory] = None) -> 'Session':
+        """
+        从dump()的快照恢复会话；暂停的执行只恢复位置（resume_point），由SessionManager重建
+        :param history: 空的对话历史（决定容量和字符预算），不提供时使用默认容量
+        :raises ValueError: 快照格式不正确或版本不同
+        """
+        try:
+            version, last_intent, context, messages, suspended = marshal.loads(data)
+        except (EOFError, TypeError, ValueError) as e:
+            raise ValueError(f"无效的会话快照: {e}")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"会话快照版本不同: {version}")
+        session = cls(session_id, history=history)
+        session.last_intent = last_intent
+        session.last_context = context
+        session.conversation_history.restore(messages)
+        if suspended is not None:
+            name, position, scope, response, assigned = suspended
+            session.scope = scope
+            session.resume_point = (name, position, {'response': response, 'variables': assigned})
+        return session
+
+    def __repr__(self):
+        return f"Session({self.session_id!r}, last_intent={self.last_intent!r})"
+
+
+class SessionManager:
+    """
+    会话管理器：所有会话共享一个解释器，按会话ID保存各自的对话状态
+    同一时刻只有一个会话的状态换入解释器执行意图（执行意图是纯CPU操作，很快）；
+    意图识别（LLM调用）使用各会话自己的状态，不占用解释器，可以在多个线程中同时进行
+    """
+
+    def __init__(self, interpreter: Interpreter, max_sessions: Optional[int] = 100_000,
+                 idle_timeout: Optional[float] = None, max_bytes: Optional[int] = None,
+                 on_evict: Optional[Callable[[Session], None]] = None,
+                 clock: Callable[[], float] = time.monotonic, store=None):
+        """
+        :param interpreter: 已加载程序的解释器（所有会话共享）
+        :param max_sessions: 最多保留的会话数，超过时淘汰最久未使用的会话；None表示不限制
+        :param idle_timeout: 空闲超时（秒），超过时淘汰；None表示不按空闲时间淘汰
+        :param max_bytes: 所有会话估算内存的上限（字节），超过时淘汰最久未使用的会话；None表示不限制
+        :param on_evict: 会话被淘汰时调用（例如把会话状态写入外部存储）
+        :param clock: 计时函数（测试时可替换）
+        :param store: 会话存储（src.session_store.SessionStore），会话状态变化后保存快照，
+                      不在内存中的会话从存储恢复；None表示会话只保存在内存中
+        """
+        self.interpreter = interpreter
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.clock = clock
+        self.store = store
+        # 会话ID -> 会话，按最近使用的顺序排列（最久未使用的在最前面）
+        self.sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self.total_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.sessions))
+
+    def get(self, session_id: str, output_callback: Optional[Callable[[str], None]] = None) -> Session:
+        """
+        取得会话（不在内存中时从会话存储恢复，存储中也没有时创建），并标记为最近使用
+        :param output_callback: 创建或恢复会话时使用的输出回调
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self._restore(session_id) or \
+                    Session(session_id, history=self.interpreter.conversation_history.empty())
+                session.output_callback = output_callback
+                session.size = session.estimate_size()
+                self.sessions[session_id] = session
+                self.total_size += session.size
+                logger.debug(f"创建会话: {session_id}，会话数量: {len(self.sessions)}")
+            else:
+                self.sessions.move_to_end(session_id)
+            session.last_active = self.clock()
+            self.evict()
+            return session
+
+    def _restore(self, session_id: str) -> Optional[Session]:
+        """从会话存储恢复会话，没有快照或快照无效时返回None"""
+        if self.store is None:
+            return None
+        data = self.store.load(session_id)
+        if data is None:
+            return None
+        try:
+            session = Session.load(session_id, data, self.interpreter.conversation_history.empty())
+        except ValueError as e:
+            logger.warning(f"会话 {session_id} 的快照无法恢复，创建新会话: {e}")
+            return None
+        if session.resume_point is not None:
+            self._resume(session)
+        logger.debug(f"从会话存储恢复会话: {session_id}")
+        return session
+
+    def _resume(self, session: Session):
+        """为从快照恢复的会话重建暂停的执行（Interpreter.resume_intent），程序中已没有该wait_for时放弃"""
+        name, position, result = session.resume_point
+        session.resume_point = None
+        intent = next((intent for intent in getattr(self.interpreter, 'intents', None) or ()
+                       if intent.name == name), None)
+        if intent is None or position >= len(intent.actions) or \
+                not isinstance(intent.actions[position], WaitForAction):
+            logger.warning(f"会话 {session.session_id} 暂停的意图 {name} 已不存在，放弃暂停的执行")
+            session.scope = None
+            return
+        session.current_intent = intent
+        session.current_result = result
+        session.execution = self.interpreter.resume_intent(intent, position, result)
+        # 生成器第一次执行只产生输入请求，不修改解释器的状态
+        session.request = next(session.execution)
+
+    def close(self, session_id: str) -> Optional[Session]:
+        """结束会话并返回其状态（不调用on_evict），同时删除会话存储中的快照，会话不存在时返回None"""
+        with self._lock:
+            if self.store is not None:
+                self.store.delete(session_id)
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self.total_size -= session.size
+                if session.execution is not None:
+                    session.execution.close()
+                    session.execution = None
+            return session
+
+    def evict(self) -> int:
+        """
+        淘汰空闲超时的会话，再按最近使用顺序淘汰会话直到会话数和估算内存都不超过上限
+        最近使用的一个会话不会被淘汰
+        :return: 淘汰的会话数
+        """
+        evicted = 0
+        with self._lock:
+            sessions = self.sessions
+            if self.idle_timeout is not None:
+                deadline = self.clock() - self.idle_timeout
+                while len(sessions) > 1 and next(iter(sessions.values())).last_active < deadline:
+                    self._evict_oldest()
+                    evicted += 1
+            while len(sessions) > 1 and (
+                    (self.max_sessions is not None and len(sessions) > self.max_sessions) or
+                    (self.max_bytes is not None and self.total_size > self.max_bytes)):
+                self._evict_oldest()
+                evicted += 1
+        if evicted:
+            logger.debug(f"淘汰了 {evicted} 个会话，会话数量: {len(self.sessions)}")
+        return evicted
+
+    def _evict_oldest(self):
+        _, session = self.sessions.popitem(last=False)
+        self.total_size -= session.size
+        if self.on_evict:
+            self.on_evict(session)
+        if session.execution is not None:
+            session.execution.close()
+            session.execution = None
+
+    def match_intent(self, session_id: str, user_input: str) -> Optional[IntentDecl]:
+        """
+        为会话匹配用户输入的意图（记录到该会话的对话历史），与Interpreter.match_intent相同
+        :raises RuntimeError: 如果LLM客户端未配置或识别失败
+        """
+        session = self._record_input(session_id, user_input)
+        if session is None:
+            return None
+        return self.interpreter.identify_intent(user_input, session.conversation_history,
+                                                session.last_intent, session.last_context)
+
+    def _record_input(self, session_id: str, user_input: str) -> Optional[Session]:
+        """
+        把用户输入记录到会话的对话历史（计入会话大小并保存到存储），没有加载程序时返回None
+        持有锁：异步接口在工作线程中调用，不能与其他线程的执行、淘汰和保存交错
+        """
+        with self._lock:
+            session = self.get(session_id)
+            if not getattr(self.interpreter, 'intents', None):
+                logger.warning("意图列表未设置")
+                return None
+            session.conversation_history.append({"role": "user", "content": user_input})
+            self._resize(session)
+            self._save(session)
+            return session
+
+    def execute_intent(self, session_id: str, intent: IntentDecl) -> Union[InputRequest, Dict[str, Any]]:
+        """
+        在会话中执行意图：执行到wait_for时暂停并返回InputRequest（之后用send_input继续），
+        执行结束时返回执行结果；会话中暂停的意图被放弃
+        """
+        with self._lock:
+            session = self.get(session_id)
+            if session.execution is not None:
+                session.execution.close()
+                session.execution = None
+            return self._advance(session, intent, None)
+
+    def send_input(self, session_id: str, value: str) -> Union[InputRequest, Dict[str, Any]]:
+        """
+        把用户输入交给会话中在wait_for处暂停的意图并继续执行
+        :return: 下一个InputRequest，或执行结束时的执行结果
+        :raises RuntimeError: 会话中没有等待输入的意图
+        """
+        with self._lock:
+            session = self.get(session_id)
+            if session.execution is None:
+                raise RuntimeError(f"会话 {session_id} 没有等待输入的意图")
+            return self._advance(session, None, value)
+
+    def handle(self, session_id: str, user_input: str) -> Union[InputRequest, Dict[str, Any], None]:
+        """
+        处理会话中的一条用户消息：有意图在等待输入时作为输入继续执行，否则识别意图并执行
+        :return: InputRequest、执行结果，或未识别到意图时返回None
+        """
+        session = self.get(session_id)
+        if session.execution is not None:
+            return self.send_input(session_id, user_input)
+        intent = self.match_intent(session_id, user_input)
+        if intent is None:
+            return None
+        return self.execute_intent(session_id, intent)
+
+    async def match_intent_async(self, session_id: str, user_input: str) -> Optional[IntentDecl]:
+        """match_intent的异步版本：等待LLM识别意图期间事件循环可以处理其他会话"""
+        session = await self.interpreter.run_in_worker(self._record_input, session_id, user_input)
+        if session is None:
+            return None
+        return await self.interpreter.identify_intent_async(user_input, session.conversation_history,
+                                                            session.last_intent, session.last_context)
+
+    async def execute_intent_async(self, session_id: str, intent: IntentDecl) -> Union[InputRequest, Dict[str, Any]]:
+        """execute_intent的异步版本：在工作线程中执行（等待管理器的锁和内置函数的I/O时不阻塞事件循环）"""
+        return await self.interpreter.run_in_worker(self.execute_intent, session_id, intent)
+
+    async def send_input_async(self, session_id: str, value: str) -> Union[InputRequest, Dict[str, Any]]:
+        """send_input的异步版本"""
+        return await self.interpreter.run_in_worker(self.send_input, session_id, value)
+
+    async def handle_async(self, session_id: str, user_input: str) -> Union[InputRequest, Dict[str, Any], None]:
+        """
+        handle的异步版本：一个事件循环驱动所有会话，各会话的LLM意图识别并发进行，
+        意图的执行仍按管理器的锁逐个进行（共享一个解释器）
+        """
+        session = await self.interpreter.run_in_worker(self.get, session_id)
+        if session.execution is not None:
+            return await self.send_input_async(session_id, user_input)
+        intent = await self.match_intent_async(session_id, user_input)
+        if intent is None:
+            return None
+        return await self.execute_intent_async(session_id, intent)
+
+    def _advance(self, session: Session, intent: Optional[IntentDecl], value: Optional[str]
+                 ) -> Union[InputRequest, Dict[str, Any]]:
+        """把会话状态换入解释器，开始（intent）或继续（value）执行，之后换出"""
+        interpreter = self.interpreter
+        output_callback = interpreter.output_callback
+        # 解释器自身的对话状态，换出会话后恢复（直接使用解释器时不会写入最后一个会话的对话历史）
+        own_state = (interpreter.conversation_history, interpreter.last_intent, interpreter.last_context,
+                     interpreter.current_intent, interpreter.current_result)
+        interpreter.conversation_history = session.conversation_history
+        interpreter.last_intent = session.last_intent
+        interpreter.last_context = session.last_context
+        interpreter.current_intent = session.current_intent
+        interpreter.current_result = session.current_result
+        if session.output_callback is not None:
+            interpreter.output_callback = session.output_callback
+        try:
+            if intent is not None:
+                session.execution = interpreter.run_intent(intent)
+                outcome = next(session.execution)
+            else:
+                # 恢复暂停时的变量（暂停期间解释器可能执行了其他会话）
+                interpreter.variables.over(session.scope)
+                outcome = session.execution.send(value)
+            session.scope = interpreter.variables.snapshot()
+            session.request = outcome
+        except StopIteration as stop:
+            session.execution = None
+            session.request = None
+            session.scope = None
+            outcome = stop.value
+        except BaseException:
+            session.execution = None
+            session.request = None
+            session.scope = None
+            # 执行到一半的变量不能留给下一次执行
+            interpreter.variables.clear()
+            raise
+        finally:
+            session.last_intent = interpreter.last_intent
+            session.last_context = interpreter.last_context
+            session.current_intent = interpreter.current_intent
+            session.current_result = interpreter.current_result
+            interpreter.output_callback = output_callback
+            (interpreter.conversation_history, interpreter.last_intent, interpreter.last_context,
+             interpreter.current_intent, interpreter.current_result) = own_state
+            self._resize(session)
+            self._save(session)
+        return outcome
+
+    def _save(self, session: Session):
+        if self.store is not None:
+            self.store.save(session.session_id, session.dump())
+
+    def _resize(self, session: Session):
+        size = session.estimate_size()
+        self.total_size += size - session.size
+        session.size = size
+        self.evict()
+
+    def swap_program(self, program: Program):
+        """热重载：替换共享的程序，保留所有会话（暂停的意图在旧版本上执行完毕）"""
+        with self._lock:
+            self.interpreter.swap_program(program)
+
+    def load_module(self, module):
+        """加载预编译模块（见Interpreter.load_module），保留所有会话"""
+        with self._lock:
+            self.interpreter.load_module(module)
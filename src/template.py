@@ -0,0 +1,326 @@
+"""
+模板编译（Template）
+作用：将response/ask中的模板字符串在解析时编译为字面量片段和预先解析好的表达式槽位
+在全项目中的作用：解释器每轮渲染模板时只需按槽位取值并拼接一次，
+                  不再对模板做正则替换、也不再在运行时解析函数调用和拆分参数
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.variables import UNSET, Variables
+
+# 与原 Interpreter._format_template 相同的占位符和函数调用语法
+PLACEHOLDER_PATTERN = re.compile(r'\{([^}]+)\}')
+CALL_PATTERN = re.compile(r'(\w+)\s*\((.*)\)')
+
+# 未设置上一次意图时 last_intent 的取值
+DEFAULT_LAST_INTENT = "默认"
+
+
+class VariableSlot:
+    """
+    变量占位符 {name}
+    变量存在时取变量值；名称为 last_intent 时取上一次的意图；否则原样保留占位符文本
+    """
+    __slots__ = ('name', 'raw')
+    
+    def __init__(self, name: str, raw: str):
+        self.name = name
+        self.raw = raw
+    
+    def render(self, variables: Dict[str, Any], functions: Dict[str, Callable], last_intent: Optional[str]) -> str:
+        if self.name in variables:
+            return str(variables[self.name])
+        if self.name == "last_intent":
+            return str(last_intent or DEFAULT_LAST_INTENT)
+        return self.raw
+    
+    def bind(self, slot: Callable[[str], int]) -> 'IndexedVariableSlot':
+        return IndexedVariableSlot(slot(self.name), self.name, self.raw)
+    
+    def __repr__(self):
+        return f"VariableSlot({self.name!r})"
+
+
+class CallSlot:
+    """
+    函数调用占位符 {func(arg, ...)}
+    参数在编译时拆分：带引号的参数是字面量，其余参数在渲染时依次按变量、last_intent、字面量解析；
+    函数不存在或调用出错时原样保留占位符文本
+    """
+    __slots__ = ('expression', 'function', 'args', 'raw')
+    
+    def __init__(self, expression: str, function: str, args: Tuple[Tuple[bool, str], ...], raw: str):
+        """
+        :param expression: 花括号中的文本
+        :param function: 函数名
+        :param args: (是否为字面量, 文本) 列表
+        :param raw: 占位符原文（含花括号）
+        """
+        self.expression = expression
+        self.function = function
+        self.args = args
+        self.raw = raw
+    
+    def render(self, variables: Dict[str, Any], functions: Dict[str, Callable], last_intent: Optional[str]) -> str:
+        if self.expression in variables:
+            return str(variables[self.expression])
+        func = functions.get(self.function)
+        if func is None:
+            return self.raw
+        args = []
+        for literal, text in self.args:
+            if literal:
+                args.append(text)
+            elif text in variables:
+                args.append(variables[text])
+            elif text == "last_intent":
+                args.append(last_intent or DEFAULT_LAST_INTENT)
+            else:
+                args.append(text)
+        try:
+            return str(func(*args))
+        except Exception:
+            return self.raw
+    
+    def bind(self, slot: Callable[[str], int]) -> 'IndexedCallSlot':
+        args = tuple((None if literal else slot(text), text) for literal, text in self.args)
+        return IndexedCallSlot(slot(self.expression), self.function, args, self.raw)
+    
+    def __repr__(self):
+        return f"CallSlot({self.function!r}, {len(self.args)} args)"
+
+
+class IndexedVariableSlot:
+    """绑定到槽位编号的变量占位符，语义与VariableSlot一致"""
+    __slots__ = ('slot', 'name', 'raw')
+    
+    def __init__(self, slot: int, name: str, raw: str):
+        self.slot = slot
+        self.name = name
+        self.raw = raw
+    
+    def render(self, variables: Variables, functions: Dict[str, Callable], last_intent: Optional[str]) -> str:
+        value = variables.values[self.slot]
+        if value is not UNSET:
+            return str(value)
+        if self.name == "last_intent":
+            return str(last_intent or DEFAULT_LAST_INTENT)
+        return self.raw
+
+
+class IndexedCallSlot:
+    """绑定到槽位编号的函数调用占位符，语义与CallSlot一致"""
+    __slots__ = ('slot', 'function', 'args', 'raw')
+    
+    def __init__(self, slot: int, function: str, args: Tuple[Tuple[Optional[int], str], ...], raw: str):
+        """
+        :param slot: 花括号中的文本作为变量名时的槽位编号
+        :param args: (槽位编号, 文本) 列表，字面量参数的槽位编号为None
+        """
+        self.slot = slot
+        self.function = function
+        self.args = args
+        self.raw = raw
+    
+    def render(self, variables: Variables, functions: Dict[str, Callable], last_intent: Optional[str]) -> str:
+        values = variables.values
+        value = values[self.slot]
+        if value is not UNSET:
+            return str(value)
+        func = functions.get(self.function)
+        if func is None:
+            return self.raw
+        args = []
+        for slot, text in self.args:
+            if slot is None:
+                args.append(text)
+            elif values[slot] is not UNSET:
+                args.append(values[slot])
+            elif text == "last_intent":
+                args.append(last_intent or DEFAULT_LAST_INTENT)
+            else:
+                args.append(text)
+        try:
+            return str(func(*args))
+        except Exception:
+            return self.raw
+
+
+class CompiledTemplate:
+    """编译后的模板：字面量字符串和槽位组成的片段序列"""
+    __slots__ = ('source', 'parts', 'static')
+    
+    def __init__(self, source: str, parts: Tuple[Any, ...]):
+        self.source = source
+        # 合并相邻的字面量片段
+        merged = []
+        for part in parts:
+            if part.__class__ is str and merged and merged[-1].__class__ is str:
+                merged[-1] += part
+            else:
+                merged.append(part)
+        self.parts = tuple(merged)
+        parts = self.parts
+        # 不含槽位的模板直接返回源文本
+        if not parts:
+            self.static = ""
+        elif len(parts) == 1 and parts[0].__class__ is str:
+            self.static = parts[0]
+        else:
+            self.static = None
+    
+    def render(self, variables: Dict[str, Any], functions: Dict[str, Callable],
+               last_intent: Optional[str] = None) -> str:
+        """
+        渲染模板
+        :param variables: 变量表
+        :param functions: 函数表（函数名 -> 可调用对象）
+        :param last_intent: 上一次的意图名称
+        """
+        if self.static is not None:
+            return self.static
+        return "".join([
+            part if part.__class__ is str else part.render(variables, functions, last_intent)
+            for part in self.parts
+        ])
+    
+    def bind(self, slot: Callable[[str], int]) -> 'BoundTemplate':
+        """
+        把槽位中的变量名解析为槽位编号（见src/variables.py）
+        :param slot: 变量名 -> 槽位编号，一般为 Variables.slot
+        """
+        return BoundTemplate(self.source, tuple(
+            part if part.__class__ is str else part.bind(slot) for part in self.parts
+        ), self.static)
+    
+    def __repr__(self):
+        return f"CompiledTemplate({self.source!r})"
+
+
+class BoundTemplate:
+    """绑定到槽位编号的模板：按下标从变量表中取变量，不再按名称查找"""
+    __slots__ = ('source', 'parts', 'static')
+    
+    def __init__(self, source: str, parts: Tuple[Any, ...], static: Optional[str]):
+        self.source = source
+        self.parts = parts
+        self.static = static
+    
+    def render(self, variables: Variables, functions: Dict[str, Callable],
+               last_intent: Optional[str] = None) -> str:
+        """
+        渲染模板
+        :param variables: 槽位变量表
+        :param functions: 函数表（函数名 -> 可调用对象）
+        :param last_intent: 上一次的意图名称
+        """
+        if self.static is not None:
+            return self.static
+        return "".join([
+            part if part.__class__ is str else part.render(variables, functions, last_intent)
+            for part in self.parts
+        ])
+    
+    def render_fragments(self, variables: Variables, functions: Dict[str, Callable],
+                         last_intent: Optional[str] = None) -> Tuple[str, Tuple[str, ...]]:
+        """
+        渲染模板，同时返回各个槽位渲染出的片段（按出现顺序）
+        保存片段和模板即可在之后用join()还原文本，不需要保存整段文本
+        :return: (渲染结果, 槽位片段)
+        """
+        if self.static is not None:
+            return self.static, ()
+        pieces = []
+        fragments = []
+        for part in self.parts:
+            if part.__class__ is str:
+                pieces.append(part)
+            else:
+                fragment = part.render(variables, functions, last_intent)
+                pieces.append(fragment)
+                fragments.append(fragment)
+        return "".join(pieces), tuple(fragments)
+    
+    def join(self, fragments: Tuple[str, ...]) -> str:
+        """用render_fragments()返回的槽位片段还原渲染结果"""
+        if self.static is not None:
+            return self.static
+        fragments = iter(fragments)
+        return "".join([part if part.__class__ is str else next(fragments) for part in self.parts])
+    
+    def __repr__(self):
+        return f"BoundTemplate({self.source!r})"
+
+
+def _compile_placeholder(expression: str, raw: str):
+    """将花括号中的文本编译为槽位"""
+    if '(' in expression and ')' in expression:
+        match = CALL_PATTERN.match(expression)
+        if match:
+            args = []
+            args_text = match.group(2).strip()
+            if args_text:
+                for arg in args_text.split(','):
+                    arg = arg.strip()
+                    if (arg.startswith('"') and arg.endswith('"')) or (arg.startswith("'") and arg.endswith("'")):
+                        args.append((True, arg[1:-1]))
+                    else:
+                        args.append((False, arg))
+            return CallSlot(expression, match.group(1), tuple(args), raw)
+    return VariableSlot(expression, raw)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    """
+    编译模板字符串
+    相同的模板文本共享同一个编译结果（编译结果不可变）
+    """
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(template):
+        if match.start() > position:
+            parts.append(template[position:match.start()])
+        parts.append(_compile_placeholder(match.group(1), match.group(0)))
+        position = match.end()
+    if position < len(template):
+        parts.append(template[position:])
+    return CompiledTemplate(template, tuple(parts))
+
+
+def is_pure(func: Callable) -> bool:
+    """函数是否声明为纯函数（见 src.interpreter.pure）"""
+    return getattr(func, 'pure', False) is True
+
+
+def fold_template(template: CompiledTemplate, functions: Dict[str, Callable]) -> CompiledTemplate:
+    """
+    常量折叠：参数全部为带引号的字面量的纯函数调用，结果在加载时就能确定，替换为字面量
+    变量占位符和带未加引号参数的调用不折叠：运行时会先按变量查找这些名称，
+    而变量可能来自加载之后才换入的上下文（SessionManager中会话沿用的上下文、从会话存储恢复的会话）
+    :param template: 编译后的模板
+    :param functions: 函数表
+    :return: 折叠后的模板，没有可折叠的槽位时返回原对象
+    """
+    if template.static is not None:
+        return template
+    
+    parts = []
+    folded = 0
+    for part in template.parts:
+        if isinstance(part, CallSlot) and all(literal for literal, _ in part.args):
+            func = functions.get(part.function)
+            if func is not None and is_pure(func):
+                try:
+                    part = str(func(*[text for _, text in part.args]))
+                    folded += 1
+                except Exception:
+                    # 调用出错的占位符在运行时同样保留原文，这里不折叠，保持运行时行为
+                    pass
+        parts.append(part)
+    if not folded:
+        return template
+    return CompiledTemplate(template.source, tuple(parts))
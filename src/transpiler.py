@@ -0,0 +1,348 @@
+"""
+预编译（Transpiler，dslc）
+作用：将Program转换为Python源代码：每个意图生成一个函数，模板生成字符串拼接表达式，内置函数直接调用
+在全项目中的作用：生成的模块写入磁盘后由CPython缓存字节码，解释器加载它代替遍历AST执行意图，
+                  启动时只需导入一个模块
+用法：python -m src.transpiler <script_file> [...]
+"""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.parser import (
+    ASTNode, Program, IntentDecl, AskAction, WaitForAction, ResponseAction,
+    SetAction, OptionsAction, StringLiteral, Variable, FunctionCall
+)
+from src.template import CompiledTemplate, VariableSlot, DEFAULT_LAST_INTENT, is_pure
+from src.script_cache import CACHE_DIR_NAME, source_digest
+from src.modules import ModuleCache
+from src.logger import setup_logger
+
+logger = setup_logger("DSL_Agent_Transpiler")
+
+# 生成代码的版本：生成方式变化时递增，使旧模块失效
+TRANSPILER_VERSION = "7"
+
+
+# 生成的模块在运行时使用的辅助函数
+
+def call_or_raw(func: Optional[Callable], raw: str, *args) -> str:
+    """模板中的函数调用：函数不存在或调用出错时保留占位符原文"""
+    if func is None:
+        return raw
+    try:
+        return str(func(*args))
+    except Exception:
+        return raw
+
+
+def fold_call(func: Optional[Callable], args: Tuple[str, ...]) -> Optional[str]:
+    """绑定时常量折叠：纯函数（参数全部为带引号的字面量）返回调用结果，否则返回None"""
+    if func is None or not is_pure(func):
+        return None
+    try:
+        return str(func(*args))
+    except Exception:
+        return None
+
+
+def missing_function(name: str, *args) -> str:
+    """set表达式中调用不存在的函数时的模拟值，与Interpreter.evaluate_function_call一致"""
+    return f"{name}({', '.join(str(arg) for arg in args)})"
+
+
+class _ModuleWriter:
+    """为一个Program生成Python源代码"""
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.functions: Dict[str, str] = {}  # 函数名 -> 绑定后的局部变量名
+        self.slots: Dict[str, str] = {}  # 变量名 -> 保存槽位编号的局部变量名
+        self.constants: List[str] = []  # 绑定时折叠的常量
+        self.requests: List[str] = []  # wait_for的输入请求
+        self.turns: List[str] = []  # response的模板引用
+
+    def function(self, name: str) -> str:
+        if name not in self.functions:
+            self.functions[name] = f"f_{len(self.functions)}"
+        return self.functions[name]
+
+    def slot(self, name: str) -> str:
+        if name not in self.slots:
+            self.slots[name] = f"s_{len(self.slots)}"
+        return self.slots[name]
+
+    def value(self, name: str, default: str) -> str:
+        """读取变量的表达式：已赋值时为变量值，否则为default表达式"""
+        s = self.slot(name)
+        return f"(values[{s}] if values[{s}] is not UNSET else {default})"
+
+    def text(self, name: str, default: str) -> str:
+        """读取变量并转换为字符串的表达式"""
+        s = self.slot(name)
+        return f"(str(values[{s}]) if values[{s}] is not UNSET else {default})"
+
+    def template(self, template: CompiledTemplate) -> str:
+        """模板 -> 字符串表达式"""
+        if template.static is not None:
+            return repr(template.static)
+        parts = [self.placeholder(part) if not isinstance(part, str) else repr(part) for part in template.parts]
+        return " + ".join(parts)
+
+    def argument(self, literal: bool, text: str) -> str:
+        if literal:
+            return repr(text)
+        if text == "last_intent":
+            return self.value(text, f"(rt.last_intent or {DEFAULT_LAST_INTENT!r})")
+        return self.value(text, repr(text))
+
+    def placeholder(self, slot) -> str:
+        if isinstance(slot, VariableSlot):
+            if slot.name == "last_intent":
+                return self.text(slot.name, f"str(rt.last_intent or {DEFAULT_LAST_INTENT!r})")
+            return self.text(slot.name, repr(slot.raw))
+        func = self.function(slot.function)
+        args = "".join(", " + self.argument(literal, text) for literal, text in slot.args)
+        call = f"call_or_raw({func}, {slot.raw!r}{args})"
+        # 参数全部为带引号的字面量时可以在绑定时折叠（未加引号的名称运行时会先按变量查找）
+        if all(literal for literal, _ in slot.args):
+            constant = f"k_{len(self.constants)}"
+            values = tuple(text for _, text in slot.args)
+            self.constants.append(f"{constant} = fold_call({func}, {values!r})")
+            call = f"({constant} if {constant} is not None else {call})"
+        return self.text(slot.expression, call)
+
+    def expression(self, expr) -> str:
+        """set表达式 -> Python表达式，语义与Interpreter.evaluate_expression一致"""
+        if isinstance(expr, StringLiteral):
+            return repr(expr.value)
+        if isinstance(expr, Variable):
+            return self.value(expr.name, repr('$' + expr.name))
+        if isinstance(expr, FunctionCall):
+            func = self.function(expr.name)
+            args = ", ".join(self.expression(arg) for arg in expr.args)
+            missing_args = "".join(", " + self.expression(arg) for arg in expr.args)
+            return f"({func}({args}) if {func} else missing_function({expr.name!r}{missing_args}))"
+        return repr(str(expr))
+
+    def response(self, index: int, position: int, intent_name: str, template: CompiledTemplate) -> List[str]:
+        """
+        response动作：渲染并输出回复，回复的模板引用（BotTurn）写入rt.current_result，由解释器记录到对话历史
+        模板在绑定时通过rt.bound_template取得，片段与模板的槽位一一对应
+        """
+        turn = f"t_{len(self.turns)}"
+        compiled = f"PROGRAM.intents[{index}].actions[{position}].compiled"
+        if template.static is not None:
+            self.turns.append(f"{turn} = BotTurn({intent_name!r}, rt.bound_template({compiled}))")
+            return [
+                f"        response = {template.static!r}",
+                "        output('[机器人] ' + response)",
+                f"        rt.current_result['turn'] = {turn}",
+            ]
+        self.turns.append(f"{turn} = rt.bound_template({compiled})")
+        lines = []
+        pieces = []
+        fragments = []
+        for part in template.parts:
+            if isinstance(part, str):
+                pieces.append(repr(part))
+                continue
+            fragment = f"g_{len(fragments)}"
+            lines.append(f"        {fragment} = {self.placeholder(part)}")
+            pieces.append(fragment)
+            fragments.append(fragment)
+        return lines + [
+            f"        response = {' + '.join(pieces)}",
+            "        output('[机器人] ' + response)",
+            f"        rt.current_result['turn'] = BotTurn({intent_name!r}, {turn}, ({', '.join(fragments)},))",
+        ]
+
+    def intent(self, index: int, intent: IntentDecl) -> List[str]:
+        lines = [
+            f"    def intent_{index}(assigned):",
+            f"        # {intent.name!r}",
+            "        values = variables.values",
+            "        response = None",
+        ]
+        options = ()
+        responded = False
+        for position, action in enumerate(intent.actions):
+            if isinstance(action, AskAction):
+                lines.append(f"        output('[机器人] ' + {self.template(action.compiled)})")
+            elif isinstance(action, ResponseAction):
+                lines += self.response(index, position, intent.name, action.compiled)
+                responded = True
+            elif isinstance(action, WaitForAction):
+                # 含wait_for的意图函数是生成器：产生输入请求并暂停，由调用方send用户输入后继续
+                name = action.variable
+                request = f"r_{len(self.requests)}"
+                self.requests.append(f"{request} = InputRequest({name!r}, {options!r}, {position})")
+                options = ()
+                if responded:
+                    # 暂停前记录已产生的回复，暂停的执行保存到会话存储时一并保存
+                    lines.append("        rt.current_result['response'] = response")
+                lines += [
+                    f"        value = yield {request}",
+                    "        values = variables.writable()",
+                    f"        values[{self.slot(name)}] = value",
+                    f"        assigned[{name!r}] = value",
+                ]
+            elif isinstance(action, SetAction):
+                lines += [
+                    f"        value = {self.expression(action.expression)}",
+                    "        values = variables.writable()",
+                    f"        values[{self.slot(action.variable)}] = value",
+                    f"        assigned[{action.variable!r}] = value",
+                ]
+            elif isinstance(action, OptionsAction):
+                options = action.options
+                text = "请选择：\n" + "".join(f"  {i}. {option}\n" for i, option in enumerate(action.options, 1))
+                lines.append(f"        output({text!r})")
+        lines.append("        return response")
+        return lines
+
+    def write(self, sources: Tuple[Tuple[str, str], ...], source_name: str) -> str:
+        body = []
+        for index, intent in enumerate(self.program.intents):
+            body += self.intent(index, intent)
+            body.append("")
+        header = [
+            f'"""由dslc从 {source_name} 生成，请勿手工修改"""',
+            "",
+            "from src.parser import (",
+            "    Program, ImportDecl, IntentDecl, WhenClause, AskAction, WaitForAction,",
+            "    ResponseAction, SetAction, OptionsAction, StringLiteral, Variable, FunctionCall",
+            ")",
+            "from src.transpiler import call_or_raw, fold_call, missing_function",
+            "from src.variables import UNSET",
+            "from src.interpreter import InputRequest",
+            "from src.history import BotTurn",
+            "",
+            f"TRANSPILER_VERSION = {TRANSPILER_VERSION!r}",
+            f"SOURCES = {sources!r}",
+            "",
+            f"PROGRAM = {node_source(self.program)}",
+            "",
+            "",
+            "def bind(rt):",
+            '    """绑定解释器，返回与PROGRAM.intents一一对应的意图执行函数"""',
+            "    functions = rt.functions",
+            "    output = rt._output",
+            "    variables = rt.variables",
+            "    slot = variables.slot",
+        ]
+        header += [f"    {local} = slot({name!r})" for name, local in self.slots.items()]
+        header += [f"    {local} = functions.get({name!r})" for name, local in self.functions.items()]
+        header += [f"    {constant}" for constant in self.constants]
+        header += [f"    {request}" for request in self.requests]
+        header += [f"    {turn}" for turn in self.turns]
+        header.append("")
+        footer = [f"    return ({''.join(f'intent_{i}, ' for i in range(len(self.program.intents)))})", ""]
+        return "\n".join(header + body + footer)
+
+
+def node_source(value) -> str:
+    """AST节点 -> 构造该节点的Python表达式"""
+    if isinstance(value, ASTNode):
+        fields = ", ".join(node_source(field) for field in value._field_values())
+        return f"{value.__class__.__name__}({fields})"
+    if isinstance(value, tuple):
+        return "[" + ", ".join(node_source(item) for item in value) + "]"
+    return repr(value)
+
+
+def transpile(program: Program, sources: Tuple[Tuple[str, str], ...] = (), source_name: str = "<program>") -> str:
+    """
+    将Program转换为Python模块源代码
+    :param sources: (脚本路径, 源代码哈希) 列表，记录在模块中用于判断模块是否过期
+    :param source_name: 写入模块说明的脚本名称
+    """
+    return _ModuleWriter(program).write(sources, source_name)
+
+
+def module_path_for(script_path: str) -> Path:
+    """脚本对应的预编译模块路径：同目录下的 __dslcache__/<脚本名>_dslc.py"""
+    path = Path(script_path)
+    return path.parent / CACHE_DIR_NAME / f"{path.stem}_dslc.py"
+
+
+def _import(path: Path):
+    """按文件路径导入模块（不登记到sys.modules，CPython仍会使用__pycache__中的字节码）"""
+    spec = importlib.util.spec_from_file_location(f"_dslc_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def is_current(module) -> bool:
+    """模块是否由当前版本的dslc从当前的脚本内容生成"""
+    if getattr(module, "TRANSPILER_VERSION", None) != TRANSPILER_VERSION:
+        return False
+    for path, digest in getattr(module, "SOURCES", ()):
+        try:
+            source = Path(path).read_text(encoding="utf-8")
+        except OSError:
+            return False
+        if source_digest(source).hex() != digest:
+            return False
+    return bool(getattr(module, "SOURCES", ()))
+
+
+def build_module(script_path: str) -> Path:
+    """
+    dslc：编译脚本（含导入的脚本）并写出Python模块
+    :return: 模块路径
+    :raises SyntaxError: 脚本存在语法错误
+    """
+    cache = ModuleCache()
+    program = cache.load(script_path)
+    sources = tuple((path, cache.modules[path].digest.hex()) for path in sorted(cache.modules))
+    path = module_path_for(script_path)
+    path.parent.mkdir(exist_ok=True)
+    code = transpile(program, sources, Path(script_path).name)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(code, encoding="utf-8")
+    os.replace(tmp_path, path)
+    # 字节码缓存按源文件的修改时间和大小校验，同一秒内重新生成大小相同的模块时需要手动删除
+    bytecode = Path(importlib.util.cache_from_source(str(path)))
+    if bytecode.exists():
+        bytecode.unlink()
+    logger.info(f"已生成预编译模块: {path}")
+    return path
+
+
+def load_module(script_path: str):
+    """
+    加载脚本的预编译模块，模块不存在或已过期（脚本或导入的脚本被修改）时先重新生成
+    启动时只需导入模块并校验源代码哈希，不做词法分析和语法分析
+    :return: 模块（PROGRAM为程序，bind(interpreter)返回意图执行函数）
+    :raises SyntaxError: 需要重新生成时脚本存在语法错误
+    """
+    path = module_path_for(script_path)
+    if path.exists():
+        try:
+            module = _import(path)
+            if is_current(module):
+                return module
+        except Exception as e:
+            logger.warning(f"预编译模块无法加载，重新生成: {path}: {e}")
+    return _import(build_module(script_path))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python -m src.transpiler <script_file> [...]")
+        sys.exit(1)
+    for script in sys.argv[1:]:
+        try:
+            print(f"[OK] {script} -> {build_module(script)}")
+        except (SyntaxError, OSError) as e:
+            print(f"[ERROR] {script}: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
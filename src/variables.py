@@ -0,0 +1,172 @@
+"""
+槽位变量表（Variables）
+作用：为程序中出现的每个变量名分配固定的槽位编号，变量值保存在按编号预先分配的列表中；
+      每一轮对话结束时取不可变快照，下一轮与快照共享值列表，第一次写入时才复制（写时复制）
+在全项目中的作用：closure/aot引擎和编译后的模板在编译时把变量名解析为槽位编号，运行时按下标读写，
+                  不再对变量名做哈希；Interpreter.variables 仍可按名称访问，供调试和LLM上下文使用
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+
+class _Unset:
+    """未赋值槽位的占位值"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UNSET"
+
+    def __reduce__(self):
+        return "UNSET"
+
+
+UNSET = _Unset()
+
+
+class Variables(MutableMapping):
+    """
+    按槽位存储的变量表，同时是按名称访问的映射视图
+    - 槽位只增不减：名称第一次出现时分配编号，之后编号不变，按编号读写前必须先通过slot()取得编号
+    - snapshot()返回与当前变量表共享值列表的不可变快照，不复制任何值；
+      之后第一次写入时变量表才复制值列表（writable()），快照保持不变
+    同一个变量表派生出的快照共享名称和编号
+    """
+    __slots__ = ('names', 'index', 'values', 'shared', 'parent', 'frozen')
+
+    def __init__(self, names: Iterable[str] = ()):
+        """
+        :param names: 预先分配槽位的变量名
+        """
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.values: List[Any] = []
+        self.shared = False  # 值列表是否与快照共享（写入前需要复制）
+        self.parent: Optional[Variables] = None  # 当前值列表所基于的快照
+        self.frozen = False
+        for name in names:
+            self.slot(name)
+
+    def slot(self, name: str) -> int:
+        """返回变量名的槽位编号，名称第一次出现时分配新槽位"""
+        i = self.index.get(name)
+        if i is None:
+            i = len(self.names)
+            self.names.append(name)
+            self.index[name] = i
+        if i >= len(self.values):
+            values = self.writable()
+            values.extend([UNSET] * (i + 1 - len(values)))
+        return i
+
+    def writable(self) -> List[Any]:
+        """返回可以写入的值列表：与快照共享时先复制一次"""
+        self._check_writable()
+        if self.shared:
+            self.values = list(self.values)
+            self.shared = False
+        return self.values
+
+    def snapshot(self) -> 'Variables':
+        """
+        返回当前全部变量的不可变快照（共享值列表，不复制）
+        :return: 快照（与本变量表共享名称和编号）
+        """
+        snapshot = Variables.__new__(Variables)
+        snapshot.names = self.names
+        snapshot.index = self.index
+        snapshot.values = self.values
+        snapshot.shared = True
+        snapshot.parent = None
+        snapshot.frozen = True
+        self.shared = True
+        self.parent = snapshot
+        return snapshot
+
+    def copy(self) -> 'Variables':
+        """与snapshot()相同，返回不可变快照"""
+        return self.snapshot()
+
+    def over(self, context: Mapping[str, Any]):
+        """
+        丢弃当前的值，改为从context继续（共享context的值列表，写入时复制）
+        :param context: 同一变量表的快照，或按名称的映射（例如从外部恢复的上下文）
+        """
+        if not (isinstance(context, Variables) and context.index is self.index):
+            self.clear()
+            for name, value in context.items():
+                self[name] = value
+            self.snapshot()
+            return
+        if not context.frozen:
+            context = context.snapshot()
+        self.values = context.values
+        self.shared = True
+        self.parent = context
+        if len(self.values) < len(self.names):
+            self.writable().extend([UNSET] * (len(self.names) - len(self.values)))
+
+    def keep(self, slots: Iterable[int]):
+        """只保留指定槽位的值（意图声明了carry_over时只继承声明的变量）"""
+        self._check_writable()
+        values = self.values
+        kept = [UNSET] * len(values)
+        for i in slots:
+            kept[i] = values[i]
+        self.values = kept
+        self.shared = False
+
+    def clear(self):
+        self._check_writable()
+        self.values = [UNSET] * len(self.names)
+        self.shared = False
+        self.parent = None
+
+    def _check_writable(self):
+        if self.frozen:
+            raise TypeError("变量表快照不可修改")
+
+    # 按名称访问（调试、LLM上下文和tree引擎）
+
+    def __getitem__(self, name: str) -> Any:
+        i = self.index.get(name)
+        if i is not None and i < len(self.values):
+            value = self.values[i]
+            if value is not UNSET:
+                return value
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value: Any):
+        self._check_writable()
+        i = self.slot(name)
+        self.writable()[i] = value
+
+    def __delitem__(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        self.writable()[self.index[name]] = UNSET
+
+    def __contains__(self, name) -> bool:
+        i = self.index.get(name)
+        return i is not None and i < len(self.values) and self.values[i] is not UNSET
+
+    def get(self, name: str, default: Any = None) -> Any:
+        i = self.index.get(name)
+        if i is not None and i < len(self.values):
+            value = self.values[i]
+            if value is not UNSET:
+                return value
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        names = self.names
+        return (names[i] for i, value in enumerate(self.values) if value is not UNSET)
+
+    def __len__(self) -> int:
+        return sum(1 for value in self.values if value is not UNSET)
+
+    def __bool__(self) -> bool:
+        return any(value is not UNSET for value in self.values)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,68 @@
+"""
+测试共用的辅助函数和fixture
+"""
+
+import os
+import random
+import shutil
+from pathlib import Path
+
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.sessions import SessionManager
+from tests.stubs.mock_llm_client import MockLLMClient
+
+
+# 示例脚本目录
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+
+
+def parse(text):
+    """对源代码进行词法分析和语法分析"""
+    return Parser(Lexer(text)).parse()
+
+
+def copy_scripts(directory, *names):
+    """把示例脚本复制到directory（编译缓存、生成的模块写在副本旁边），返回复制后的路径列表"""
+    paths = []
+    for name in names:
+        path = directory / name
+        shutil.copy(SCRIPTS_DIR / name, path)
+        paths.append(path)
+    return paths
+
+
+def intent(name, pattern, reply):
+    """生成只包含一个response的意图脚本"""
+    return f'intent "{name}" {{\n    when user_says "{pattern}" {{\n        response "{reply}"\n    }}\n}}\n'
+
+
+def write(path, text):
+    """写入脚本文件，并保证修改时间变化（不依赖文件系统的时间精度）"""
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def create_manager(script, engine="tree", **kwargs):
+    """
+    解析脚本，创建使用MockLLMClient的解释器（丢弃输出）和共享它的SessionManager
+    :param kwargs: 传给SessionManager的参数（store、max_sessions等）
+    :return: (SessionManager, 程序)
+    """
+    program = Parser(Lexer(script)).parse()
+    interpreter = Interpreter(MockLLMClient(), engine=engine)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.interpret(program)
+    return SessionManager(interpreter, **kwargs), program
+
+
+def run_all(interpreter, program):
+    """用已加载程序的解释器依次执行所有意图（固定随机种子和用户输入），返回每次的结果、全部输出和最后的上下文"""
+    random.seed(0)
+    outputs = []
+    interpreter.set_output_callback(outputs.append)
+    interpreter.set_user_input_callback(lambda name: f"{name}_12345")
+    results = [interpreter.execute_intent(intent) for intent in program.intents]
+    return results, outputs, interpreter.last_context
@@ -4,7 +4,7 @@ LLM客户端测试桩（Mock）
 在全项目中的作用：这是测试桩，用于隔离测试，确保测试不依赖外部服务，提高测试的稳定性和速度
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from src.llm_client import LLMClient
 
 
@@ -19,9 +19,9 @@ class MockLLMClient(LLMClient):
         self.intent_mapping = intent_mapping or {}
         self.call_history = []  # 记录所有调用历史
     
-    def identify_intent(self, user_input: str, intents: List) -> Optional[str]:
+    def identify_intent(self, user_input: str, intents: List, conversation_history: List = None, last_intent: str = None, last_context: Dict = None) -> Optional[str]:
         """
-        模拟意图识别
+        模拟意图识别（对话历史和上下文参数与LLMClient接口一致，模拟时不使用）
         :param user_input: 用户输入
         :param intents: 可用意图列表
         :return: 匹配的意图名称
@@ -63,7 +63,7 @@ class MockLLMClient(LLMClient):
 class FailingLLMClient(LLMClient):
     """模拟失败的LLM客户端，用于测试错误处理"""
     
-    def identify_intent(self, user_input: str, intents: List) -> Optional[str]:
+    def identify_intent(self, user_input: str, intents: List, conversation_history: List = None, last_intent: str = None, last_context: Dict = None) -> Optional[str]:
         """模拟API调用失败"""
         raise Exception("模拟的LLM API调用失败")
 
@@ -0,0 +1,40 @@
+"""
+closure执行引擎测试
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from tests import test_interpreter
+from tests.conftest import run_all
+
+
+INTERPRETER_TESTS = [getattr(test_interpreter, name) for name in dir(test_interpreter) if name.startswith("test_")]
+
+
+@pytest.mark.parametrize("test", INTERPRETER_TESTS, ids=lambda test: test.__name__)
+def test_interpreter_suite_with_closure_engine(test, monkeypatch):
+    """测试closure引擎通过解释器的全部测试"""
+    monkeypatch.setenv("DSL_INTERPRETER_ENGINE", "closure")
+    assert Interpreter().engine == "closure"
+    test()
+
+
+def test_closure_engine_matches_tree_engine():
+    """测试两种引擎在示例脚本上的执行结果一致"""
+    text = (Path(__file__).parent.parent / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(text)).parse()
+    closure, tree = Interpreter(engine="closure"), Interpreter(engine="tree")
+    closure.interpret(program)
+    tree.interpret(program)
+    assert run_all(closure, program) == run_all(tree, program)
+
+
+def test_unknown_engine():
+    """测试未知的执行引擎"""
+    with pytest.raises(ValueError):
+        Interpreter(engine="jit")
@@ -0,0 +1,110 @@
+"""
+内置函数注册表测试
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.functions import FunctionRegistry, declare, set_pool_size
+
+
+def test_builtin_declarations_and_stats():
+    """测试内置函数的声明从装饰器读取，执行意图时自动统计调用"""
+    script = '''
+    intent "查询订单" {
+        when user_says "查询订单" {
+            set order_number = "A1"
+            response "订单 {order_number}：{get_order_status(order_number)}，{format_price(\\"10\\")}"
+        }
+    }
+    '''
+    interpreter = Interpreter()
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.interpret(Parser(Lexer(script)).parse())
+    order_status = interpreter.functions["get_order_status"]
+    # 进程内模拟的后端函数不阻塞，直接调用
+    assert not order_status.blocking and not order_status.pure
+    assert interpreter.functions["format_price"].pure
+
+    for _ in range(3):
+        interpreter.execute_intent(interpreter.intents[0])
+    stats = interpreter.functions.stats()
+    assert stats["get_order_status"].calls == 3 and stats["get_order_status"].errors == 0
+    assert stats["get_order_status"].max_time >= stats["get_order_status"].percentile(50) > 0
+    # 纯函数的常量调用在加载时折叠，执行时不再调用
+    assert stats["format_price"].calls == 1
+
+
+def test_timeout_and_fallback():
+    """测试阻塞函数超时后返回回退值，未声明回退值时抛出TimeoutError，出错时同样回退"""
+    release = threading.Event()
+    registry = FunctionRegistry()
+    registry.register("slow", lambda: release.wait(5), blocking=True, backend="test-timeout",
+                      timeout=0.05, fallback="稍后再试")
+    registry.register("strict", lambda: release.wait(5), blocking=True, backend="test-timeout", timeout=0.05)
+    registry.register("broken", lambda: 1 / 0, fallback="出错了")
+    try:
+        assert registry["slow"]() == "稍后再试"
+        # 已经开始的调用超时后结果未知（写操作可能已完成）
+        with pytest.raises(TimeoutError, match="结果未知"):
+            registry["strict"]()
+        assert registry["broken"]() == "出错了"
+    finally:
+        release.set()
+    stats = registry.stats()
+    assert stats["slow"].timeouts == 1 and stats["strict"].errors == 1 and stats["broken"].errors == 1
+    with pytest.raises(ValueError):
+        registry.register("inline", lambda: None, timeout=1)
+
+
+def test_slow_backend_does_not_starve_others():
+    """测试一个后端的线程池被占满时，其他后端的阻塞函数照常执行"""
+    set_pool_size("test-orders", 1)
+    release = threading.Event()
+
+    @declare(blocking=True, backend="test-orders", timeout=0.1, fallback="订单系统繁忙")
+    def order_status():
+        release.wait(5)
+        return "已发货"
+
+    @declare(blocking=True, backend="test-refunds", timeout=1)
+    def refund_status():
+        return "退款中"
+
+    registry = FunctionRegistry()
+    registry.register("order_status", order_status)
+    registry.register("refund_status", refund_status)
+    try:
+        blocked = threading.Thread(target=registry["order_status"])
+        blocked.start()
+        # 订单后端唯一的线程被占用，新的调用排队直到超时
+        assert registry["order_status"]() == "订单系统繁忙"
+        start = time.perf_counter()
+        assert registry["refund_status"]() == "退款中"
+        assert time.perf_counter() - start < 0.05
+    finally:
+        release.set()
+        blocked.join()
+
+
+def test_async_builtin_timeout():
+    """测试异步内置函数的超时和回退值"""
+    async def slow(value):
+        await asyncio.sleep(1)
+        return value
+
+    interpreter = Interpreter()
+    interpreter.register_function("slow", slow, timeout=0.05, fallback="超时")
+    assert interpreter.functions["slow"]("x") == "超时"
+    assert interpreter.functions.stats()["slow"].timeouts == 1
+    with pytest.raises(ValueError):
+        interpreter.register_function("slow", slow, blocking=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+"""
+对话历史测试
+"""
+
+import pytest
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.history import BotTurn, ConversationHistory
+from src.transpiler import transpile
+from tests.stubs.mock_llm_client import MockLLMClient
+
+
+def test_ring_buffer_rolls_up_into_summary():
+    """测试超出容量的消息归并为摘要，recent在最近的消息前加上摘要"""
+    history = ConversationHistory(max_messages=3)
+    for i in range(5):
+        history.append({"role": "user" if i % 2 == 0 else "bot", "content": f"消息{i}"})
+    assert [message["content"] for message in history] == ["消息2", "消息3", "消息4"]
+    assert history[-1]["content"] == "消息4" and len(history[-2:]) == 2
+    assert history.summary == {"role": "summary", "content": "更早的2条对话，用户提到过：消息0"}
+    assert history.recent(1) == [history.summary, {"role": "user", "content": "消息4"}]
+
+
+def test_character_budget():
+    """测试总字符数超出预算时移出最早的消息，最新的一条总是保留"""
+    history = ConversationHistory(max_messages=10, max_chars=10)
+    history.append({"role": "user", "content": "12345"})
+    history.append({"role": "bot", "content": "123456"})
+    assert len(history) == 1 and history.chars == 6
+    history.append({"role": "user", "content": "x" * 50})
+    assert len(history) == 1 and history.summary_count == 2
+
+
+def test_dump_and_restore():
+    """测试紧凑表示只保留最近的消息，其余计入摘要"""
+    history = ConversationHistory(max_messages=4)
+    for i in range(6):
+        history.append({"role": "user", "content": str(i)})
+    restored = history.empty().restore(history.dump(limit=2))
+    assert [message["content"] for message in restored] == ["4", "5"]
+    assert restored.summary_count == 4 and list(restored.summary_topics) == ["1", "2", "3"]
+    assert restored.max_messages == 4
+
+
+def test_interpreter_history_stays_bounded():
+    """测试长时间对话中解释器的对话历史不超过容量，意图识别收到摘要记录"""
+    script = '''
+    intent "测试" {
+        when user_says "测试" {
+            response "测试响应"
+        }
+    }
+    '''
+    program = Parser(Lexer(script)).parse()
+    received = []
+
+    class RecordingClient(MockLLMClient):
+        def identify_intent(self, user_input, intents, conversation_history=None, **kwargs):
+            received.append(conversation_history)
+            return super().identify_intent(user_input, intents, conversation_history, **kwargs)
+
+    interpreter = Interpreter(RecordingClient(), history_size=6)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.interpret(program)
+    for _ in range(100):
+        interpreter.execute_intent(interpreter.match_intent("测试"))
+    assert len(interpreter.conversation_history) == 6
+    assert interpreter.conversation_history.summary_count == 194
+    assert received[-1][0]["role"] == "summary" and len(received[-1]) == 6
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "aot"])
+def test_bot_turns_stored_as_template_references(engine):
+    """测试回复在对话历史中保存为模板引用，读取时还原的文本与回复一致，非纯函数的结果不重新计算"""
+    script = '''
+    intent "物流" {
+        when user_says "物流" {
+            set order = "A1"
+            response "订单{order}：{get_logistics_info()}"
+            set order = "B2"
+        }
+    }
+    intent "问候" {
+        when user_says "你好" {
+            response "您好！很高兴为您服务"
+        }
+    }
+    '''
+    program = Parser(Lexer(script)).parse()
+    interpreter = Interpreter(engine=engine)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.interpret(program)
+    if engine == "aot":
+        namespace = {}
+        exec(compile(transpile(program), "<dslc>", "exec"), namespace)
+        interpreter.load_module(type("Module", (), namespace))
+
+    responses = [interpreter.execute_intent(intent)["response"] for intent in program.intents]
+    turns = list(interpreter.conversation_history)
+    assert all(isinstance(turn, BotTurn) for turn in turns)
+    assert [turn["content"] for turn in turns] == responses
+    assert turns[0].fragments[0] == "A1" and turns[0].intent == "物流"
+    assert turns[1].fragments == ()
+    assert turns[1] == {"role": "bot", "content": "您好！很高兴为您服务"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
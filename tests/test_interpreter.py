@@ -2,6 +2,8 @@
 解释器测试
 """
 
+import asyncio
+import time
 import pytest
 from src.lexer import Lexer
 from src.parser import Parser
@@ -87,6 +89,148 @@ def test_interpreter_template_formatting():
     assert "您好，张三" in result["response"]
 
 
+def test_interpreter_carry_over_declaration():
+    """测试意图声明carry_over时只继承声明的变量，快照可以回滚"""
+    script = '''
+    intent "查询" {
+        when user_says "查询" {
+            set order_number = "A1"
+            set note = "备注"
+            response "{order_number} {note}"
+        }
+    }
+    
+    intent "退款" {
+        carry_over order_number
+        when user_says "退款" {
+            response "{order_number} {note}"
+        }
+    }
+    
+    intent "修改" {
+        when user_says "修改" {
+            set order_number = "B2"
+            response "{order_number} {note}"
+        }
+    }
+    '''
+    
+    program = Parser(Lexer(script)).parse()
+    interpreter = Interpreter(MockLLMClient())
+    interpreter.interpret(program)
+    query, refund, change = program.intents
+    
+    assert interpreter.execute_intent(query)["response"] == "A1 备注"
+    before_refund = interpreter.last_context
+    assert interpreter.execute_intent(refund)["response"] == "A1 {note}"
+    assert interpreter.execute_intent(change)["response"] == "B2 {note}"
+    assert dict(interpreter.last_context) == {"order_number": "B2"}
+    
+    interpreter.rollback(before_refund)
+    assert interpreter.execute_intent(change)["response"] == "B2 备注"
+    assert before_refund == {"order_number": "A1", "note": "备注"}
+
+
+def test_run_intent_suspends_at_wait_for():
+    """测试可恢复执行在wait_for处暂停，send用户输入后继续"""
+    script = '''
+    intent "退款" {
+        when user_says "退款" {
+            options ["质量问题", "不想要了"]
+            wait_for reason
+            ask "请输入订单号"
+            wait_for order_number
+            response "{order_number}：{reason}"
+        }
+    }
+    '''
+    
+    program = Parser(Lexer(script)).parse()
+    interpreter = Interpreter(MockLLMClient())
+    interpreter.interpret(program)
+    outputs = []
+    interpreter.set_output_callback(outputs.append)
+    interpreter.set_user_input_callback(lambda name: pytest.fail("run_intent不应调用输入回调"))
+    
+    execution = interpreter.run_intent(program.intents[0])
+    request = next(execution)
+    assert (request.variable, request.options, request.position) == ("reason", ("质量问题", "不想要了"), 1)
+    assert len(outputs) == 1
+    request = execution.send("质量问题")
+    assert (request.variable, request.options) == ("order_number", ())
+    assert outputs[-1] == "[机器人] 请输入订单号"
+    with pytest.raises(StopIteration) as stop:
+        execution.send("A1")
+    assert stop.value.value == {"response": "A1：质量问题", "variables": {"reason": "质量问题", "order_number": "A1"}}
+    assert interpreter.last_intent == "退款"
+    assert interpreter.conversation_history[-1]["content"] == "A1：质量问题"
+
+
+ASYNC_SCRIPT = '''
+intent "查询" {
+    when user_says "查询" {
+        ask "请提供订单号"
+        wait_for order_number
+        response "订单 {order_number}：{lookup(order_number)}"
+    }
+}
+'''
+
+
+class SlowLLMClient(MockLLMClient):
+    """异步识别意图时模拟网络延迟"""
+
+    async def identify_intent_async(self, user_input, intents, conversation_history=None, last_intent=None, last_context=None):
+        await asyncio.sleep(0.2)
+        return self.identify_intent(user_input, intents, conversation_history, last_intent, last_context)
+
+
+def create_async_interpreter():
+    async def lookup(order_number):
+        await asyncio.sleep(0.2)
+        return f"{order_number}已发货"
+
+    async def ask(variable):
+        await asyncio.sleep(0)
+        return "A1"
+
+    interpreter = Interpreter(SlowLLMClient())
+    interpreter.register_function("lookup", lookup)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.set_user_input_callback(ask)
+    interpreter.interpret(Parser(Lexer(ASYNC_SCRIPT)).parse())
+    return interpreter
+
+
+def test_async_conversations_overlap():
+    """测试一个事件循环驱动多个对话：LLM识别、异步内置函数和异步输入回调互相重叠"""
+    interpreters = [create_async_interpreter() for _ in range(4)]
+
+    async def converse(interpreter):
+        intent = await interpreter.match_intent_async("查询")
+        return await interpreter.execute_intent_async(intent)
+
+    async def main():
+        return await asyncio.gather(*(converse(interpreter) for interpreter in interpreters))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    assert [result["response"] for result in results] == ["订单 A1：A1已发货"] * 4
+    # 每个对话等待0.4秒，依次执行需要1.6秒
+    assert elapsed < 1.0
+    assert [message["role"] for message in interpreters[0].conversation_history] == ["user", "bot"]
+
+
+def test_sync_api_with_async_builtin():
+    """测试同步API中调用异步内置函数和异步LLM客户端接口的默认实现"""
+    interpreter = create_async_interpreter()
+    interpreter.set_user_input_callback(lambda variable: "B2")
+    intent = interpreter.match_intent("查询")
+    assert interpreter.execute_intent(intent)["response"] == "订单 B2：B2已发货"
+    assert asyncio.run(MockLLMClient().identify_intent_async("查询", interpreter.intents)) == "查询"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -3,7 +3,13 @@
 """
 
 import pytest
-from src.lexer import Lexer, TokenType
+from src.lexer import Lexer, ChunkedLexer, IncrementalLexer, TokenType, compute_edit
+from tests.conftest import SCRIPTS_DIR
+
+
+def _token_tuples(text, engine):
+    """将Token列表转换为可比较的元组列表"""
+    return [(t.type, t.value, t.line, t.column) for t in Lexer(text, engine=engine).tokenize()]
 
 
 def test_basic_tokens():
@@ -79,6 +85,138 @@ def test_comments():
     assert tokens[0].type == TokenType.INTENT
 
 
+@pytest.mark.parametrize("script", sorted(SCRIPTS_DIR.glob("*.dsl")), ids=lambda p: p.name)
+def test_regex_engine_matches_char_engine(script):
+    """测试regex引擎在所有示例脚本上与逐字符引擎输出一致"""
+    text = script.read_text(encoding="utf-8")
+    assert _token_tuples(text, "regex") == _token_tuples(text, "char")
+
+
+@pytest.mark.parametrize("text", [
+    'a\n  "x\\ny\\q\n"  b',
+    '# comment\n#tail',
+    '中文 标识符1 _a 12²a',
+    'set x = f("a", $b)\n',
+])
+def test_regex_engine_edge_cases(text):
+    """测试转义、跨行字符串、注释和非ASCII字符"""
+    assert _token_tuples(text, "regex") == _token_tuples(text, "char")
+
+
+@pytest.mark.parametrize("text", ['intent "abc', 'a  ，'])
+def test_regex_engine_errors(text):
+    """测试regex引擎的错误信息与逐字符引擎一致"""
+    with pytest.raises(SyntaxError) as char_error:
+        Lexer(text).tokenize()
+    with pytest.raises(SyntaxError) as regex_error:
+        Lexer(text, engine="regex").tokenize()
+    assert str(regex_error.value) == str(char_error.value)
+
+
+def test_positions_resolved_from_offsets():
+    """测试Token只记录偏移，行号列号按需由行首索引计算"""
+    tokens = Lexer('intent "a" {\n  ask "b"\n}').tokenize()
+    ask = tokens[4]
+    assert ask.type == TokenType.ASK
+    assert ask.offset == 15
+    assert (ask.line, ask.column) == (2, 3)
+    
+    with pytest.raises(SyntaxError, match="Lexer error at line 3, column 4: Unterminated string"):
+        Lexer('a\nb\n "c').tokenize()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_chunked_lexer_matches_lexer(chunk_size):
+    """测试分块扫描在任意块边界下与整体扫描输出一致"""
+    text = (SCRIPTS_DIR / "enhanced.dsl").read_text(encoding="utf-8")
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    tokens = [(t.type, t.value, t.line, t.column) for t in ChunkedLexer(chunks).tokenize()]
+    assert tokens == _token_tuples(text, "char")
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS_DIR.glob("*.dsl")), ids=lambda p: p.name)
+def test_token_buffer_matches_tokenize(script):
+    """测试紧凑TokenBuffer的视图与Token列表一致"""
+    text = script.read_text(encoding="utf-8")
+    buffer = Lexer(text).tokenize_compact()
+    assert [(t.type, t.value, t.line, t.column) for t in buffer] == _token_tuples(text, "char")
+
+
+@pytest.mark.parametrize("text", [
+    '  intent "a" {\n\t"x\\"y"  # c\n}',
+    'set 名字 = "a"\n    ask "b"\nx = 1',
+    'abc中 = 1\n  d "可在"我的"中查看"\n  e',
+    'a²\nb 12abc\n  "s\n中" 中\n  x',
+    '',
+])
+def test_token_buffer_bulk_and_fallback(text):
+    """测试整体扫描与逐个扫描交替时（非ASCII标识符所在的行逐个扫描）与Token列表一致"""
+    buffer = Lexer(text).tokenize_compact()
+    assert [(t.type, t.value, t.line, t.column) for t in buffer] == _token_tuples(text, "char")
+
+
+@pytest.mark.parametrize("text", ['intent "abc', 'a  ，', 'a\n  ，', '名字\n  x "abc', 'x\\y'])
+def test_token_buffer_errors(text):
+    """测试紧凑扫描的错误信息与逐字符引擎一致"""
+    with pytest.raises(SyntaxError) as char_error:
+        Lexer(text).tokenize()
+    with pytest.raises(SyntaxError) as compact_error:
+        Lexer(text).tokenize_compact()
+    assert str(compact_error.value) == str(char_error.value)
+
+
+@pytest.mark.parametrize("engine", ["char", "regex"])
+def test_identifiers_and_literals_are_interned(engine):
+    """测试不同脚本中相同的标识符和字符串字面量共享同一个对象"""
+    first = Lexer('wait_for order_number\nask "订单"', engine=engine).tokenize()
+    second = Lexer('set order_number = "订单"', engine=engine).tokenize()
+    assert first[1].value is second[1].value
+    assert first[4].value is second[3].value
+    compact = Lexer('ask "订单"').tokenize_compact()
+    assert compact[1].value is first[4].value
+
+
+def test_compute_edit():
+    """测试由新旧源代码计算编辑区域"""
+    assert compute_edit("abcdef", "abXYef") == (2, 2, "XY")
+    assert compute_edit("aaa", "aaaa") == (3, 0, "a")
+    assert compute_edit("same", "same") == (4, 0, "")
+
+
+@pytest.mark.parametrize("old, new", [
+    ('intent "a" {\n  ask "b"\n}', 'intent "a" {\n  ask "bc"\n}'),
+    ('abc def\nx', 'abcx def\nx'),
+    ('a "b" c\nd', 'a "b c\nd'),
+    ('a # c\nb', 'a  c\nb'),
+    ('x\ny', '#x\ny'),
+])
+def test_incremental_lexer_matches_full_relex(old, new):
+    """测试增量扫描结果与整体重新扫描一致（含错误）"""
+    lexer = IncrementalLexer(old)
+    lexer.tokenize()
+    try:
+        expected = [(t.type, t.value, t.offset, t.line, t.column) for t in Lexer(new).tokenize()]
+    except SyntaxError as e:
+        with pytest.raises(SyntaxError, match=str(e)):
+            lexer.update(new)
+        return
+    tokens = lexer.update(new)
+    assert [(t.type, t.value, t.offset, t.line, t.column) for t in tokens] == expected
+
+
+def test_incremental_lexer_rescans_only_damaged_region():
+    """测试局部编辑只重新扫描受影响的Token"""
+    text = (SCRIPTS_DIR / "enhanced.dsl").read_text(encoding="utf-8")
+    lexer = IncrementalLexer(text)
+    tokens = lexer.tokenize()
+    edit_at = text.index("退款申请已提交")
+    
+    new_tokens = lexer.apply_edit(edit_at, 0, "您的")
+    assert len(new_tokens) == len(tokens)
+    assert lexer.last_rescanned <= 2
+    assert [t.value for t in new_tokens] == [t.value for t in Lexer(lexer.text).tokenize()]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,52 @@
+"""
+多脚本加载器测试
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.loader import load_scripts, merge_programs
+from tests.conftest import copy_scripts, parse
+
+
+SCRIPT_NAMES = ["member_service.dsl", "order_query.dsl", "refund.dsl", "tech_support.dsl"]
+
+
+@pytest.fixture
+def script_dir(tmp_path):
+    copy_scripts(tmp_path, *SCRIPT_NAMES)
+    return tmp_path
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_load_directory_merges_in_file_order(script_dir, max_workers):
+    """测试目录加载结果与按文件名顺序逐个解析的结果一致"""
+    result = load_scripts(script_dir, max_workers=max_workers)
+    expected = []
+    for name in SCRIPT_NAMES:
+        expected.extend(parse((script_dir / name).read_text(encoding="utf-8")).intents)
+    assert list(result.program.intents) == expected
+    assert sorted(Path(p).name for p in result.timings) == SCRIPT_NAMES
+    assert all(elapsed >= 0 for elapsed in result.timings.values())
+
+
+def test_duplicate_intents_keep_first():
+    """测试重复意图只保留最先出现的一个"""
+    first = parse('intent "查询" { when user_says "查" { response "A" } }')
+    second = parse('intent "查询" { when user_says "查询" { response "B" } }\n'
+                   'intent "退款" { when user_says "查" { response "C" } }')
+    result = merge_programs([("a.dsl", first), ("b.dsl", second)])
+    
+    assert [intent.name for intent in result.program.intents] == ["查询", "退款"]
+    assert result.program.intents[0].actions[0].template == "A"
+    assert result.duplicate_intents == [("查询", "a.dsl", "b.dsl")]
+    assert result.overlapping_patterns == [("查", "查询", "退款")]
+
+
+def test_syntax_error_reports_file(tmp_path):
+    """测试语法错误信息包含出错的脚本路径"""
+    copy_scripts(tmp_path, "refund.dsl")
+    (tmp_path / "broken.dsl").write_text('intent "x" {', encoding="utf-8")
+    with pytest.raises(SyntaxError, match="broken.dsl"):
+        load_scripts(tmp_path, max_workers=2)
@@ -0,0 +1,103 @@
+"""
+模块缓存（import声明）测试
+"""
+
+import pytest
+
+from src.lexer import Lexer
+from src.parser import Parser, ImportDecl
+from src.modules import ModuleCache
+from src.loader import load_scripts
+from tests.conftest import intent, write
+
+
+@pytest.fixture
+def scripts(tmp_path):
+    (tmp_path / "common").mkdir()
+    write(tmp_path / "common" / "order.dsl", intent("订单查询", "订单", "订单已发货"))
+    write(tmp_path / "common" / "refund.dsl", 'import "order.dsl"\n' + intent("退款", "退款", "退款中"))
+    write(tmp_path / "main.dsl",
+          'import "common/refund.dsl"\nimport "common/order.dsl"\n' + intent("订单查询", "我的订单", "覆盖"))
+    return tmp_path
+
+
+def test_parse_import():
+    """测试解析import声明"""
+    program = Parser(Lexer('import "a.dsl"\nimport "b.dsl"\n' + intent("x", "x", "x"))).parse()
+    assert program.imports == (ImportDecl("a.dsl"), ImportDecl("b.dsl"))
+    assert len(program.intents) == 1
+
+
+def test_import_after_intent_is_error():
+    """测试import必须出现在意图之前"""
+    with pytest.raises(SyntaxError):
+        Parser(Lexer(intent("x", "x", "x") + 'import "a.dsl"\n')).parse()
+
+
+def test_load_links_imports(scripts):
+    """测试合并导入：当前脚本优先，菱形导入只合并一次"""
+    cache = ModuleCache()
+    program = cache.load(scripts / "main.dsl")
+    assert [i.name for i in program.intents] == ["订单查询", "退款"]
+    assert program.intents[0].actions[0].template == "覆盖"
+    assert cache.parse_count == 3
+
+
+def test_only_changed_modules_reparsed(scripts):
+    """测试只重新解析变化的脚本，导入它的脚本重新合并"""
+    cache = ModuleCache()
+    cache.load(scripts / "main.dsl")
+    first = cache.load(scripts / "common" / "refund.dsl")
+    assert cache.parse_count == 3
+    
+    # 无变化时直接复用合并结果
+    assert cache.load(scripts / "common" / "refund.dsl") is first
+    assert cache.parse_count == 3
+    
+    write(scripts / "common" / "order.dsl", intent("订单查询", "订单", "订单已签收"))
+    assert cache.dependents(scripts / "common" / "order.dsl") == {
+        cache.normalize(scripts / "main.dsl"), cache.normalize(scripts / "common" / "refund.dsl")}
+    refund = cache.load(scripts / "common" / "refund.dsl")
+    assert cache.parse_count == 4
+    assert refund.intents[1].actions[0].template == "订单已签收"
+    
+    # 只修改时间变化、内容不变时不重新解析
+    write(scripts / "main.dsl", (scripts / "main.dsl").read_text(encoding="utf-8"))
+    cache.load(scripts / "main.dsl")
+    assert cache.parse_count == 4
+
+
+def test_circular_import(tmp_path):
+    """测试循环导入报错"""
+    write(tmp_path / "a.dsl", 'import "b.dsl"\n' + intent("a", "a", "a"))
+    write(tmp_path / "b.dsl", 'import "a.dsl"\n' + intent("b", "b", "b"))
+    with pytest.raises(SyntaxError, match="Circular import"):
+        ModuleCache().load(tmp_path / "a.dsl")
+
+
+def test_missing_import(tmp_path):
+    """测试导入不存在的文件报错"""
+    write(tmp_path / "a.dsl", 'import "missing.dsl"\n' + intent("a", "a", "a"))
+    with pytest.raises(SyntaxError, match="missing.dsl"):
+        ModuleCache().load(tmp_path / "a.dsl")
+
+
+def test_directory_load_expands_imports(scripts):
+    """测试目录加载时展开导入，被导入的脚本不重复合并"""
+    result = load_scripts([scripts / "main.dsl", scripts / "common" / "order.dsl"], max_workers=1)
+    assert [i.name for i in result.program.intents] == ["订单查询", "退款"]
+    assert result.duplicate_intents == []
+
+
+def test_reload_reuses_unchanged_intents(tmp_path):
+    """测试重新加载时未修改的意图块复用上一次的IntentDecl"""
+    write(tmp_path / "bot.dsl", intent("a", "a", "1") + intent("b", "b", "1") + intent("c", "c", "1"))
+    cache = ModuleCache()
+    first = cache.load(tmp_path / "bot.dsl")
+    write(tmp_path / "bot.dsl", intent("a", "a", "1") + intent("b", "b", "2") + intent("c", "c", "1"))
+    second = cache.load(tmp_path / "bot.dsl")
+    
+    assert second.intents[1].actions[0].template == "2"
+    assert second.intents[0] is first.intents[0]
+    assert second.intents[2] is first.intents[2]
+    assert cache.parsers[cache.normalize(tmp_path / "bot.dsl")].last_reparsed == 1
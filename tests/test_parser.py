@@ -3,8 +3,9 @@
 """
 
 import pytest
-from src.lexer import Lexer
-from src.parser import Parser, IntentDecl, AskAction, ResponseAction, OptionsAction, SetAction
+from pathlib import Path
+from src.lexer import Lexer, ChunkedLexer
+from src.parser import Parser, IncrementalParser, ImportDecl, IntentDecl, AskAction, ResponseAction, OptionsAction, SetAction
 
 
 def test_parse_simple_intent():
@@ -115,6 +116,114 @@ def test_parse_multiple_intents():
     assert program.intents[1].name == "退款申请"
 
 
+def test_parse_carry_over():
+    """测试解析意图的继承变量声明"""
+    script = '''
+    intent "退款" {
+        carry_over order_number, reason
+        when user_says "退款" {
+            response "退款处理中"
+        }
+    }
+    
+    intent "重新开始" {
+        carry_over
+        when user_says "重新开始" {
+            response "好的"
+        }
+    }
+    '''
+    
+    program = Parser(Lexer(script)).parse()
+    assert program.intents[0].carry_over == ("order_number", "reason")
+    assert program.intents[1].carry_over == ()
+    assert Parser(Lexer('intent "a" { when user_says "a" { } }')).parse().intents[0].carry_over is None
+    with pytest.raises(SyntaxError):
+        Parser(Lexer('intent "a" { carry_over x, when user_says "a" { } }')).parse()
+
+
+def test_ast_nodes_are_immutable():
+    """测试AST节点不可修改、可比较、可序列化"""
+    import copy
+    import pickle
+    
+    script = (Path(__file__).parent.parent / "scripts" / "combined.dsl").read_text(encoding="utf-8")
+    program = Parser(Lexer(script)).parse()
+    intent = program.intents[0]
+    
+    with pytest.raises(AttributeError):
+        intent.name = "其他"
+    with pytest.raises(AttributeError):
+        intent.extra = 1
+    assert isinstance(intent.actions, tuple)
+    assert not hasattr(intent, "__dict__")
+    
+    assert pickle.loads(pickle.dumps(program)) == program
+    assert copy.deepcopy(program) is program
+    assert Parser(Lexer(script)).parse() == program
+
+
+def test_streaming_parser_matches_list_parser():
+    """测试流式模式与列表模式解析结果一致"""
+    script_path = Path(__file__).parent.parent / "scripts" / "enhanced.dsl"
+    text = script_path.read_text(encoding="utf-8")
+    
+    program = Parser(Lexer(text)).parse()
+    streamed = Parser(ChunkedLexer.from_file(str(script_path), chunk_size=256), streaming=True).parse()
+    
+    assert repr(streamed.intents) == repr(program.intents)
+    assert [i.when_clause.patterns for i in streamed.intents] == [i.when_clause.patterns for i in program.intents]
+
+
+def test_compact_parser_matches_list_parser():
+    """测试TokenBuffer模式与列表模式解析结果一致"""
+    text = (Path(__file__).parent.parent / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    
+    program = Parser(Lexer(text)).parse()
+    compact = Parser(Lexer(text), compact=True).parse()
+    
+    assert repr(compact.intents) == repr(program.intents)
+    assert [i.when_clause.patterns for i in compact.intents] == [i.when_clause.patterns for i in program.intents]
+
+
+def test_streaming_parser_peek_token():
+    """测试流式模式的前瞻缓冲"""
+    parser = Parser(Lexer('intent "a" { }', engine="regex"), streaming=True)
+    assert parser.peek_token(2).value == "{"
+    parser.advance()
+    assert parser.current_token.value == "a"
+    assert parser.peek_token().value == "{"
+
+
+def test_incremental_parser_reuses_unchanged_intents():
+    """测试增量语法分析只重新解析修改过的意图块"""
+    text = (Path(__file__).parent.parent / "scripts" / "enhanced.dsl").read_text(encoding="utf-8")
+    parser = IncrementalParser()
+    first = parser.parse(text)
+    assert first == Parser(Lexer(text)).parse()
+    
+    edited = text.replace('intent "订单查询"', 'intent "订单查询服务"', 1)
+    second = parser.parse("# 新增注释\n" + edited)
+    assert second == Parser(Lexer(edited)).parse()
+    assert parser.last_reparsed == 1
+    assert parser.last_reused == len(first.intents) - 1
+    changed = [i for i, (a, b) in enumerate(zip(first.intents, second.intents)) if a is not b]
+    assert len(changed) == 1 and second.intents[changed[0]].name == "订单查询服务"
+
+
+def test_incremental_parser_falls_back_to_full_parse():
+    """测试无法按块切分或块有语法错误时由完整解析报告错误"""
+    parser = IncrementalParser()
+    good = 'import "a.dsl"\nintent "x" { when user_says "x" { response "}" } }\n'
+    assert parser.parse(good) == Parser(Lexer(good)).parse()
+    assert parser.parse(good).imports == (ImportDecl("a.dsl"),)
+    
+    with pytest.raises(SyntaxError, match="line 2"):
+        parser.parse('intent "x" { when user_says "x" {\n set } }')
+    with pytest.raises(SyntaxError):
+        parser.parse(good + 'response "stray"\n')
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,94 @@
+"""
+热重载测试
+"""
+
+import threading
+
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import Interpreter
+from src.reloader import ScriptReloader
+from tests.conftest import intent, write
+from tests.stubs.mock_llm_client import MockLLMClient
+
+
+def test_check_delivers_only_changes(tmp_path):
+    """测试只有脚本变化时才交付新版本，编译失败时保留旧版本"""
+    script = tmp_path / "bot.dsl"
+    write(script, intent("订单查询", "订单", "v1"))
+    reloaded, errors = [], []
+    reloader = ScriptReloader(script, reloaded.append, on_error=errors.append)
+    reloader.build()
+    
+    assert not reloader.check()
+    write(script, intent("订单查询", "订单", "v2"))
+    assert reloader.check()
+    assert reloaded[0].intents[0].actions[0].template == "v2"
+    
+    write(script, 'intent "broken" {')
+    assert not reloader.check()
+    assert len(errors) == 1 and len(reloaded) == 1
+    
+    write(script, intent("订单查询", "订单", "v3"))
+    assert reloader.check()
+    assert reloaded[1].intents[0].actions[0].template == "v3"
+
+
+def test_check_detects_imported_script_change(tmp_path):
+    """测试导入的脚本变化也会触发重新加载"""
+    write(tmp_path / "common.dsl", intent("退款", "退款", "v1"))
+    write(tmp_path / "bot.dsl", 'import "common.dsl"\n' + intent("订单查询", "订单", "订单"))
+    reloaded = []
+    reloader = ScriptReloader(tmp_path / "bot.dsl", reloaded.append)
+    reloader.build()
+    
+    write(tmp_path / "common.dsl", intent("退款", "退款", "v2"))
+    assert reloader.check()
+    assert reloaded[0].intents[1].actions[0].template == "v2"
+
+
+def test_swap_program_keeps_conversation_state():
+    """测试替换程序时保留对话状态，正在执行的意图在旧版本上完成"""
+    old = Parser(Lexer(intent("订单查询", "订单", "旧版本"))).parse()
+    new = Parser(Lexer(intent("订单查询", "订单", "新版本") + intent("退款", "退款", "退款中"))).parse()
+    interpreter = Interpreter(MockLLMClient())
+    interpreter.interpret(old)
+    interpreter.set_output_callback(lambda message: None)
+    
+    in_flight = interpreter.match_intent("查订单")
+    interpreter.swap_program(new)
+    result = interpreter.execute_intent(in_flight)
+    assert result["response"] == "旧版本"
+    
+    # 切换后对话状态仍然保留
+    history = list(interpreter.conversation_history)
+    assert history[-1] == {"role": "bot", "content": "旧版本"}
+    assert interpreter.last_intent == "订单查询"
+    
+    assert interpreter.execute_intent(interpreter.match_intent("查订单"))["response"] == "新版本"
+    assert interpreter.match_intent("我要退款").name == "退款"
+    assert interpreter.conversation_history[:len(history)] == history
+
+
+def test_swap_program_waits_for_running_step():
+    """测试其他线程中的swap_program等待正在执行的一步结束（分配槽位不能与执行中的写入交错）"""
+    old = Parser(Lexer(intent("订单查询", "订单", '{probe(\\"A1\\")}'))).parse()
+    new = Parser(Lexer(intent("订单查询", "订单", "新版本"))).parse()
+    interpreter = Interpreter(MockLLMClient())
+    interpreter.set_output_callback(lambda message: None)
+    swapped, observed, threads = [], [], []
+    
+    def probe(order_number):
+        swapper = threading.Thread(target=lambda: (interpreter.swap_program(new), swapped.append(True)))
+        swapper.start()
+        threads.append(swapper)
+        swapper.join(0.2)
+        observed.append(bool(swapped))
+        return order_number
+    
+    interpreter.register_function("probe", probe)
+    interpreter.interpret(old)
+    assert interpreter.execute_intent(interpreter.match_intent("查订单"))["response"] == "A1"
+    threads[0].join(5)
+    assert observed == [False] and swapped == [True]
+    assert interpreter.execute_intent(interpreter.match_intent("查订单"))["response"] == "新版本"
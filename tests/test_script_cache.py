@@ -0,0 +1,83 @@
+"""
+编译缓存测试
+"""
+
+import pytest
+
+import src.script_cache as script_cache
+from src.script_cache import load_program, cache_path_for, serialize_program, deserialize_program, source_digest
+from tests.conftest import SCRIPTS_DIR, copy_scripts, parse
+
+
+@pytest.fixture
+def script_file(tmp_path):
+    return copy_scripts(tmp_path, "enhanced.dsl")[0]
+
+
+def test_roundtrip_matches_parser():
+    """测试序列化后还原的AST与直接解析结果一致"""
+    for name in ("enhanced.dsl", "combined.dsl", "tech_support.dsl"):
+        source = (SCRIPTS_DIR / name).read_text(encoding="utf-8")
+        digest = source_digest(source)
+        program = parse(source)
+        assert deserialize_program(serialize_program(program, digest), digest) == program
+
+
+def test_cache_hit_skips_lexer(script_file, monkeypatch):
+    """测试缓存有效时不进行词法分析"""
+    program, from_cache = load_program(str(script_file))
+    assert not from_cache
+    assert cache_path_for(str(script_file)).exists()
+    
+    def fail(source):
+        raise AssertionError("缓存命中时不应重新编译")
+    monkeypatch.setattr(script_cache, "compile_source", fail)
+    cached, from_cache = load_program(str(script_file))
+    assert from_cache
+    assert cached == program
+
+
+def test_cache_invalidated_by_source_change(script_file):
+    """测试源代码变化后缓存失效"""
+    load_program(str(script_file))
+    source = script_file.read_text(encoding="utf-8")
+    script_file.write_text(source.replace("订单查询", "订单查询服务", 1), encoding="utf-8")
+    program, from_cache = load_program(str(script_file))
+    assert not from_cache
+    assert program == parse(script_file.read_text(encoding="utf-8"))
+
+
+def test_cache_invalidated_by_compiler_version(script_file, monkeypatch):
+    """测试编译器版本变化后缓存失效"""
+    load_program(str(script_file))
+    monkeypatch.setattr(script_cache, "COMPILER_VERSION", "test")
+    _, from_cache = load_program(str(script_file))
+    assert not from_cache
+
+
+def test_corrupt_cache_recompiles(script_file):
+    """测试损坏的缓存文件会被重新生成"""
+    load_program(str(script_file))
+    cache_path = cache_path_for(str(script_file))
+    data = cache_path.read_bytes()
+    cache_path.write_bytes(data[:len(data) // 2])
+    program, from_cache = load_program(str(script_file))
+    assert not from_cache
+    assert load_program(str(script_file)) == (program, True)
+
+
+def test_syntax_error_not_cached(tmp_path):
+    """测试语法错误的脚本不写缓存"""
+    path = tmp_path / "bad.dsl"
+    path.write_text('intent "x" {', encoding="utf-8")
+    with pytest.raises(SyntaxError):
+        load_program(str(path))
+    assert not cache_path_for(str(path)).exists()
+
+
+def test_roundtrip_imports():
+    """测试导入声明可以被缓存"""
+    source = 'import "common/order.dsl"\nintent "x" { when user_says "x" { response "x" } }'
+    digest = source_digest(source)
+    program = parse(source)
+    assert deserialize_program(serialize_program(program, digest), digest) == program
@@ -0,0 +1,117 @@
+"""
+会话存储测试
+"""
+
+import pytest
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import InputRequest
+from src.sessions import Session
+from src.session_store import MemorySessionStore, SQLiteSessionStore
+from src.transpiler import transpile
+from tests.conftest import create_manager
+
+
+SCRIPT = '''
+intent "退款" {
+    when user_says "退款" {
+        set channel = "原路退回"
+        response "好的，退款将{channel}"
+        ask "请提供订单号"
+        wait_for order_number
+        ask "请说明原因"
+        wait_for reason
+        response "已为订单 {order_number} 申请退款：{reason}"
+    }
+}
+'''
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "aot"])
+def test_suspended_session_restored_from_store(engine):
+    """测试暂停在wait_for处的会话在另一个管理器（另一个解释器）中恢复并继续执行"""
+    store = MemorySessionStore()
+    manager = create_manager(SCRIPT, engine, store=store)[0]
+    if engine == "aot":
+        namespace = {}
+        exec(compile(transpile(Parser(Lexer(SCRIPT)).parse()), "<dslc>", "exec"), namespace)
+        manager.load_module(type("Module", (), namespace))
+    assert isinstance(manager.handle("a", "退款"), InputRequest)
+    assert manager.handle("a", "A1").variable == "reason"
+
+    restored = create_manager(SCRIPT, store=store)[0]
+    session = restored.get("a")
+    assert session.waiting_for_input and session.request.variable == "reason"
+    result = restored.handle("a", "不想要了")
+    assert result["response"] == "已为订单 A1 申请退款：不想要了"
+    assert result["variables"] == {"channel": "原路退回", "order_number": "A1", "reason": "不想要了"}
+    assert restored.get("a").last_context["order_number"] == "A1"
+    assert [message["role"] for message in restored.get("a").conversation_history] == ["user", "bot"]
+
+
+def test_snapshot_round_trip():
+    """测试快照保留上下文和最近的对话历史，无效快照被拒绝"""
+    session = Session("a")
+    session.last_intent = "退款"
+    session.last_context = {"order_number": "A1", "amount": 3, "items": ["x"]}
+    for i in range(30):
+        session.conversation_history.append({"role": "user", "content": str(i)})
+    restored = Session.load("a", session.dump(history_limit=5))
+    assert restored.last_intent == "退款"
+    assert restored.last_context == {"order_number": "A1", "amount": 3, "items": "['x']"}
+    assert [message["content"] for message in restored.conversation_history] == ["25", "26", "27", "28", "29"]
+    # 更早的消息归并为摘要
+    assert restored.conversation_history.summary["content"] == "更早的25条对话，用户提到过：22；23；24"
+    assert not restored.waiting_for_input
+    with pytest.raises(ValueError):
+        Session.load("a", b"not a snapshot")
+
+
+def test_evicted_session_restored_and_closed():
+    """测试被淘汰的会话从存储恢复，结束的会话从存储删除"""
+    store = MemorySessionStore()
+    manager = create_manager(SCRIPT, store=store, max_sessions=1)[0]
+    manager.handle("a", "退款")
+    manager.get("b")
+    assert "a" not in manager
+    assert manager.get("a").request.variable == "order_number"
+    manager.close("a")
+    assert store.load("a") is None
+    assert not manager.get("a").waiting_for_input
+
+
+def test_sqlite_store_group_commit(tmp_path):
+    """测试SQLite存储合并写入并批量提交，重新打开后可以读取"""
+    path = tmp_path / "sessions.db"
+    store = SQLiteSessionStore(path, batch_size=3, flush_interval=None)
+    store.save("a", b"1")
+    store.save("a", b"2")
+    store.save("b", b"3")
+    assert store.load("a") == b"2"
+    other = SQLiteSessionStore(path, flush_interval=None)
+    assert other.load("a") is None
+    store.save("c", b"4")  # 第3个会话，达到batch_size后提交
+    assert other.load("a") == b"2" and other.load("c") == b"4"
+
+    store.delete("b")
+    store.close()
+    assert other.load("b") is None
+    assert len(other) == 2
+    other.close()
+
+
+def test_sqlite_store_background_flush(tmp_path):
+    """测试后台线程定期提交写入"""
+    path = tmp_path / "sessions.db"
+    store = SQLiteSessionStore(path, flush_interval=0.01)
+    manager = create_manager(SCRIPT, store=store)[0]
+    manager.handle("a", "退款")
+    store.close()
+
+    store = SQLiteSessionStore(path, flush_interval=None)
+    assert create_manager(SCRIPT, store=store)[0].get("a").request.variable == "order_number"
+    store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,151 @@
+"""
+多会话管理测试
+"""
+
+import asyncio
+import pytest
+from src.lexer import Lexer
+from src.parser import Parser
+from src.interpreter import InputRequest
+from tests.conftest import create_manager
+
+
+SCRIPT = '''
+intent "查询订单" {
+    when user_says "查询订单" {
+        ask "请提供订单号"
+        wait_for order_number
+        response "订单 {order_number} 的状态：{get_order_status(order_number)}"
+    }
+}
+
+intent "再次确认" {
+    when user_says "确认" {
+        response "您查询的是 {order_number}"
+    }
+}
+'''
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure"])
+def test_sessions_are_isolated(engine):
+    """测试交替执行的会话各自保存变量、对话历史和暂停的意图"""
+    manager, program = create_manager(SCRIPT, engine)
+    query, confirm = program.intents
+
+    assert isinstance(manager.execute_intent("a", query), InputRequest)
+    request = manager.execute_intent("b", query)
+    assert (request.variable, request.position) == ("order_number", 1)
+    assert manager.send_input("a", "A1")["response"].startswith("订单 A1 ")
+    assert manager.send_input("b", "B2")["response"].startswith("订单 B2 ")
+
+    assert manager.execute_intent("a", confirm)["response"] == "您查询的是 A1"
+    assert manager.execute_intent("b", confirm)["response"] == "您查询的是 B2"
+    assert manager.get("a").last_context["order_number"] == "A1"
+    assert manager.get("a").last_intent == "再次确认"
+    with pytest.raises(RuntimeError):
+        manager.send_input("a", "A1")
+
+
+def test_handle_routes_input_to_waiting_intent():
+    """测试handle识别意图，有意图等待输入时把消息作为输入"""
+    manager, _ = create_manager(SCRIPT)
+    outputs = []
+    manager.get("a", outputs.append)
+
+    assert isinstance(manager.handle("a", "查询订单"), InputRequest)
+    assert manager.get("a").waiting_for_input
+    assert manager.handle("a", "12345")["response"].startswith("订单 12345 ")
+    assert manager.handle("a", "随便说说") is None
+
+    history = manager.get("a").conversation_history
+    assert [message["role"] for message in history] == ["user", "bot", "user"]
+    assert outputs[0] == "[机器人] 请提供订单号"
+    # 会话的状态没有留在共享的解释器上
+    assert manager.interpreter.output_callback is not outputs.append
+
+
+def test_lru_and_idle_eviction():
+    """测试按会话数、空闲时间和内存上限淘汰最久未使用的会话"""
+    now = [0.0]
+    evicted = []
+    manager, program = create_manager(SCRIPT, max_sessions=2, idle_timeout=10, on_evict=evicted.append,
+                                      clock=lambda: now[0])
+    manager.get("a")
+    manager.get("b")
+    manager.get("a")
+    manager.get("c")
+    assert [session.session_id for session in evicted] == ["b"]
+    assert list(manager) == ["a", "c"]
+
+    now[0] = 5
+    manager.get("c")
+    now[0] = 12
+    manager.get("d")
+    assert list(manager) == ["c", "d"]
+
+    manager.max_bytes = manager.total_size
+    manager.execute_intent("c", program.intents[0])
+    manager.send_input("c", "C3")
+    assert list(manager) == ["c"]
+    assert manager.total_size == manager.get("c").size
+
+
+def test_swap_program_keeps_sessions():
+    """测试热重载后会话的上下文保留，新会话使用新程序"""
+    manager, program = create_manager(SCRIPT)
+    manager.execute_intent("a", program.intents[0])
+    manager.send_input("a", "A1")
+
+    new_program = Parser(Lexer(SCRIPT.replace("您查询的是", "您刚才查询的是"))).parse()
+    manager.swap_program(new_program)
+    assert manager.execute_intent("a", new_program.intents[1])["response"] == "您刚才查询的是 A1"
+    assert manager.execute_intent("b", new_program.intents[1])["response"] == "您刚才查询的是 {order_number}"
+
+
+def test_handle_async_drives_many_sessions():
+    """测试一个事件循环并发处理多个会话的消息，会话之间互不影响"""
+    manager, _ = create_manager(SCRIPT)
+
+    async def converse(session_id):
+        request = await manager.handle_async(session_id, "查询订单")
+        assert request.variable == "order_number"
+        return await manager.handle_async(session_id, session_id)
+
+    async def main():
+        return await asyncio.gather(*(converse(f"S{i}") for i in range(20)))
+
+    results = asyncio.run(main())
+    assert [result["variables"]["order_number"] for result in results] == [f"S{i}" for i in range(20)]
+    assert manager.get("S3").last_context["order_number"] == "S3"
+    # wait_for的输入不记录到对话历史
+    assert len(manager.get("S3").conversation_history) == 2
+
+
+def test_interpreter_state_restored_after_session():
+    """测试执行会话后解释器恢复自身的对话状态，直接使用解释器不会写入会话的对话历史"""
+    manager, program = create_manager(SCRIPT)
+    interpreter = manager.interpreter
+    history = interpreter.conversation_history
+    manager.handle("a", "查询订单")
+    manager.handle("a", "A1")
+    assert interpreter.conversation_history is history and len(history) == 0
+    assert interpreter.last_intent is None and interpreter.current_result is None
+
+    interpreter.match_intent("查询订单")
+    assert len(history) == 1
+    assert len(manager.get("a").conversation_history) == 2
+
+
+def test_recorded_input_counts_toward_size():
+    """测试记录到对话历史的用户输入立即计入会话大小"""
+    manager, _ = create_manager(SCRIPT)
+    session = manager.get("a")
+    before = manager.total_size
+    manager.match_intent("a", "查询订单" * 20)
+    assert manager.total_size > before and session.size == session.estimate_size()
+    assert manager.total_size == sum(manager.get(session_id).size for session_id in manager)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
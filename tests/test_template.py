@@ -0,0 +1,148 @@
+"""
+模板编译测试
+"""
+
+import pytest
+
+from src.lexer import Lexer
+from src.parser import Parser, ResponseAction
+from src.interpreter import Interpreter, pure
+from src.template import compile_template, fold_template, VariableSlot, CallSlot
+from src.variables import Variables
+from src.transpiler import transpile
+
+
+FUNCTIONS = {
+    "echo": lambda *args: "|".join(str(arg) for arg in args),
+    "fail": lambda: 1 / 0,
+}
+
+
+@pytest.mark.parametrize("template, expected", [
+    ("纯文本", "纯文本"),
+    ("订单 {order_number} 已发货", "订单 A1 已发货"),
+    ("{missing}", "{missing}"),
+    ("{last_intent}", "订单查询"),
+    # 参数按逗号拆分（与原实现一致，引号中的逗号同样会拆分）
+    ("{echo(order_number, \"x, \", 'y', last_intent, 订单)}", "A1|\"x||y|订单查询|订单"),
+    ("{echo()}", ""),
+    ("{unknown(order_number)}", "{unknown(order_number)}"),
+    ("{fail()}", "{fail()}"),
+    ("{} 和 {a{b}", "{} 和 {a{b}"),
+    ("{(x)}", "{(x)}"),
+])
+def test_render(template, expected):
+    """测试渲染结果与原模板语义一致"""
+    variables = {"order_number": "A1"}
+    assert compile_template(template).render(variables, FUNCTIONS, "订单查询") == expected
+
+
+@pytest.mark.parametrize("template", [
+    "纯文本", "订单 {order_number} 已发货", "{missing}", "{last_intent}",
+    "{echo(order_number, 'y', last_intent, 订单)}", "{unknown(order_number)}", "{fail()}",
+])
+def test_bound_template_matches_compiled(template):
+    """测试绑定到槽位编号的模板与按名称渲染的结果一致"""
+    variables = Variables()
+    bound = compile_template(template).bind(variables.slot)
+    for last_intent in ("订单查询", None):
+        assert bound.render(variables, FUNCTIONS, last_intent) == \
+            compile_template(template).render({}, FUNCTIONS, last_intent)
+        variables["order_number"] = "A1"
+        variables["last_intent"] = "变量"
+        assert bound.render(variables, FUNCTIONS, last_intent) == \
+            compile_template(template).render(dict(variables), FUNCTIONS, last_intent)
+        variables.clear()
+
+
+def test_last_intent_default():
+    """测试没有上一次意图时使用默认值"""
+    assert compile_template("{last_intent}").render({}, {}, None) == "默认"
+    assert compile_template("{echo(last_intent)}").render({}, FUNCTIONS, None) == "默认"
+
+
+def test_compiled_parts():
+    """测试模板编译为字面量片段和槽位"""
+    compiled = compile_template("您的订单 {order_number} 状态：{get_order_status(order_number)}")
+    assert compiled.parts[0] == "您的订单 "
+    assert isinstance(compiled.parts[1], VariableSlot)
+    assert isinstance(compiled.parts[3], CallSlot)
+    assert compiled.parts[3].args == ((False, "order_number"),)
+    assert compile_template("静态文本").static == "静态文本"
+
+
+def test_response_compiled_at_parse_time():
+    """测试解析时编译模板，编译结果不影响AST相等比较"""
+    program = Parser(Lexer('intent "x" { when user_says "x" { response "订单 {order_number}" } }')).parse()
+    action = program.intents[0].actions[0]
+    assert action.compiled is compile_template("订单 {order_number}")
+    assert action == ResponseAction("订单 {order_number}")
+
+
+def test_fold_pure_calls_with_constant_args():
+    """测试参数全部为带引号字面量的纯函数调用被折叠，带未加引号参数的调用保留（运行时可能按变量取值）"""
+    calls = []
+    
+    @pure
+    def topic(name):
+        calls.append(name)
+        return f"<{name}>"
+    
+    functions = {"topic": topic, "echo": FUNCTIONS["echo"]}
+    template = compile_template("{topic(订单)} {topic(\"退款\")} {topic(order_number)} {echo(\"订单\")} {other}")
+    folded = fold_template(template, functions)
+    assert calls == ["退款"]
+    assert isinstance(folded.parts[0], CallSlot) and folded.parts[1] == " <退款> "
+    assert isinstance(folded.parts[2], CallSlot) and isinstance(folded.parts[4], CallSlot)
+    assert isinstance(folded.parts[-1], VariableSlot)
+    
+    variables = {"order_number": "A1", "订单": "变量"}
+    assert folded.render(variables, functions, None) == template.render(variables, functions, None)
+
+
+def test_fold_template_keeps_dynamic_placeholders():
+    """测试变量占位符、last_intent和带未加引号参数的调用不被折叠"""
+    template = compile_template("{coupon} {last_intent} {get_coupon(coupon)} {get_coupon(会员)}")
+    assert fold_template(template, {"get_coupon": pure(lambda category: category)}) is template
+
+
+def test_interpreter_folds_static_response():
+    """测试加载程序后完全静态的response渲染时不调用函数"""
+    program = Parser(Lexer('''
+    intent "退款追问" {
+        when user_says "退款进度" {
+            response "关于退款进度：{get_related_topic(\\"退款\\")}"
+        }
+    }
+    ''')).parse()
+    interpreter = Interpreter()
+    interpreter.interpret(program)
+    interpreter.set_output_callback(lambda message: None)
+    expected = "关于退款进度：" + interpreter._get_related_topic("退款")
+    
+    interpreter.functions["get_related_topic"] = lambda topic: pytest.fail("不应调用已折叠的函数")
+    assert interpreter.execute_intent(program.intents[0])["response"] == expected
+    assert interpreter.folded_templates[program.intents[0].actions[0].compiled].static == expected
+
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "aot"])
+def test_carried_over_context_is_not_folded(engine):
+    """测试加载程序之后才换入的上下文（程序中没有set的变量）在模板中取变量值，不使用加载时折叠的结果"""
+    program = Parser(Lexer('''
+    intent "追问" {
+        when user_says "追问" {
+            response "{topic}：{get_related_topic(topic)}"
+        }
+    }
+    ''')).parse()
+    interpreter = Interpreter(engine=engine)
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.interpret(program)
+    if engine == "aot":
+        namespace = {}
+        exec(compile(transpile(program), "<dslc>", "exec"), namespace)
+        interpreter.load_module(type("Module", (), namespace))
+    # 例如SessionManager换入会话沿用的上下文，或从会话存储恢复的会话
+    interpreter.last_context = {"topic": "退款"}
+    expected = "退款：" + interpreter._get_related_topic("退款")
+    assert interpreter.execute_intent(program.intents[0])["response"] == expected
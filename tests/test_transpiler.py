@@ -0,0 +1,83 @@
+"""
+预编译（dslc）测试
+"""
+
+import pytest
+
+from src.lexer import Lexer
+from src.parser import Parser, WaitForAction
+from src.interpreter import Interpreter
+from src.transpiler import transpile, is_current, load_module, module_path_for
+from tests.conftest import copy_scripts, run_all
+
+
+@pytest.mark.parametrize("script", ["enhanced.dsl", "combined.dsl"])
+def test_aot_engine_matches_tree_engine(script, tmp_path):
+    """测试预编译模块与tree引擎的执行结果一致"""
+    path, = copy_scripts(tmp_path, script)
+    module = load_module(str(path))
+    assert module_path_for(str(path)).exists()
+
+    program = Parser(Lexer(path.read_text(encoding="utf-8"))).parse()
+    assert module.PROGRAM == program
+
+    tree = Interpreter(engine="tree")
+    tree.interpret(program)
+    aot = Interpreter(engine="aot")
+    aot.interpret(module.PROGRAM)
+    aot.load_module(module)
+    assert run_all(aot, module.PROGRAM) == run_all(tree, program)
+    
+    # 含wait_for的意图函数在输入请求处暂停
+    intent, position, action = next((intent, position, action) for intent in module.PROGRAM.intents
+                                    for position, action in enumerate(intent.actions)
+                                    if isinstance(action, WaitForAction))
+    request = next(aot.run_intent(intent))
+    assert (request.variable, request.position) == (action.variable, position)
+
+
+def test_module_regenerated_when_script_changes(tmp_path):
+    """测试脚本修改后重新生成模块，未修改时不重新生成"""
+    path = tmp_path / "a.dsl"
+    path.write_text('intent "a" { when user_says "a" { response "旧版本" } }', encoding="utf-8")
+    assert is_current(load_module(str(path)))
+    mtime = module_path_for(str(path)).stat().st_mtime_ns
+    load_module(str(path))
+    assert module_path_for(str(path)).stat().st_mtime_ns == mtime
+
+    path.write_text('intent "a" { when user_says "a" { response "新版本" } }', encoding="utf-8")
+    module = load_module(str(path))
+    interpreter = Interpreter(engine="aot")
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.load_module(module)
+    assert interpreter.execute_intent(module.PROGRAM.intents[0])["response"] == "新版本"
+
+
+def test_transpiled_templates_and_expressions():
+    """测试生成代码中模板占位符、未知函数和set表达式的语义与解释器一致"""
+    script = '''
+    intent "a" {
+        when user_says "a" {
+            set x = unknown_func("1", y)
+            set z = format_price("100")
+            response "{x}|{z}|{missing}|{nope(x)}|{last_intent}|{format_price(\\"5\\")}"
+        }
+    }
+    '''
+    program = Parser(Lexer(script)).parse()
+    namespace = {}
+    exec(compile(transpile(program), "<dslc>", "exec"), namespace)
+
+    interpreter = Interpreter(engine="aot")
+    interpreter.set_output_callback(lambda message: None)
+    interpreter.load_module(type("Module", (), namespace))
+    result = interpreter.execute_intent(namespace["PROGRAM"].intents[0])
+
+    tree = Interpreter(engine="tree")
+    tree.set_output_callback(lambda message: None)
+    assert result == tree.execute_intent(program.intents[0])
+    assert result["response"].startswith("unknown_func(1, $y)|")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
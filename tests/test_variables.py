@@ -0,0 +1,67 @@
+"""
+槽位变量表测试
+"""
+
+import pickle
+
+import pytest
+
+from src.variables import Variables, UNSET
+
+
+def test_variables_mapping_view():
+    """测试按名称访问的映射接口"""
+    variables = Variables(["a", "b"])
+    assert len(variables) == 0 and not variables
+    assert variables.slot("a") == 0 and variables.slot("c") == 2
+    
+    variables["b"] = 1
+    variables["d"] = None
+    assert variables == {"b": 1, "d": None}
+    assert "a" not in variables and "b" in variables
+    assert variables.get("a", "x") == "x"
+    assert variables.values[variables.slot("b")] == 1
+    with pytest.raises(KeyError):
+        variables["a"]
+    
+    del variables["b"]
+    assert dict(variables) == {"d": None}
+    variables.clear()
+    assert variables == {} and len(variables.values) == 4
+
+
+def test_snapshot_is_copy_on_write():
+    """测试快照共享值列表，之后第一次写入时才复制"""
+    variables = Variables()
+    variables["a"] = 1
+    first = variables.snapshot()
+    assert first.values is variables.values and variables.parent is first
+    
+    variables["a"] = 2
+    assert first.values is not variables.values
+    variables["b"] = 3
+    second = variables.snapshot()
+    assert first == {"a": 1} and second == {"a": 2, "b": 3}
+    assert "b" not in first and first.index is second.index
+    with pytest.raises(TypeError):
+        first["a"] = 0
+    
+    # 回滚到第一个快照
+    variables.over(first)
+    assert variables == {"a": 1} and variables.parent is first
+    variables["c"] = 4
+    assert first == {"a": 1}
+    assert pickle.loads(pickle.dumps(UNSET)) is UNSET
+
+
+def test_keep_and_over_plain_mapping():
+    """测试只保留指定槽位，以及从按名称的映射继续"""
+    variables = Variables()
+    variables.over({"a": 1, "b": 2})
+    assert variables == {"a": 1, "b": 2}
+    variables.keep([variables.slot("a")])
+    assert variables == {"a": 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])